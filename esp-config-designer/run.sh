@@ -103,6 +103,8 @@ export ESPHOME_BIN="${ECD_ESPHOME_BIN:-esphome}"
 export PLATFORMIO_PLATFORMS_DIR="${pio_cache_base}/platforms"
 export PLATFORMIO_PACKAGES_DIR="${pio_cache_base}/packages"
 export PLATFORMIO_CACHE_DIR="${pio_cache_base}/cache"
+export ECD_COMPILER_CACHE="$(as_bool "${ECD_COMPILER_CACHE:-false}")"
+export ECD_COMPILER_CACHE_DIR="${ECD_COMPILER_CACHE_DIR:-${pio_cache_base}/ccache}"
 export HOME="/root"
 
 mkdir -p "$pio_cache_base"
@@ -125,6 +127,9 @@ echo "[info] Mode: $ECD_MODE"
 echo "[info] Storage mode: $ECD_STORAGE_MODE"
 echo "[info] Port: $PORT"
 echo "[info] PlatformIO packages dir: $PLATFORMIO_PACKAGES_DIR"
+if [ "$ECD_COMPILER_CACHE" = "1" ]; then
+  echo "[info] Compiler cache dir: $ECD_COMPILER_CACHE_DIR"
+fi
 echo "[info] Target dir: $TARGET_DIR"
 echo "[info] Project dir: $PROJECT_DIR"
 echo "[info] ESPHome config dir: $ESPHOME_CONFIG_DIR"
@@ -1,4 +1,9 @@
+import atexit
 import base64
+import bisect
+import errno
+import gzip
+import hashlib
 import hmac
 import json
 import mimetypes
@@ -7,29 +12,44 @@ import queue
 import re
 import io
 import select
+import selectors
 import subprocess
 import shutil
+import tempfile
 import threading
 import uuid
 import pty
 import time
 import socket
+import struct
 import shlex
 import posixpath
 import zipfile
-from collections import deque
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Tuple
-from urllib.parse import quote
+from typing import Callable, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
 
 from flask import Flask, Response, jsonify, make_response, request, send_file, send_from_directory
 
 try:
-    from zeroconf import IPVersion, Zeroconf
+    from zeroconf import IPVersion, ServiceBrowser, ServiceStateChange, Zeroconf
 except Exception:
     IPVersion = None
+    ServiceBrowser = None
+    ServiceStateChange = None
     Zeroconf = None
 
+try:
+    import brotli
+except Exception:
+    brotli = None
+
 TRUTHY_VALUES = {"1", "true", "yes", "on"}
 
 
@@ -53,6 +73,17 @@ ECD_AUTH_USERNAME = os.environ.get("ECD_AUTH_USERNAME", "").strip()
 ECD_AUTH_PASSWORD = os.environ.get("ECD_AUTH_PASSWORD", "")
 ECD_AUTH_PASSWORD_FILE = os.environ.get("ECD_AUTH_PASSWORD_FILE", "").strip()
 ECD_STATUS_USE_PING = is_truthy(os.environ.get("ECD_STATUS_USE_PING", "false"))
+STATUS_PROBE_WORKERS = max(1, int(os.environ.get("ECD_STATUS_PROBE_WORKERS", "32")))
+STATUS_PROBE_DEADLINE = float(os.environ.get("ECD_STATUS_PROBE_DEADLINE", "5"))
+ECD_MDNS_BROWSER = is_truthy(os.environ.get("ECD_MDNS_BROWSER", "true"))
+MDNS_BROWSER_WARMUP = float(os.environ.get("ECD_MDNS_BROWSER_WARMUP", "10"))
+MDNS_PRESENCE_MAX_AGE = max(30.0, float(os.environ.get("ECD_MDNS_PRESENCE_MAX_AGE", "300")))
+MDNS_SERVICE_TYPES = ("_esphomelib._tcp.local.", "_esphome._tcp.local.")
+ECD_STATUS_MONITOR = is_truthy(os.environ.get("ECD_STATUS_MONITOR", "true"))
+STATUS_MONITOR_INTERVAL = max(5.0, float(os.environ.get("ECD_STATUS_MONITOR_INTERVAL", "60")))
+STATUS_MONITOR_FAST_INTERVAL = max(1.0, float(os.environ.get("ECD_STATUS_MONITOR_FAST_INTERVAL", "10")))
+STATUS_MONITOR_MAX_INTERVAL = max(STATUS_MONITOR_INTERVAL, float(os.environ.get("ECD_STATUS_MONITOR_MAX_INTERVAL", "900")))
+STATUS_MONITOR_RECENT_WINDOW = 300.0
 
 TARGET_DIR = os.environ.get("TARGET_DIR", "/config/esphome").strip()
 PROJECT_DIR = os.environ.get("PROJECT_DIR", "/config/esphome/esp_projects").strip()
@@ -60,6 +91,7 @@ PORT = int(os.environ.get("PORT", "8099"))
 
 JOB_DIR = os.environ.get("JOB_DIR", "/data/jobs").strip()
 ESPHOME_BIN = os.environ.get("ESPHOME_BIN", "esphome").strip()
+PLATFORMIO_BIN = os.environ.get("ECD_PLATFORMIO_BIN", "platformio").strip()
 ESPHOME_CONFIG_DIR = os.environ.get("ESPHOME_CONFIG_DIR", "/config/esphome").strip()
 ESPHOME_DATA_DIR = os.environ.get("ESPHOME_DATA_DIR", "/data/esphome").strip()
 ESPHOME_BUILD_PATH = os.environ.get("ESPHOME_BUILD_PATH", "").strip()
@@ -67,6 +99,60 @@ WEB_ROOT = os.environ.get("WEB_ROOT", "/web").strip()
 DEVICES_PATH = os.environ.get("DEVICES_PATH", "/data/devices.json").strip()
 PING_PORT = int(os.environ.get("PING_PORT", "3232"))
 PING_TIMEOUT = float(os.environ.get("PING_TIMEOUT", "0.8"))
+DEVICE_STATUS_BATCH_MAX = max(1, int(os.environ.get("ECD_DEVICE_STATUS_BATCH_MAX", "500")))
+DEVICES_FLUSH_DELAY = float(os.environ.get("ECD_DEVICES_FLUSH_DELAY", "2"))
+DEVICE_HISTORY_DIR = os.environ.get("DEVICE_HISTORY_DIR", "/data/device_history").strip()
+DEVICE_HISTORY_MAX_EVENTS = max(16, int(os.environ.get("ECD_DEVICE_HISTORY_MAX_EVENTS", "2048")))
+DEVICE_HISTORY_RETENTION = float(os.environ.get("ECD_DEVICE_HISTORY_DAYS", "30")) * 86400
+OTA_PROBE_MAX_SOCKETS = max(1, int(os.environ.get("ECD_OTA_PROBE_MAX_SOCKETS", "512")))
+DNS_CACHE_TTL = float(os.environ.get("ECD_DNS_CACHE_TTL", "60"))
+DNS_NEGATIVE_TTL = float(os.environ.get("ECD_DNS_NEGATIVE_TTL", "15"))
+DNS_TIMEOUT = float(os.environ.get("ECD_DNS_TIMEOUT", "2"))
+DNS_CACHE_SIZE = max(16, int(os.environ.get("ECD_DNS_CACHE_SIZE", "1024")))
+DNS_RESOLVER_WORKERS = max(1, int(os.environ.get("ECD_DNS_RESOLVER_WORKERS", "16")))
+
+ECD_COMPILER_CACHE = is_truthy(os.environ.get("ECD_COMPILER_CACHE", "false"))
+COMPILER_CACHE_BIN = os.environ.get("ECD_CCACHE_BIN", "ccache").strip()
+COMPILER_CACHE_DIR = os.environ.get("ECD_COMPILER_CACHE_DIR", "/data/ccache").strip()
+COMPILER_CACHE_MAX_SIZE = os.environ.get("ECD_COMPILER_CACHE_MAX_SIZE", "5G").strip()
+COMPILER_CACHE_SCRIPT_NAME = "ecd_ccache.py"
+BUILD_HISTORY_PATH = os.environ.get("BUILD_HISTORY_PATH", "/data/build_history.json").strip()
+BUILD_GC_MAX_BYTES = int(float(os.environ.get("ECD_BUILD_GC_MAX_MB", "0")) * 1024 * 1024)
+BUILD_GC_INTERVAL = float(os.environ.get("ECD_BUILD_GC_INTERVAL", "3600"))
+ARTIFACTS_DIR = os.environ.get("ARTIFACTS_DIR", "/data/artifacts").strip()
+ARTIFACT_KEEP = max(1, int(os.environ.get("ECD_ARTIFACT_KEEP", "3")))
+ARTIFACT_MAX_BYTES = int(float(os.environ.get("ECD_ARTIFACT_MAX_MB", "0")) * 1024 * 1024)
+SCHEMA_CACHE_DIR = os.environ.get("SCHEMA_CACHE_DIR", "/data/schema_cache").strip()
+CATALOG_REVISIONS_PATH = os.environ.get("CATALOG_REVISIONS_PATH", "/data/catalog_revisions.json").strip()
+CATALOG_REVISIONS_MAX_REMOVED = max(100, int(os.environ.get("ECD_CATALOG_REVISIONS_MAX_REMOVED", "5000")))
+CATALOG_REVISIONS_RESCAN = max(1.0, float(os.environ.get("ECD_CATALOG_REVISIONS_RESCAN", "30")))
+SEARCH_INDEX_RESCAN = max(1.0, float(os.environ.get("ECD_SEARCH_INDEX_RESCAN", "30")))
+STATIC_CACHE_DIR = os.environ.get("STATIC_CACHE_DIR", "/data/static_cache").strip()
+ECD_PRECOMPRESS_STATIC = is_truthy(os.environ.get("ECD_PRECOMPRESS_STATIC", "true"))
+STATIC_PRECOMPRESS_EXTENSIONS = {".json"}
+STATIC_PRECOMPRESS_MIN_BYTES = 512
+STATIC_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ECD_PREPARE_TOOLCHAINS_ON_START = is_truthy(os.environ.get("ECD_PREPARE_TOOLCHAINS_ON_START", "false"))
+
+ECD_WORKER_MODE = is_truthy(os.environ.get("ECD_WORKER_MODE", "false"))
+ECD_WORKER_TOKEN = os.environ.get("ECD_WORKER_TOKEN", "")
+ECD_BUILD_WORKERS = os.environ.get("ECD_BUILD_WORKERS", "").strip()
+WORKERS_PATH = os.environ.get("WORKERS_PATH", "/data/workers.json").strip()
+WORKER_WORKSPACE_ROOT = os.environ.get("WORKER_WORKSPACE_ROOT", "/data/worker").strip()
+WORKER_HEALTH_INTERVAL = float(os.environ.get("ECD_WORKER_HEALTH_INTERVAL", "30"))
+WORKER_REQUEST_TIMEOUT = float(os.environ.get("ECD_WORKER_REQUEST_TIMEOUT", "30"))
+WORKER_BUNDLE_MAX_BYTES = int(float(os.environ.get("ECD_WORKER_BUNDLE_MAX_MB", "50")) * 1024 * 1024)
+WORKER_WORKSPACE_TTL = float(os.environ.get("ECD_WORKER_WORKSPACE_DAYS", "7")) * 86400
+WORKER_WORKSPACE_ORPHAN_TTL = 3600.0
+WORKER_BUNDLE_EXCLUDED_DIRS = {
+    ".esphome",
+    ".git",
+    ".pioenvs",
+    "__pycache__",
+    "build",
+    "esp_components",
+    "esp_projects",
+}
 
 ASSET_ROOT = os.environ.get("ASSET_ROOT", "/config/esphome/esp_assets").strip()
 ASSET_FONTS_DIR = os.path.join(ASSET_ROOT, "fonts")
@@ -82,12 +168,20 @@ SECRETS_RAW_MAX_BYTES = 256 * 1024
 
 COMPONENTS_RUNTIME_ROOTNAME = "esp_components"
 COMPONENTS_RUNTIME_FILENAME = "components_list.json"
+COMPONENTS_RUNTIME_STAGING_DIRNAME = ".staging"
 COMPONENTS_BASE_LIST_PATH = os.path.join(WEB_ROOT, "components_list", "components_list.json")
 COMPONENTS_BASE_SCHEMAS_ROOT = os.path.join(WEB_ROOT, "schemas", "components")
-COMPONENTS_IMPORT_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
-COMPONENTS_IMPORT_MAX_FILES = 500
-COMPONENTS_IMPORT_MAX_UNPACKED_BYTES = 30 * 1024 * 1024
+COMPONENTS_IMPORT_MAX_UPLOAD_BYTES = int(float(os.environ.get("ECD_COMPONENTS_IMPORT_MAX_MB", "10")) * 1024 * 1024)
+COMPONENTS_IMPORT_MAX_FILES = max(1, int(os.environ.get("ECD_COMPONENTS_IMPORT_MAX_FILES", "500")))
+COMPONENTS_IMPORT_MAX_UNPACKED_BYTES = int(float(os.environ.get("ECD_COMPONENTS_IMPORT_MAX_UNPACKED_MB", "30")) * 1024 * 1024)
+COMPONENTS_IMPORT_SPOOL_BYTES = 1024 * 1024
+COMPONENTS_IMPORT_WORKERS = max(1, int(os.environ.get("ECD_COMPONENTS_IMPORT_WORKERS", str(min(8, os.cpu_count() or 1)))))
 COMPONENTS_IMPORT_MAX_ITEM_ERRORS = 100
+COMPONENTS_EXPORT_CHUNK_BYTES = 64 * 1024
+COMPONENTS_SCHEMA_BUNDLE_MAX = 1000
+COMPONENTS_SCHEMA_BUNDLE_CACHE_SIZE = 32
+PROJECT_VALIDATE_MAX_PROJECTS = max(1, int(os.environ.get("ECD_PROJECT_VALIDATE_MAX_PROJECTS", "200")))
+PROJECT_VALIDATOR_CACHE_SIZE = 2048
 
 ASSET_ALLOWED_EXTENSIONS = {
     "fonts": {".ttf", ".otf"},
@@ -128,6 +222,8 @@ ASSET_ALLOWED_MIME = {
 
 ASSET_LOCK = threading.Lock()
 COMPONENTS_LOCK = threading.Lock()
+METRICS_LOCK = threading.Lock()
+BUILD_HISTORY_LOCK = threading.Lock()
 
 SEED_ROOT = os.environ.get("SEED_ROOT", "/seed_esphome").strip()
 
@@ -556,6 +652,28 @@ def components_runtime_schemas_root() -> str:
     return os.path.join(components_runtime_root(), "schemas", "components")
 
 
+def components_runtime_staging_root() -> str:
+    # Kept under the runtime root so staged schemas move into place with os.replace.
+    return os.path.join(components_runtime_root(), COMPONENTS_RUNTIME_STAGING_DIRNAME)
+
+
+def prune_component_import_staging() -> List[str]:
+    """Delete ``.import-*`` staging folders left behind by imports that never finished
+    (the process died mid-import). Only called at startup, before any import runs."""
+    removed = []
+    for root in (components_runtime_staging_root(), components_runtime_root()):
+        try:
+            names = os.listdir(root)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(root, name)
+            if name.startswith(".import-") and os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+    return removed
+
+
 def default_components_catalog() -> dict:
     return {
         "generatedAt": utc_now(),
@@ -583,11 +701,10 @@ def load_components_catalog(path: str) -> dict:
 def save_runtime_components_catalog(payload: dict) -> None:
     data = dict(payload or {})
     data["generatedAt"] = utc_now()
-    path = components_runtime_list_path()
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as handle:
-        json.dump(data, handle, ensure_ascii=False, indent=2)
-        handle.write("\n")
+    # Atomic so MergedCatalogCache, which reads without the catalog lock, never
+    # sees a half-written file.
+    write_json_file_atomic(components_runtime_list_path(), data)
+    merged_catalog_cache.invalidate()
 
 
 def safe_zip_component_package_member_path(name: str) -> str:
@@ -857,56 +974,6 @@ def ensure_category_path(catalog_payload: dict, category_chain: List[dict]) -> l
     return current_category["items"]
 
 
-def remove_catalog_item(catalog_payload: dict, component_id: str) -> Optional[dict]:
-    categories = catalog_payload.get("categories")
-    if not isinstance(categories, list):
-        return None
-    for items, index, item in iter_catalog_item_refs(categories):
-        if isinstance(item, dict) and str(item.get("id") or "").strip().lower() == component_id:
-            removed = items[index]
-            del items[index]
-            return removed
-    return None
-
-
-def remove_catalog_item_by_key(catalog_payload: dict, entry_key: str) -> Optional[dict]:
-    categories = catalog_payload.get("categories")
-    if not isinstance(categories, list):
-        return None
-    target_key = str(entry_key or "").strip().lower()
-    if not target_key:
-        return None
-    for items, index, item in iter_catalog_item_refs(categories):
-        if isinstance(item, dict) and component_catalog_entry_key(item) == target_key:
-            removed = items[index]
-            del items[index]
-            return removed
-    return None
-
-
-def find_catalog_item_ref(catalog_payload: dict, component_id: str):
-    categories = catalog_payload.get("categories")
-    if not isinstance(categories, list):
-        return None
-    target_id = str(component_id or "").strip().lower()
-    if not target_id:
-        return None
-    for items, index, item in iter_catalog_item_refs(categories):
-        if isinstance(item, dict) and str(item.get("id") or "").strip().lower() == target_id:
-            return items, index, item
-    return None
-
-
-def remove_catalog_item_all_by_key(catalog_payload: dict, entry_key: str) -> int:
-    removed_count = 0
-    while True:
-        removed = remove_catalog_item_by_key(catalog_payload, entry_key)
-        if not removed:
-            break
-        removed_count += 1
-    return removed_count
-
-
 def iter_category_nodes(categories: list, chain: Optional[List[dict]] = None):
     current_chain = list(chain or [])
     for category in categories:
@@ -930,9 +997,10 @@ def apply_runtime_catalog_into_merged(merged_catalog: dict, runtime_catalog: dic
     if not isinstance(runtime_categories, list):
         return
 
+    merged = ComponentCatalog(merged_catalog)
     applied_keys = set()
     for runtime_category, chain in iter_category_nodes(runtime_categories):
-        target_items = ensure_category_path(merged_catalog, chain)
+        merged.category_items(chain)
         source_items = runtime_category.get("items")
         if not isinstance(source_items, list):
             continue
@@ -942,9 +1010,10 @@ def apply_runtime_catalog_into_merged(merged_catalog: dict, runtime_catalog: dic
                 continue
             entry_key = component_catalog_entry_key(normalized)
             if entry_key not in applied_keys:
-                remove_catalog_item_all_by_key(merged_catalog, entry_key)
+                merged.remove_key(entry_key)
                 applied_keys.add(entry_key)
-            target_items.append(normalized)
+            merged.append(chain, normalized)
+    merged.compact()
 
 
 def merge_component_catalogs(base_catalog: dict, runtime_catalog: Optional[dict]) -> dict:
@@ -955,572 +1024,3970 @@ def merge_component_catalogs(base_catalog: dict, runtime_catalog: Optional[dict]
     return merged
 
 
-def slugify_component_key(value: str) -> str:
-    lowered = str(value or "").strip().lower()
-    lowered = re.sub(r"[^a-z0-9_-]+", "-", lowered)
-    lowered = re.sub(r"-+", "-", lowered).strip("-_")
-    token = normalize_component_token(lowered)
-    if token:
-        return token
-    return ""
-
-
-def runtime_schema_target_path(schema_path: str) -> str:
-    relative = str(schema_path or "").strip().replace("\\", "/")
-    if not relative.startswith("components/"):
-        return ""
-    full_path = os.path.normpath(os.path.join(components_runtime_root(), "schemas", relative))
-    schemas_root = os.path.normpath(os.path.join(components_runtime_root(), "schemas"))
+def catalog_source_stamp(path: str) -> Optional[Tuple[int, int]]:
     try:
-        common = os.path.commonpath([schemas_root, full_path])
-    except ValueError:
-        return ""
-    if common != schemas_root:
-        return ""
-    return full_path
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 
-def parse_zip_components_catalog(catalog_payload: dict) -> Tuple[List[dict], List[str]]:
-    errors = []
-    entries = []
-    categories = catalog_payload.get("categories")
-    if not isinstance(categories, list):
-        return [], ["components_list.json must contain categories"]
+class MergedCatalogCache:
+    """Keep the serialized merged component catalog until one of its sources changes.
 
-    for category, chain in iter_category_nodes(categories):
-        items = category.get("items")
-        if not isinstance(items, list):
-            continue
-        for item in items:
-            normalized, error = normalize_component_entry(item)
-            if not normalized:
-                if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
-                    errors.append(error)
-                continue
-            entries.append({"entry": normalized, "chain": chain})
+    The cache key combines the base and runtime catalog paths with their mtime and size
+    and a generation counter. Writers of the runtime catalog call ``invalidate`` so edits
+    that land within the filesystem timestamp resolution are never served stale.
+    """
 
-    if not entries:
-        errors.append("No valid component entries found in components_list.json")
-    return entries, errors
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.key = None
+        self.body = b""
+        self.etag = ""
+        self.catalog: Optional[dict] = None
+        self.stats = {"hits": 0, "builds": 0, "not_modified": 0}
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.key = None
 
+    def current_key(self) -> tuple:
+        base_path = COMPONENTS_BASE_LIST_PATH
+        runtime_path = components_runtime_list_path()
+        return (
+            base_path,
+            catalog_source_stamp(base_path),
+            runtime_path,
+            catalog_source_stamp(runtime_path),
+            self.generation,
+        )
 
-def normalize_component_schema_relpath(value: str) -> str:
-    raw = str(value or "").strip().replace("\\", "/")
-    if not raw:
-        return ""
-    if raw.startswith("/"):
-        return ""
-    normalized = posixpath.normpath(raw)
-    if normalized in ("", ".", ".."):
-        return ""
-    if normalized.startswith("../") or "/../" in normalized:
-        return ""
-    if normalized.startswith("schemas/"):
-        normalized = normalized[len("schemas/") :]
-    if not normalized.startswith("components/"):
-        return ""
-    if not normalized.endswith(".json"):
-        return ""
-    return normalized
+    def get(self) -> Tuple[bytes, str]:
+        """Return the ``{"status": "ok", "catalog": ...}`` response body and its ETag."""
+        with self.lock:
+            key = self.current_key()
+            if key == self.key:
+                self.stats["hits"] += 1
+                return self.body, self.etag
+            base_catalog = load_components_catalog(key[0])
+            runtime_catalog = load_components_catalog(key[2]) if key[3] is not None else None
+            merged = merge_component_catalogs(base_catalog, runtime_catalog)
+            body = json.dumps({"status": "ok", "catalog": merged}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.body = body
+            self.etag = hashlib.sha256(body).hexdigest()
+            self.catalog = merged
+            self.key = key
+            self.stats["builds"] += 1
+            return self.body, self.etag
+
+    def current(self) -> Tuple[str, dict]:
+        """Return the ETag and merged catalog dict, rebuilding first if a source changed."""
+        self.get()
+        with self.lock:
+            return self.etag, self.catalog
 
+    def note_not_modified(self) -> None:
+        with self.lock:
+            self.stats["not_modified"] += 1
 
-def resolve_component_schema_path(base_root: str, relpath: str) -> str:
-    root = os.path.normpath(base_root)
-    candidate = os.path.normpath(os.path.join(root, relpath.replace("/", os.sep)))
-    try:
-        common = os.path.commonpath([root, candidate])
-    except ValueError:
-        return ""
-    if common != root:
-        return ""
-    return candidate
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "generation": self.generation, "bytes": len(self.body) if self.key else 0}
 
 
-def load_empty_custom_template() -> dict:
-    template_path = os.path.join(COMPONENTS_BASE_SCHEMAS_ROOT, "custom", "empty.json")
-    template = read_json_file(template_path)
-    if isinstance(template, dict):
-        return template
-    return {
-        "id": "custom.empty",
-        "domain": "custom",
-        "platform": "empty",
-        "helpUrl": "",
-        "uiLabelField": "name",
-        "defaultLabel": "Empty Component",
-        "renderStrategy": "verbatim_root",
-        "verbatimField": "custom_config",
-        "fields": [
-            {
-                "key": "name",
-                "type": "text",
-                "required": False,
-                "lvl": "simple",
-                "placeholder": "Custom component name",
-                "emitYAML": "never",
-            },
-            {
-                "key": "custom_config",
-                "type": "raw_yaml",
-                "required": False,
-                "lvl": "simple",
-                "placeholder": "# Enter raw YAML that should be emitted as-is",
-            },
-        ],
-    }
+merged_catalog_cache = MergedCatalogCache()
 
 
-def build_custom_component_schema(key: str) -> dict:
-    schema = json.loads(json.dumps(load_empty_custom_template()))
-    schema["id"] = f"custom.{key}"
-    schema["domain"] = "custom"
-    schema["platform"] = key
-    fields = schema.get("fields")
-    if isinstance(fields, list):
-        for field in fields:
-            if not isinstance(field, dict):
-                continue
-            field_key = str(field.get("key") or "").strip()
-            if field_key in ("name", "custom_config") and "default" in field:
-                field.pop("default", None)
+class ComponentCatalog:
+    """Catalog payload with entry-key, id and custom-name indexes over its category tree.
 
-    return schema
+    Entries are addressed by ``(items list, index)`` slots, so lookups, upserts and
+    deletes do not rescan the tree. A delete leaves a tombstone in its slot to keep the
+    other slots valid; reading ``payload`` compacts the touched lists and reindexes.
+    """
 
+    REMOVED = object()
 
-def bootstrap_storage() -> None:
-    os.makedirs(TARGET_DIR, exist_ok=True)
-    # Seed initial project/asset structure once at startup.
-    seed_tree(SEED_ROOT, TARGET_DIR)
-    seed_assets()
-    os.makedirs(components_runtime_schemas_root(), exist_ok=True)
-    sync_assets("all")
+    def __init__(self, payload: Optional[dict] = None) -> None:
+        self.data = payload if isinstance(payload, dict) else default_components_catalog()
+        if not isinstance(self.data.get("categories"), list):
+            self.data["categories"] = []
+        self.dirty = False
+        self.categories = {}
+        self.tombstoned = {}
+        self._reindex()
 
+    def _reindex(self) -> None:
+        self.by_key = {}
+        self.by_id = {}
+        self.by_custom_name = {}
+        for items, index, item in iter_catalog_item_refs(self.data["categories"]):
+            self._index(items, index)
 
-def load_devices() -> List[dict]:
-    if not os.path.isfile(DEVICES_PATH):
-        return []
-    try:
-        with open(DEVICES_PATH, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-        if isinstance(data, list):
-            return [item for item in data if isinstance(item, dict)]
-    except Exception:
-        return []
-    return []
+    def _tokens(self, item: dict) -> list:
+        item_id = str(item.get("id") or "").strip().lower()
+        tokens = [(self.by_key, component_catalog_entry_key(item)), (self.by_id, item_id)]
+        if item_id.startswith("custom/"):
+            tokens.append((self.by_custom_name, str(item.get("name") or "").strip().lower()))
+        return tokens
 
+    def _index(self, items: list, index: int) -> None:
+        item = items[index]
+        if not isinstance(item, dict):
+            return
+        for table, token in self._tokens(item):
+            if token:
+                table.setdefault(token, []).append((items, index))
 
-def save_devices(devices: List[dict]) -> None:
-    os.makedirs(os.path.dirname(DEVICES_PATH), exist_ok=True)
-    with open(DEVICES_PATH, "w", encoding="utf-8") as handle:
-        json.dump(devices, handle, ensure_ascii=False, indent=2)
-        handle.write("\n")
+    def _unindex(self, items: list, index: int) -> None:
+        item = items[index]
+        if not isinstance(item, dict):
+            return
+        for table, token in self._tokens(item):
+            slots = table.get(token)
+            if not slots:
+                continue
+            slots[:] = [slot for slot in slots if not (slot[0] is items and slot[1] == index)]
+            if not slots:
+                del table[token]
+
+    def _first(self, component_id: str) -> Optional[tuple]:
+        slots = self.by_id.get(str(component_id or "").strip().lower())
+        return slots[0] if slots else None
+
+    def _tombstone(self, items: list, index: int) -> dict:
+        self._unindex(items, index)
+        removed = items[index]
+        items[index] = self.REMOVED
+        self.tombstoned[id(items)] = items
+        self.dirty = True
+        return removed
+
+    def get(self, component_id: str) -> Optional[dict]:
+        slot = self._first(component_id)
+        return slot[0][slot[1]] if slot else None
+
+    def keys(self) -> set:
+        return set(self.by_key)
+
+    def custom_name_taken(self, name: str, exclude_id: str = "") -> bool:
+        exclude = str(exclude_id or "").strip().lower()
+        for items, index in self.by_custom_name.get(str(name or "").strip().lower(), []):
+            if str(items[index].get("id") or "").strip().lower() != exclude:
+                return True
+        return False
 
+    def category_items(self, category_chain: List[dict]) -> list:
+        chain_key = tuple(
+            (str(node.get("slug") or "").strip().lower(), str(node.get("title") or "").strip().lower())
+            for node in category_chain
+        )
+        items = self.categories.get(chain_key)
+        if items is None:
+            items = ensure_category_path(self.data, category_chain)
+            self.categories[chain_key] = items
+        return items
+
+    def append(self, category_chain: List[dict], entry: dict) -> None:
+        items = self.category_items(category_chain)
+        items.append(entry)
+        self._index(items, len(items) - 1)
+        self.dirty = True
+
+    def replace(self, component_id: str, entry: dict) -> Optional[dict]:
+        slot = self._first(component_id)
+        if not slot:
+            return None
+        items, index = slot
+        self._unindex(items, index)
+        previous = items[index]
+        items[index] = entry
+        self._index(items, index)
+        self.dirty = True
+        return previous
+
+    def remove(self, component_id: str) -> Optional[dict]:
+        slot = self._first(component_id)
+        return self._tombstone(*slot) if slot else None
+
+    def remove_key(self, entry_key: str) -> int:
+        slots = list(self.by_key.get(str(entry_key or "").strip().lower(), []))
+        for items, index in slots:
+            self._tombstone(items, index)
+        return len(slots)
+
+    def compact(self) -> None:
+        if not self.tombstoned:
+            return
+        for items in self.tombstoned.values():
+            items[:] = [item for item in items if item is not self.REMOVED]
+        self.tombstoned = {}
+        self._reindex()
 
-def projects_index_path() -> str:
-    return os.path.join(PROJECT_DIR, "projects.json")
+    @property
+    def payload(self) -> dict:
+        self.compact()
+        return self.data
 
+    def items(self) -> List[dict]:
+        return extract_catalog_items(self.payload)
 
-def load_projects_index() -> dict:
-    path = projects_index_path()
-    if not os.path.isfile(path):
-        return {
-            "version": 1,
-            "updatedAt": utc_now(),
-            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
-            "projectPlacement": [],
-        }
-    try:
-        with open(path, "r", encoding="utf-8") as handle:
-            payload = json.load(handle)
-    except Exception:
-        return {
-            "version": 1,
-            "updatedAt": utc_now(),
-            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
-            "projectPlacement": [],
-        }
-    if not isinstance(payload, dict):
-        return {
-            "version": 1,
-            "updatedAt": utc_now(),
-            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
-            "projectPlacement": [],
-        }
-    if not isinstance(payload.get("folders"), list):
-        payload["folders"] = [{"id": "root", "name": "Projects", "parentId": None}]
-    if not isinstance(payload.get("projectPlacement"), list):
-        payload["projectPlacement"] = []
-    if "version" not in payload:
-        payload["version"] = 1
-    return payload
 
+@contextmanager
+def runtime_catalog_transaction(rollback: Optional[Callable[[], None]] = None):
+    """Hold ``COMPONENTS_LOCK`` over the runtime catalog and write it once if it changed.
 
-def save_projects_index(index_payload: dict) -> None:
-    payload = dict(index_payload or {})
-    payload["updatedAt"] = utc_now()
-    path = projects_index_path()
-    write_json_file_atomic(path, payload)
+    ``rollback`` is called, still under the lock, when the body or the catalog write fails.
+    """
+    with COMPONENTS_LOCK:
+        runtime_path = components_runtime_list_path()
+        catalog = ComponentCatalog(load_components_catalog(runtime_path) if os.path.isfile(runtime_path) else None)
+        try:
+            yield catalog
+            if catalog.dirty:
+                save_runtime_components_catalog(catalog.payload)
+        except Exception:
+            if rollback is not None:
+                rollback()
+            raise
 
 
-def write_text_file_atomic(path: str, content: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
-    try:
-        with open(temp_path, "w", encoding="utf-8") as handle:
-            handle.write(content)
-            if not content.endswith("\n"):
-                handle.write("\n")
-        os.replace(temp_path, path)
-    finally:
-        if os.path.isfile(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+def merge_schema_fields_by_key(primary: list, fallback: list) -> list:
+    merged = []
+    seen = set()
+    for field in list(primary) + list(fallback):
+        key = field.get("key") if isinstance(field, dict) else None
+        if not isinstance(key, str):
+            merged.append(field)
+            continue
+        if key not in seen:
+            seen.add(key)
+            merged.append(field)
+    return merged
 
 
-def write_json_file_atomic(path: str, data: dict) -> None:
-    body = json.dumps(data, ensure_ascii=False, indent=2)
-    write_text_file_atomic(path, body)
+class SchemaCompiler:
+    """Resolve component schemas the way the builder's schemaLoader does, on the server.
+
+    ``extends`` bases from ``components/base_component`` are merged in and ``optionsFrom``
+    lists are inlined. Each compiled schema is kept in memory and on disk together with the
+    sha256 of every source file it was built from, and is reused while those hashes match.
+    """
+
+    VERSION = 1
+    LIST_EXTENDS = {"base_actions.json", "base_filters.json", "base_binary_sensor_filters.json", "base_conditions.json"}
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.digests = {}
+        self.compiled = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "compiled": 0, "errors": 0}
+
+    @staticmethod
+    def base_root() -> str:
+        return os.path.join(WEB_ROOT, "schemas")
+
+    @staticmethod
+    def runtime_root() -> str:
+        return os.path.join(components_runtime_root(), "schemas")
+
+    def source_digest(self, path: str) -> str:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self.digests.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            digest = file_sha256(path)
+        except OSError:
+            return ""
+        self.digests[path] = (stamp, digest)
+        return digest
+
+    def source_path(self, relpath: str) -> str:
+        for root in (self.runtime_root(), self.base_root()):
+            candidate = resolve_component_schema_path(root, relpath)
+            if candidate and os.path.isfile(candidate):
+                return candidate
+        return ""
+
+    def schema_paths(self) -> List[str]:
+        paths = set()
+        for root in (self.runtime_root(), self.base_root()):
+            components_root = os.path.join(root, "components")
+            for dirpath, dirnames, filenames in os.walk(components_root):
+                dirnames[:] = sorted(name for name in dirnames if not (dirpath == components_root and name == "base_component"))
+                for filename in filenames:
+                    if filename.endswith(".json"):
+                        relpath = os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/")
+                        paths.add(relpath)
+        return sorted(paths)
+
+    def _fresh(self, sources: dict) -> bool:
+        return all(self.source_digest(path) == digest for path, digest in sources.items())
+
+    def _cache_path(self, source_path: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(source_path.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_source(self, path: str, sources: dict):
+        digest = self.source_digest(path)
+        if not digest:
+            raise ValueError(f"Schema not found: {path}")
+        data = read_json_file(path)
+        if data is None:
+            raise ValueError(f"Invalid schema JSON: {path}")
+        sources[path] = digest
+        return data
+
+    def _read_static(self, relpath: str, sources: dict):
+        path = resolve_component_schema_path(self.base_root(), str(relpath or ""))
+        if not path:
+            raise ValueError(f"Invalid schema reference: {relpath}")
+        return self._read_source(path, sources)
+
+    def _resolve_base(self, name: str, sources: dict, stack: tuple) -> dict:
+        if name in stack:
+            raise ValueError(f"Circular extends: {name}")
+        base = self._read_static(f"components/base_component/{name}", sources)
+        return self._resolve_schema(base if isinstance(base, dict) else {}, sources, stack + (name,))
+
+    def _resolve_field(self, field, sources: dict, stack: tuple):
+        if not isinstance(field, dict):
+            return field
+        resolved = field
+        extends = field.get("extends")
+        if extends:
+            base = None
+            base_fields = []
+            if extends not in self.LIST_EXTENDS:
+                base = self._resolve_base(extends, sources, stack)
+                base_fields = base.get("fields") if isinstance(base.get("fields"), list) else []
+            own_fields = field.get("fields") if isinstance(field.get("fields"), list) else []
+            resolved = {}
+            if base is not None:
+                own_embedded = field.get("embedded") if isinstance(field.get("embedded"), list) else []
+                base_embedded = base.get("embedded") if isinstance(base.get("embedded"), list) else []
+                resolved["embedded"] = merge_schema_fields_by_key(own_embedded, base_embedded)
+                resolved["requirements"] = [
+                    *(base.get("requirements") if isinstance(base.get("requirements"), list) else []),
+                    *(field.get("requirements") if isinstance(field.get("requirements"), list) else []),
+                ]
+                help_url = field.get("helpUrl") or base.get("helpUrl")
+                if help_url:
+                    resolved["helpUrl"] = help_url
+            resolved.update(field)
+            resolved["fields"] = merge_schema_fields_by_key(own_fields, base_fields)
+        if resolved.get("type") == "object" and isinstance(resolved.get("fields"), list):
+            resolved = {**resolved, "fields": [self._resolve_field(item, sources, stack) for item in resolved["fields"]]}
+        if resolved.get("type") == "list" and resolved.get("item"):
+            resolved = {**resolved, "item": self._resolve_field(resolved["item"], sources, stack)}
+        if resolved.get("optionsFrom"):
+            options = self._read_static(resolved["optionsFrom"], sources)
+            if isinstance(options, dict):
+                options = options.get("options")
+            resolved = {**resolved, "options": options if isinstance(options, list) else []}
+        return resolved
+
+    def _resolve_schema(self, schema: dict, sources: dict, stack: tuple) -> dict:
+        base_fields = []
+        extends = schema.get("extends")
+        if extends:
+            base = self._resolve_base(extends, sources, stack)
+            base_fields = base.get("fields") if isinstance(base.get("fields"), list) else []
+        own_fields = schema.get("fields") if isinstance(schema.get("fields"), list) else []
+        fields = [self._resolve_field(field, sources, stack) for field in own_fields]
+        return {**schema, "fields": merge_schema_fields_by_key(fields, base_fields)}
+
+    def compile(self, relpath: str) -> dict:
+        """Return the resolved schema for a ``components/...json`` path, runtime copies first."""
+        source_path = self.source_path(relpath)
+        if not source_path:
+            raise ValueError(f"Schema not found: {relpath}")
+        with self.lock:
+            entry = self.compiled.get(relpath)
+            if entry and entry["path"] == source_path and self._fresh(entry["sources"]):
+                self.stats["memory_hits"] += 1
+                return entry["schema"]
+            cache_path = self._cache_path(source_path)
+            entry = read_json_file(cache_path)
+            if (
+                isinstance(entry, dict)
+                and entry.get("version") == self.VERSION
+                and entry.get("path") == source_path
+                and isinstance(entry.get("sources"), dict)
+                and self._fresh(entry["sources"])
+            ):
+                self.stats["disk_hits"] += 1
+                self.compiled[relpath] = entry
+                return entry["schema"]
+            sources = {}
+            try:
+                schema = self._read_source(source_path, sources)
+                if not isinstance(schema, dict):
+                    raise ValueError(f"Schema must be an object: {relpath}")
+                compiled = self._resolve_schema(schema, sources, ())
+            except ValueError:
+                self.stats["errors"] += 1
+                raise
+            entry = {"version": self.VERSION, "path": source_path, "sources": sources, "schema": compiled}
+            self.compiled[relpath] = entry
+            self.stats["compiled"] += 1
+            try:
+                write_json_file_atomic(cache_path, entry)
+            except OSError:
+                pass
+            return compiled
+
+    def compile_many(self, relpaths: List[str]) -> Tuple[dict, dict]:
+        schemas = {}
+        errors = {}
+        for relpath in relpaths:
+            try:
+                schemas[relpath] = self.compile(relpath)
+            except ValueError as exc:
+                errors[relpath] = str(exc)
+        return schemas, errors
+
+    def bundle_etag(self, relpaths: List[str], compiled: bool) -> str:
+        """Hash the source files behind a set of schemas without building the response body."""
+        digest = hashlib.sha256(f"{self.VERSION}:{int(bool(compiled))}".encode("ascii"))
+        for relpath in relpaths:
+            source_path = self.source_path(relpath)
+            digest.update(f"\0{relpath}\0{source_path}".encode("utf-8"))
+            if not source_path:
+                continue
+            if not compiled:
+                digest.update(f"\0{self.source_digest(source_path)}".encode("ascii"))
+                continue
+            try:
+                self.compile(relpath)
+            except ValueError as exc:
+                digest.update(f"\0{exc}".encode("utf-8"))
+                continue
+            with self.lock:
+                sources = dict(self.compiled[relpath]["sources"])
+            for path, sha256 in sorted(sources.items()):
+                digest.update(f"\0{path}\0{sha256}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "entries": len(self.compiled)}
+
+
+schema_compiler = SchemaCompiler(SCHEMA_CACHE_DIR)
+SCHEMA_BUNDLE_GZIP_CACHE = OrderedDict()
+SCHEMA_BUNDLE_GZIP_LOCK = threading.Lock()
+
+
+def gzip_schema_bundle(etag: str, body: bytes) -> bytes:
+    with SCHEMA_BUNDLE_GZIP_LOCK:
+        cached = SCHEMA_BUNDLE_GZIP_CACHE.get(etag)
+        if cached is not None:
+            SCHEMA_BUNDLE_GZIP_CACHE.move_to_end(etag)
+            return cached
+    compressed = gzip.compress(body, compresslevel=6, mtime=0)
+    with SCHEMA_BUNDLE_GZIP_LOCK:
+        SCHEMA_BUNDLE_GZIP_CACHE[etag] = compressed
+        while len(SCHEMA_BUNDLE_GZIP_CACHE) > COMPONENTS_SCHEMA_BUNDLE_CACHE_SIZE:
+            SCHEMA_BUNDLE_GZIP_CACHE.popitem(last=False)
+    return compressed
+
+
+class StaticAssetCache:
+    """Precompressed copies and content-hashed URLs for the JSON files under the web root.
+
+    ``build`` hashes every JSON file and writes ``<sha256>.json.gz`` (and ``.br`` when the
+    brotli module is available) into the cache directory, so unchanged files are not
+    compressed again after a restart. ``manifest`` maps each logical path to
+    ``h/<hash>/<path>``, which is served with an immutable Cache-Control.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.thread: Optional[threading.Thread] = None
+        self.ready = False
+        self.last_report: Optional[dict] = None
+
+    @staticmethod
+    def hashed_path(relpath: str, digest: str) -> str:
+        return f"h/{digest[:16]}/{relpath}"
+
+    def _compressed(self, digest: str, suffix: str, body: bytes, compress) -> Tuple[str, int]:
+        path = os.path.join(self.cache_dir, f"{digest}.json.{suffix}")
+        if not os.path.isfile(path):
+            write_bytes_file_atomic(path, compress(body))
+        return path, os.path.getsize(path)
+
+    def _build_entry(self, full_path: str, stamp: Tuple[int, int]) -> dict:
+        with open(full_path, "rb") as handle:
+            body = handle.read()
+        digest = hashlib.sha256(body).hexdigest()
+        entry = {"path": full_path, "stamp": stamp, "sha256": digest, "size": len(body), "encodings": {}}
+        if len(body) >= STATIC_PRECOMPRESS_MIN_BYTES:
+            entry["encodings"]["gzip"] = self._compressed(
+                digest, "gz", body, lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+            )
+            if brotli is not None:
+                entry["encodings"]["br"] = self._compressed(digest, "br", body, lambda data: brotli.compress(data, quality=11))
+        return entry
+
+    def build(self) -> dict:
+        web_root = resolve_web_root()
+        started = time.monotonic()
+        entries = {}
+        previous = self.entries
+        if web_root:
+            for dirpath, dirnames, filenames in os.walk(web_root):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1].lower() not in STATIC_PRECOMPRESS_EXTENSIONS:
+                        continue
+                    full_path = os.path.join(dirpath, filename)
+                    relpath = os.path.relpath(full_path, web_root).replace(os.sep, "/")
+                    try:
+                        stat = os.stat(full_path)
+                        stamp = (stat.st_mtime_ns, stat.st_size)
+                        cached = previous.get(relpath)
+                        if cached and cached["path"] == full_path and cached["stamp"] == stamp:
+                            entries[relpath] = cached
+                        else:
+                            entries[relpath] = self._build_entry(full_path, stamp)
+                    except OSError:
+                        continue
+        manifest = {relpath: self.hashed_path(relpath, entry["sha256"]) for relpath, entry in entries.items()}
+        try:
+            write_json_file_atomic(os.path.join(self.cache_dir, "manifest.json"), manifest)
+        except OSError:
+            pass
+        report = {
+            "files": len(entries),
+            "bytes": sum(entry["size"] for entry in entries.values()),
+            "gzip_bytes": sum(entry["encodings"].get("gzip", (None, entry["size"]))[1] for entry in entries.values()),
+            "brotli": brotli is not None,
+            "seconds": round(time.monotonic() - started, 3),
+            "built_at": utc_now(),
+        }
+        with self.lock:
+            self.entries = entries
+            self.ready = True
+            self.last_report = report
+        return report
+
+    def start(self) -> None:
+        if not ECD_PRECOMPRESS_STATIC or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.build, name="ecd-static-assets", daemon=True)
+        self.thread.start()
+
+    def manifest(self) -> dict:
+        with self.lock:
+            return {relpath: self.hashed_path(relpath, entry["sha256"]) for relpath, entry in self.entries.items()}
+
+    def lookup(self, relpath: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.entries.get(relpath)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(entry["path"])
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != entry["stamp"]:
+            return None
+        return entry
+
+    def response(self, entry: dict, immutable: bool = False) -> Response:
+        encoding = ""
+        for candidate in ("br", "gzip"):
+            if candidate in entry["encodings"] and candidate in request.accept_encodings:
+                encoding = candidate
+                break
+        if encoding:
+            path = entry["encodings"][encoding][0]
+            response = send_file(
+                path,
+                mimetype="application/json",
+                download_name=os.path.basename(entry["path"]),
+                etag=f"{entry['sha256']}-{encoding}",
+                conditional=True,
+            )
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = send_file(entry["path"], mimetype="application/json", etag=entry["sha256"], conditional=True)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = STATIC_IMMUTABLE_CACHE_CONTROL if immutable else "no-cache"
+        return response
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {"ready": self.ready, **(self.last_report or {})}
+
+
+static_assets = StaticAssetCache(STATIC_CACHE_DIR)
+
+
+def catalog_entry_placements(catalog_payload: dict) -> dict:
+    """Group the valid entries of a catalog by catalog key with their category chains."""
+    placements = {}
+    categories = catalog_payload.get("categories") if isinstance(catalog_payload, dict) else None
+    if not isinstance(categories, list):
+        return placements
+    for category, chain in iter_category_nodes(categories):
+        for item in category.get("items") or []:
+            normalized, _ = normalize_component_entry(item)
+            if normalized:
+                placements.setdefault(component_catalog_entry_key(normalized), []).append(
+                    {"category": chain, "item": normalized}
+                )
+    return placements
+
+
+class ComponentChangeLog:
+    """Revisioned record of merged catalog entries and schema files for delta sync.
+
+    ``sync`` hashes the current catalog entries (grouped by catalog key) and schema
+    sources and compares them with the previous state. Any difference bumps the revision
+    once and stamps the changed ids with it. Removed ids keep a tombstone until
+    ``max_removed`` newer removals push them out. The state is persisted so revisions
+    survive restarts; a client whose ``since`` is older than the kept tombstones or from
+    another epoch gets a reset with the full listing.
+    """
+
+    KINDS = ("entries", "schemas")
+
+    def __init__(self, path: str, max_removed: int) -> None:
+        self.path = path
+        self.max_removed = max_removed
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.epoch = ""
+        self.revision = 0
+        self.floor = 0
+        self.state = {kind: {} for kind in self.KINDS}
+        self.removed = {kind: {} for kind in self.KINDS}
+        self.placements = {}
+        self.catalog_etag: Optional[str] = None
+        self.schema_stamp = None
+        self.schema_scanned = 0.0
+
+    def _load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        data = read_json_file(self.path) or {}
+        self.epoch = str(data.get("epoch") or uuid.uuid4().hex[:12])
+        try:
+            self.revision = max(0, int(data.get("revision") or 0))
+            self.floor = max(0, int(data.get("floor") or 0))
+        except (TypeError, ValueError):
+            self.revision = self.floor = 0
+        for kind in self.KINDS:
+            state = data.get(kind)
+            if isinstance(state, dict):
+                self.state[kind] = {
+                    ident: entry
+                    for ident, entry in state.items()
+                    if isinstance(entry, dict) and isinstance(entry.get("hash"), str)
+                }
+            removed = data.get(f"removed_{kind}")
+            if isinstance(removed, dict):
+                self.removed[kind] = {ident: rev for ident, rev in removed.items() if isinstance(rev, int)}
+
+    def _persist(self) -> None:
+        payload = {"epoch": self.epoch, "revision": self.revision, "floor": self.floor}
+        for kind in self.KINDS:
+            payload[kind] = self.state[kind]
+            payload[f"removed_{kind}"] = self.removed[kind]
+        try:
+            write_json_file_atomic(self.path, payload)
+        except OSError:
+            pass
+
+    def _apply(self, kind: str, current: dict, revision: int) -> bool:
+        state = self.state[kind]
+        removed = self.removed[kind]
+        changed = False
+        for ident, digest in current.items():
+            entry = state.get(ident)
+            if entry is None:
+                state[ident] = {"hash": digest, "created": revision, "rev": revision}
+                removed.pop(ident, None)
+                changed = True
+            elif entry["hash"] != digest:
+                entry["hash"] = digest
+                entry["rev"] = revision
+                changed = True
+        for ident in [ident for ident in state if ident not in current]:
+            del state[ident]
+            removed[ident] = revision
+            changed = True
+        if len(removed) > self.max_removed:
+            oldest = sorted(removed.items(), key=lambda item: item[1])[: len(removed) - self.max_removed]
+            for ident, rev in oldest:
+                self.floor = max(self.floor, rev)
+                del removed[ident]
+        return changed
+
+    @staticmethod
+    def schema_tree_stamp() -> tuple:
+        """Catalog generation and schema folder mtimes; files added, removed or replaced change it."""
+        stamp = [merged_catalog_cache.generation]
+        for root in (schema_compiler.runtime_root(), schema_compiler.base_root()):
+            for dirpath, dirnames, _ in os.walk(os.path.join(root, "components")):
+                dirnames.sort()
+                stamp.append((dirpath, catalog_source_stamp(dirpath)))
+        return tuple(stamp)
+
+    def sync(self, schemas: bool = True) -> int:
+        """Record changes since the last sync and return the current revision.
+
+        Schema files are hashed again only when the schema tree stamp changed or the last
+        full scan is older than ``CATALOG_REVISIONS_RESCAN``, which catches in-place edits.
+        """
+        etag, catalog = merged_catalog_cache.current()
+        schema_stamp = None
+        if schemas:
+            schema_stamp = self.schema_tree_stamp()
+            with self.lock:
+                if schema_stamp == self.schema_stamp and time.monotonic() - self.schema_scanned < CATALOG_REVISIONS_RESCAN:
+                    schemas = False
+        with self.lock:
+            if self.loaded and not schemas and etag == self.catalog_etag:
+                return self.revision
+        schema_digests = None
+        if schemas:
+            schema_digests = {}
+            for relpath in schema_compiler.schema_paths():
+                source_path = schema_compiler.source_path(relpath)
+                digest = schema_compiler.source_digest(source_path) if source_path else ""
+                if digest:
+                    schema_digests[relpath] = digest
+        with self.lock:
+            self._load()
+            pending = self.revision + 1
+            changed = False
+            if etag != self.catalog_etag:
+                self.placements = catalog_entry_placements(catalog)
+                self.catalog_etag = etag
+                entry_hashes = {
+                    key: hashlib.sha256(json.dumps(placements, sort_keys=True).encode("utf-8")).hexdigest()
+                    for key, placements in self.placements.items()
+                }
+                changed = self._apply("entries", entry_hashes, pending)
+            if schema_digests is not None:
+                changed = self._apply("schemas", schema_digests, pending) or changed
+                self.schema_stamp = schema_stamp
+                self.schema_scanned = time.monotonic()
+            if changed:
+                self.revision = pending
+                self._persist()
+            return self.revision
+
+    def changes(self, since: int, epoch: str = "") -> dict:
+        self.sync()
+        with self.lock:
+            reset = since <= 0 or since < self.floor or since > self.revision or bool(epoch and epoch != self.epoch)
+            baseline = 0 if reset else since
+            result = {"epoch": self.epoch, "revision": self.revision, "since": baseline, "reset": reset}
+            for kind in self.KINDS:
+                added = []
+                updated = []
+                for ident in sorted(self.state[kind]):
+                    entry = self.state[kind][ident]
+                    if entry["rev"] <= baseline:
+                        continue
+                    if kind == "entries":
+                        record = {"key": ident, "hash": entry["hash"], "placements": self.placements.get(ident, [])}
+                    else:
+                        record = {"path": ident, "sha256": entry["hash"]}
+                    (added if entry["created"] > baseline else updated).append(record)
+                removed = sorted(ident for ident, rev in self.removed[kind].items() if rev > baseline)
+                result[kind] = {"added": added, "updated": updated, "removed": [] if reset else removed}
+            return result
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {
+                "revision": self.revision,
+                "entries": len(self.state["entries"]),
+                "schemas": len(self.state["schemas"]),
+                "tombstones": sum(len(removed) for removed in self.removed.values()),
+            }
+
+
+catalog_changes = ComponentChangeLog(CATALOG_REVISIONS_PATH, CATALOG_REVISIONS_MAX_REMOVED)
+
+SEARCH_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+SEARCH_TYPES = ("component", "action", "condition", "field")
+SEARCH_MAX_LIMIT = 100
+
+
+def search_tokens(text: str) -> List[str]:
+    return [token for token in SEARCH_TOKEN_SPLIT.split(str(text or "").lower()) if token]
+
+
+class SearchIndex:
+    """Inverted index over catalog components, actions, conditions and schema fields.
+
+    Each document is indexed under the tokens of its label, id, category and description
+    with a per-field weight. Queries match every term, either exactly or as a prefix of an
+    indexed token, and rank by the summed weights. Component documents are rebuilt when
+    the merged catalog changes. Schema files are rescanned after catalog writes, or every
+    ``SEARCH_INDEX_RESCAN`` seconds for files edited in place, and only files whose hash
+    changed are re-read. Field documents also carry their component's id and name.
+    """
+
+    LABEL_WEIGHT = 3.0
+    KEY_WEIGHT = 2.5
+    ID_WEIGHT = 2.0
+    CATEGORY_WEIGHT = 1.0
+    TEXT_WEIGHT = 0.5
+    PREFIX_FACTOR = 0.6
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.docs = {}
+        self.postings = {}
+        self.doc_tokens = {}
+        self.groups = {}
+        self.sorted_tokens: List[str] = []
+        self.tokens_dirty = False
+        self.catalog_etag: Optional[str] = None
+        self.list_stamps = {}
+        self.schema_digests = {}
+        self.schema_components = {}
+        self.indexed_components = {}
+        self.schema_generation: Optional[int] = None
+        self.schema_scanned = 0.0
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {"queries": 0, "refreshes": 0, "schemas_indexed": 0, "schema_scans": 0}
+
+    def _add(self, group: str, doc_id: str, doc: dict, weighted_texts: List[Tuple[str, float]]) -> None:
+        self._remove(doc_id)
+        self.groups.setdefault(group, set()).add(doc_id)
+        weights = {}
+        for text, weight in weighted_texts:
+            for token in search_tokens(text):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        self.docs[doc_id] = doc
+        self.doc_tokens[doc_id] = set(weights)
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                self.tokens_dirty = True
+            postings[doc_id] = weight
+
+    def _remove(self, doc_id: str) -> None:
+        self.docs.pop(doc_id, None)
+        for token in self.doc_tokens.pop(doc_id, ()):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[token]
+                self.tokens_dirty = True
+
+    def _remove_group(self, group: str) -> None:
+        for doc_id in self.groups.pop(group, ()):
+            self._remove(doc_id)
+
+    def _index_catalog(self, catalog: dict) -> None:
+        self._remove_group("catalog")
+        self.schema_components = {}
+        for key, placements in catalog_entry_placements(catalog).items():
+            item = placements[0]["item"]
+            self.schema_components.setdefault(item["schemaPath"], (item["id"], item["name"]))
+            categories = []
+            for placement in placements:
+                title = " / ".join(node.get("title") or node.get("slug") or "" for node in placement["category"])
+                if title and title not in categories:
+                    categories.append(title)
+            doc = {
+                "type": "component",
+                "id": item["id"],
+                "key": key,
+                "label": item["name"],
+                "categories": categories,
+                "schemaPath": item["schemaPath"],
+                "available": item["available"],
+            }
+            texts = [(item["name"], self.LABEL_WEIGHT), (item["id"], self.ID_WEIGHT)]
+            texts.extend((title, self.CATEGORY_WEIGHT) for title in categories)
+            self._add("catalog", f"component:{key}", doc, texts)
+
+    def _index_list(self, kind: str, relpath: str, list_key: str) -> None:
+        path = os.path.join(WEB_ROOT, relpath)
+        stamp = catalog_source_stamp(path)
+        if self.list_stamps.get(kind) == stamp:
+            return
+        self.list_stamps[kind] = stamp
+        self._remove_group(kind)
+        payload = read_json_file(path) if stamp else None
+        entries = payload.get(list_key) if isinstance(payload, dict) else None
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict) or not str(entry.get("id") or "").strip():
+                continue
+            entry_id = str(entry["id"]).strip()
+            doc = {
+                "type": kind,
+                "id": entry_id,
+                "label": str(entry.get("label") or entry_id),
+                "description": str(entry.get("description") or ""),
+                "schemaUrl": str(entry.get("schemaUrl") or ""),
+            }
+            texts = [
+                (doc["label"], self.LABEL_WEIGHT),
+                (entry_id, self.ID_WEIGHT),
+                (str(entry.get("category") or entry.get("domain") or ""), self.CATEGORY_WEIGHT),
+                (doc["description"], self.TEXT_WEIGHT),
+            ]
+            self._add(kind, f"{kind}:{entry_id}", doc, texts)
+
+    def _index_schema_fields(self, relpath: str, schema: dict) -> None:
+        group = f"schema:{relpath}"
+        self._remove_group(group)
+        component_id, component_name = self.schema_components.get(relpath, (str(schema.get("id") or ""), ""))
+        self.indexed_components[relpath] = (component_id, component_name)
+        pending = [("", schema.get("fields"))]
+        while pending:
+            parent, fields = pending.pop()
+            for field in fields if isinstance(fields, list) else []:
+                if not isinstance(field, dict) or not isinstance(field.get("key"), str):
+                    continue
+                field_path = f"{parent}.{field['key']}" if parent else field["key"]
+                doc = {
+                    "type": "field",
+                    "id": field_path,
+                    "label": str(field.get("label") or field["key"]),
+                    "schemaPath": relpath,
+                    "component": str(schema.get("id") or ""),
+                    "fieldType": str(field.get("type") or ""),
+                }
+                texts = [
+                    (field["key"], self.KEY_WEIGHT),
+                    (str(field.get("label") or ""), self.LABEL_WEIGHT),
+                    (str(field.get("note") or ""), self.TEXT_WEIGHT),
+                    (component_id, self.CATEGORY_WEIGHT),
+                    (component_name, self.CATEGORY_WEIGHT),
+                ]
+                self._add(group, f"field:{relpath}#{field_path}", doc, texts)
+                pending.append((field_path, field.get("fields")))
+                if isinstance(field.get("item"), dict):
+                    pending.append((field_path, field["item"].get("fields")))
+
+    def _index_schemas(self) -> None:
+        current = {}
+        for relpath in schema_compiler.schema_paths():
+            source_path = schema_compiler.source_path(relpath)
+            digest = schema_compiler.source_digest(source_path) if source_path else ""
+            if not digest:
+                continue
+            current[relpath] = digest
+            if self.schema_digests.get(relpath) == digest and (
+                relpath not in self.schema_components
+                or self.indexed_components.get(relpath) == self.schema_components[relpath]
+            ):
+                continue
+            schema = read_json_file(source_path)
+            self._index_schema_fields(relpath, schema if isinstance(schema, dict) else {})
+            self.stats["schemas_indexed"] += 1
+        for relpath in [relpath for relpath in self.schema_digests if relpath not in current]:
+            self._remove_group(f"schema:{relpath}")
+            self.indexed_components.pop(relpath, None)
+        self.schema_digests = current
+        self.stats["schema_scans"] += 1
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the catalog, the action/condition lists and schemas."""
+        etag, catalog = merged_catalog_cache.current()
+        generation = merged_catalog_cache.generation
+        with self.lock:
+            self._index_list("action", os.path.join("action_list", "base_actions.json"), "actions")
+            self._index_list("condition", os.path.join("condition_list", "base_conditions.json"), "conditions")
+            catalog_changed = etag != self.catalog_etag
+            if catalog_changed:
+                self._index_catalog(catalog)
+                self.catalog_etag = etag
+                self.stats["refreshes"] += 1
+            # Runtime schema writes always save the catalog, which bumps the generation;
+            # the timed rescan picks up files edited in place.
+            now = time.monotonic()
+            if catalog_changed or generation != self.schema_generation or now - self.schema_scanned >= SEARCH_INDEX_RESCAN:
+                self._index_schemas()
+                self.schema_generation = generation
+                self.schema_scanned = now
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.refresh, name="ecd-search-index", daemon=True)
+        self.thread.start()
+
+    def _matches(self, term: str) -> dict:
+        scores = dict(self.postings.get(term, {}))
+        index = bisect.bisect_left(self.sorted_tokens, term)
+        while index < len(self.sorted_tokens) and self.sorted_tokens[index].startswith(term):
+            token = self.sorted_tokens[index]
+            index += 1
+            if token == term:
+                continue
+            factor = self.PREFIX_FACTOR * len(term) / len(token)
+            for doc_id, weight in self.postings[token].items():
+                scores[doc_id] = max(scores.get(doc_id, 0.0), weight * factor)
+        return scores
+
+    def search(self, query: str, types: Optional[set] = None, limit: int = 20) -> Tuple[List[dict], int]:
+        self.refresh()
+        terms = list(dict.fromkeys(token for token in SEARCH_TOKEN_SPLIT.split(str(query or "").lower()) if token))
+        if not terms:
+            return [], 0
+        with self.lock:
+            self.stats["queries"] += 1
+            if self.tokens_dirty:
+                self.sorted_tokens = sorted(self.postings)
+                self.tokens_dirty = False
+            totals = None
+            for term in sorted(terms, key=len, reverse=True):
+                matches = self._matches(term)
+                if totals is None:
+                    totals = matches
+                else:
+                    totals = {doc_id: score + matches[doc_id] for doc_id, score in totals.items() if doc_id in matches}
+                if not totals:
+                    return [], 0
+            ranked = []
+            for doc_id, score in totals.items():
+                doc = self.docs[doc_id]
+                if types and doc["type"] not in types:
+                    continue
+                ranked.append((-score, len(doc["label"]), doc["label"].lower(), doc_id, score))
+            ranked.sort()
+            results = [{**self.docs[item[3]], "score": round(item[4], 3)} for item in ranked[:limit]]
+            return results, len(ranked)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "documents": len(self.docs), "tokens": len(self.postings)}
+
+
+search_index = SearchIndex()
+
+
+PROJECT_DURATION_PATTERN = re.compile(r"^(\d+(\.\d+)?\s*(us|ms|s|min|h|d)?|\d+:\d{2}(:\d{2})?|never|infinite)$", re.IGNORECASE)
+PROJECT_ID_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+PROJECT_BASE64_KEY_PATTERN = re.compile(r"^[A-Za-z0-9+/]{43}=$")
+TEMPLATABLE_VALUE_MARKER = "__templatable"
+
+
+def is_deferred_project_value(value) -> bool:
+    """Substitutions, secrets and lambdas are resolved by ESPHome and are not checked here."""
+    if not isinstance(value, str):
+        return False
+    text = value.strip()
+    return "$" in text or text.startswith("!secret") or text.startswith("!lambda")
+
+
+# Stands in for JavaScript ``undefined`` where the builder tells it apart from ``null``.
+PROJECT_VALUE_UNSET = object()
+
+
+def templatable_inner_value(value):
+    if isinstance(value, dict) and value.get(TEMPLATABLE_VALUE_MARKER) is True:
+        return value.get("value", PROJECT_VALUE_UNSET)
+    return value
+
+
+def js_strict_equal(left, right) -> bool:
+    """JavaScript ``===`` for JSON values: no bool/number coercion, objects never equal."""
+    if left is PROJECT_VALUE_UNSET or right is PROJECT_VALUE_UNSET:
+        return left is right
+    if isinstance(left, (dict, list)) or isinstance(right, (dict, list)):
+        return False
+    if isinstance(left, bool) != isinstance(right, bool):
+        return False
+    return left == right
+
+
+def js_truthy(value) -> bool:
+    if value is PROJECT_VALUE_UNSET or value is None or isinstance(value, bool):
+        return value is True
+    if isinstance(value, (int, float, str)):
+        return bool(value)
+    return True
+
+
+def project_dependency_value(key, config, fields: list):
+    """Port of the builder's ``resolveDependentValue``: config value, else the field default."""
+    if isinstance(config, dict) and key in config:
+        return templatable_inner_value(config[key])
+    for candidate in fields:
+        if isinstance(candidate, dict) and candidate.get("key") == key:
+            return candidate.get("default", PROJECT_VALUE_UNSET)
+    return PROJECT_VALUE_UNSET
+
+
+def project_dependency_matches(dependency, actual) -> bool:
+    """Port of the builder's ``matchesDependency``."""
+    if not js_truthy(dependency):
+        return True
+    if not isinstance(dependency, dict):
+        return js_truthy(actual)
+    if "value" in dependency:
+        return js_strict_equal(actual, dependency["value"])
+    if isinstance(dependency.get("values"), list):
+        return any(js_strict_equal(actual, value) for value in dependency["values"])
+    if "notValue" in dependency:
+        return not js_strict_equal(actual, dependency["notValue"])
+    return js_truthy(actual)
+
+
+def project_field_visible(field: dict, config: dict, fields: list, global_values: Optional[dict] = None) -> bool:
+    """Port of ``isFieldVisible`` from the builder's ``schemaVisibility.js``.
+
+    ``globalDependsOn`` keys that no project component sets are treated as matching,
+    since core sections such as ``esphome:`` and ``wifi:`` are not validated here.
+    """
+    if field.get("hidden") is True:
+        return False
+    local = field.get("dependsOn")
+    local_actual = PROJECT_VALUE_UNSET
+    if js_truthy(local):
+        local_actual = project_dependency_value(local.get("key") if isinstance(local, dict) else None, config, fields)
+    if not project_dependency_matches(local, local_actual):
+        return False
+    global_dependency = field.get("globalDependsOn")
+    if not js_truthy(global_dependency) or not isinstance(global_dependency, dict):
+        return project_dependency_matches(global_dependency, PROJECT_VALUE_UNSET)
+    global_key = global_dependency.get("key")
+    if global_values is None or global_key not in global_values:
+        return True
+    return project_dependency_matches(global_dependency, global_values[global_key])
+
+
+def collect_project_globals(config, fields: list, registry: dict) -> None:
+    """Port of the builder's ``buildGlobalRegistry`` walk over one component's config."""
+    config = config if isinstance(config, dict) else {}
+    for field in fields:
+        if not isinstance(field, dict):
+            continue
+        value = config.get(field.get("key"), PROJECT_VALUE_UNSET) if isinstance(field.get("key"), str) else PROJECT_VALUE_UNSET
+        if field.get("set_global"):
+            resolved = value
+            if resolved is PROJECT_VALUE_UNSET:
+                resolved = field.get("default", PROJECT_VALUE_UNSET)
+            resolved = templatable_inner_value(resolved)
+            if resolved is not PROJECT_VALUE_UNSET:
+                registry[field["set_global"]] = resolved
+        if field.get("type") == "object":
+            nested = field.get("fields")
+            collect_project_globals(value if js_truthy(value) else {}, nested if isinstance(nested, list) else [], registry)
+        item = field.get("item")
+        if (
+            field.get("type") in SchemaValidator.LIST_TYPES
+            and isinstance(value, list)
+            and isinstance(item, dict)
+            and item.get("type") == "object"
+            and item.get("fields")
+        ):
+            for entry in value:
+                collect_project_globals(entry if js_truthy(entry) else {}, item["fields"], registry)
+
+
+class SchemaValidator:
+    """Field checks for one resolved component schema, built once and reused per project.
+
+    Every field becomes a closure that checks its value type, select options, required
+    flag and nested object or list items the way the builder stores them. Values ESPHome
+    resolves later (substitutions, secrets, lambdas) are accepted as they are.
+    """
+
+    LIST_TYPES = {"list", "fixed_list", "generated_list"}
+    TEXT_TYPES = {"raw_yaml", "yaml", "lambda"}
+
+    def __init__(self, schema: dict) -> None:
+        fields = schema.get("fields") if isinstance(schema, dict) else None
+        self.fields = fields if isinstance(fields, list) else []
+        self.global_values: Optional[dict] = None
+        self.check_fields = self._compile_fields(self.fields)
+
+    def collect_globals(self, config, registry: dict) -> None:
+        collect_project_globals(config, self.fields, registry)
+
+    def validate(self, config, global_values: Optional[dict] = None) -> List[dict]:
+        errors = []
+        self.global_values = global_values
+        try:
+            self.check_fields(config if isinstance(config, dict) else {}, (), errors)
+        finally:
+            self.global_values = None
+        return errors
+
+    def _compile_fields(self, fields: list):
+        compiled = []
+        for field in fields:
+            if isinstance(field, dict) and isinstance(field.get("key"), str) and field["key"]:
+                compiled.append((field, self._compile_field(field)))
+
+        def check_fields(config: dict, path: tuple, errors: list) -> None:
+            for field, check in compiled:
+                if project_field_visible(field, config, fields, self.global_values):
+                    check(config.get(field["key"]), path + (field["key"],), errors)
+
+        return check_fields
+
+    def _compile_field(self, field: dict):
+        field_type = str(field.get("type") or "")
+        required = field.get("required") is True and "default" not in field and not field.get("globalDependsOn")
+        templatable = field.get("templatable") is True
+        check_value = self._compile_value(field, field_type)
+
+        def check(value, path: tuple, errors: list) -> None:
+            if templatable and isinstance(value, dict) and value.get(TEMPLATABLE_VALUE_MARKER) is True:
+                if value.get("mode") == "lambda":
+                    return
+                value = value.get("value")
+            if value is None or value == "" or value == []:
+                if required:
+                    errors.append({"path": "/".join(path), "message": "Required field is missing"})
+                return
+            if is_deferred_project_value(value):
+                return
+            message = check_value(value, path, errors)
+            if message:
+                errors.append({"path": "/".join(path), "message": message})
+
+        return check
+
+    def _compile_value(self, field: dict, field_type: str):
+        if field_type == "object":
+            check_fields = self._compile_fields(field.get("fields") if isinstance(field.get("fields"), list) else [])
+
+            def check_object(value, path, errors):
+                if not isinstance(value, dict):
+                    return "Must be an object"
+                check_fields(value, path, errors)
+                return ""
+
+            return check_object
+
+        if field_type in self.LIST_TYPES:
+            item = field.get("item") if isinstance(field.get("item"), dict) else {}
+            check_item = self._compile_field({**item, "key": "item", "required": False}) if item.get("type") else None
+            raw_list = field.get("rawList") is True
+
+            def check_list(value, path, errors):
+                if not isinstance(value, list):
+                    return "" if raw_list and isinstance(value, str) else "Must be a list"
+                if check_item:
+                    for index, entry in enumerate(value):
+                        check_item(entry, path + (str(index),), errors)
+                return ""
+
+            return check_list
+
+        if field_type == "number":
+
+            def check_number(value, path, errors):
+                if isinstance(value, bool):
+                    return "Must be a number"
+                if isinstance(value, (int, float)):
+                    return ""
+                try:
+                    float(str(value).strip())
+                except ValueError:
+                    return "Must be a number"
+                return ""
+
+            return check_number
+
+        if field_type == "boolean":
+
+            def check_boolean(value, path, errors):
+                if isinstance(value, bool) or str(value).strip().lower() in ("true", "false"):
+                    return ""
+                return "Must be true or false"
+
+            return check_boolean
+
+        if field_type == "select":
+            options = field.get("options")
+            if not isinstance(options, list) or not options or field.get("optionsBy") or field.get("optionsMap"):
+                return self._check_scalar
+            allowed = {str(option) for option in options}
+            message = f"Must be one of: {', '.join(str(option) for option in options[:20])}"
+
+            def check_select(value, path, errors):
+                return "" if str(value) in allowed else message
+
+            return check_select
+
+        if field_type == "duration":
+
+            def check_duration(value, path, errors):
+                if isinstance(value, dict) or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+                    return ""
+                return "" if PROJECT_DURATION_PATTERN.match(str(value).strip()) else "Invalid duration"
+
+            return check_duration
+
+        if field_type == "id":
+
+            def check_id(value, path, errors):
+                return "" if PROJECT_ID_PATTERN.match(str(value).strip()) else "Invalid ID"
+
+            return check_id
+
+        if field_type == "password" and (field.get("settings") or {}).get("format") == "base64_44":
+
+            def check_base64_key(value, path, errors):
+                if PROJECT_BASE64_KEY_PATTERN.match(str(value).strip()):
+                    return ""
+                return "Key must be base64 (44 chars, ending with =)."
+
+            return check_base64_key
+
+        if field_type in self.TEXT_TYPES:
+            return lambda value, path, errors: "" if isinstance(value, str) else "Must be text"
+
+        if field_type == "gpio":
+            return lambda value, path, errors: "" if isinstance(value, (str, int, dict)) else "Invalid pin"
+
+        return self._check_scalar
+
+    @staticmethod
+    def _check_scalar(value, path, errors):
+        if isinstance(value, (str, int, float)):
+            return ""
+        return "Must be a single value"
+
+
+class ProjectValidator:
+    """Validate builder projects against compiled component schemas without ESPHome.
+
+    Project components are mapped to their schema through the merged catalog. One
+    ``SchemaValidator`` is kept per compiled schema hash, so a schema is only turned into
+    checks again after one of its source files changes.
+    """
+
+    def __init__(self, cache_size: int) -> None:
+        self.lock = threading.Lock()
+        self.cache_size = cache_size
+        self.validators = OrderedDict()
+        self.schema_hashes = {}
+        self.catalog_etag: Optional[str] = None
+        self.schema_paths = {}
+        self.stats = {"projects": 0, "components": 0, "compiled": 0, "hits": 0}
+
+    def _schema_path(self, component_id: str) -> str:
+        etag, catalog = merged_catalog_cache.current()
+        if etag != self.catalog_etag:
+            schema_paths = {}
+            for item in extract_catalog_items(catalog):
+                schema_paths.setdefault(item["id"], item["schemaPath"])
+            self.schema_paths = schema_paths
+            self.catalog_etag = etag
+        return self.schema_paths.get(component_id, "")
+
+    def validator(self, relpath: str) -> SchemaValidator:
+        schema = schema_compiler.compile(relpath)
+        known = self.schema_hashes.get(relpath)
+        if known and known[0] is schema:
+            digest = known[1]
+        else:
+            digest = hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+            self.schema_hashes[relpath] = (schema, digest)
+        validator = self.validators.get(digest)
+        if validator is not None:
+            self.validators.move_to_end(digest)
+            self.stats["hits"] += 1
+            return validator
+        validator = SchemaValidator(schema)
+        self.validators[digest] = validator
+        self.stats["compiled"] += 1
+        while len(self.validators) > self.cache_size:
+            self.validators.popitem(last=False)
+        return validator
+
+    def validate(self, project) -> List[dict]:
+        if not isinstance(project, dict):
+            return [{"component": None, "index": None, "path": "", "message": "Project must be an object"}]
+        components = project.get("components", [])
+        if not isinstance(components, list):
+            return [{"component": None, "index": None, "path": "components", "message": "Must be a list"}]
+        errors = []
+        with self.lock:
+            self.stats["projects"] += 1
+            checks = []
+            global_values = {}
+            for index, component in enumerate(components):
+                self.stats["components"] += 1
+                # The builder stores components as {"id", "config"} or as a bare id string.
+                if isinstance(component, str):
+                    component_id, config = normalize_component_id(component), {}
+                elif isinstance(component, dict):
+                    component_id, config = normalize_component_id(component.get("id", "")), component.get("config")
+                else:
+                    component_id, config = "", None
+                relpath = self._schema_path(component_id) if component_id else ""
+                if not relpath:
+                    errors.append({"component": component_id or None, "index": index, "path": "", "message": "Unknown component"})
+                    continue
+                try:
+                    validator = self.validator(relpath)
+                except ValueError as exc:
+                    errors.append({"component": component_id, "index": index, "path": "", "message": str(exc)})
+                    continue
+                validator.collect_globals(config, global_values)
+                checks.append((index, component_id, config, validator))
+            for index, component_id, config, validator in checks:
+                for error in validator.validate(config, global_values):
+                    errors.append({"component": component_id, "index": index, **error})
+        errors.sort(key=lambda error: error["index"] if error["index"] is not None else -1)
+        return errors
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "validators": len(self.validators)}
+
+
+project_validator = ProjectValidator(PROJECT_VALIDATOR_CACHE_SIZE)
+
+
+def slugify_component_key(value: str) -> str:
+    lowered = str(value or "").strip().lower()
+    lowered = re.sub(r"[^a-z0-9_-]+", "-", lowered)
+    lowered = re.sub(r"-+", "-", lowered).strip("-_")
+    token = normalize_component_token(lowered)
+    if token:
+        return token
+    return ""
+
+
+def runtime_schema_target_path(schema_path: str) -> str:
+    relative = str(schema_path or "").strip().replace("\\", "/")
+    if not relative.startswith("components/"):
+        return ""
+    full_path = os.path.normpath(os.path.join(components_runtime_root(), "schemas", relative))
+    schemas_root = os.path.normpath(os.path.join(components_runtime_root(), "schemas"))
+    try:
+        common = os.path.commonpath([schemas_root, full_path])
+    except ValueError:
+        return ""
+    if common != schemas_root:
+        return ""
+    return full_path
+
+
+def parse_zip_components_catalog(catalog_payload: dict) -> Tuple[List[dict], List[str]]:
+    errors = []
+    entries = []
+    categories = catalog_payload.get("categories")
+    if not isinstance(categories, list):
+        return [], ["components_list.json must contain categories"]
+
+    for category, chain in iter_category_nodes(categories):
+        items = category.get("items")
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            normalized, error = normalize_component_entry(item)
+            if not normalized:
+                if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
+                    errors.append(error)
+                continue
+            entries.append({"entry": normalized, "chain": chain})
+
+    if not entries:
+        errors.append("No valid component entries found in components_list.json")
+    return entries, errors
+
+
+def normalize_component_schema_relpath(value: str) -> str:
+    raw = str(value or "").strip().replace("\\", "/")
+    if not raw:
+        return ""
+    if raw.startswith("/"):
+        return ""
+    normalized = posixpath.normpath(raw)
+    if normalized in ("", ".", ".."):
+        return ""
+    if normalized.startswith("../") or "/../" in normalized:
+        return ""
+    if normalized.startswith("schemas/"):
+        normalized = normalized[len("schemas/") :]
+    if not normalized.startswith("components/"):
+        return ""
+    if not normalized.endswith(".json"):
+        return ""
+    return normalized
+
+
+def resolve_component_schema_path(base_root: str, relpath: str) -> str:
+    root = os.path.normpath(base_root)
+    candidate = os.path.normpath(os.path.join(root, relpath.replace("/", os.sep)))
+    try:
+        common = os.path.commonpath([root, candidate])
+    except ValueError:
+        return ""
+    if common != root:
+        return ""
+    return candidate
+
+
+def load_empty_custom_template() -> dict:
+    template_path = os.path.join(COMPONENTS_BASE_SCHEMAS_ROOT, "custom", "empty.json")
+    template = read_json_file(template_path)
+    if isinstance(template, dict):
+        return template
+    return {
+        "id": "custom.empty",
+        "domain": "custom",
+        "platform": "empty",
+        "helpUrl": "",
+        "uiLabelField": "name",
+        "defaultLabel": "Empty Component",
+        "renderStrategy": "verbatim_root",
+        "verbatimField": "custom_config",
+        "fields": [
+            {
+                "key": "name",
+                "type": "text",
+                "required": False,
+                "lvl": "simple",
+                "placeholder": "Custom component name",
+                "emitYAML": "never",
+            },
+            {
+                "key": "custom_config",
+                "type": "raw_yaml",
+                "required": False,
+                "lvl": "simple",
+                "placeholder": "# Enter raw YAML that should be emitted as-is",
+            },
+        ],
+    }
+
+
+def build_custom_component_schema(key: str) -> dict:
+    schema = json.loads(json.dumps(load_empty_custom_template()))
+    schema["id"] = f"custom.{key}"
+    schema["domain"] = "custom"
+    schema["platform"] = key
+    fields = schema.get("fields")
+    if isinstance(fields, list):
+        for field in fields:
+            if not isinstance(field, dict):
+                continue
+            field_key = str(field.get("key") or "").strip()
+            if field_key in ("name", "custom_config") and "default" in field:
+                field.pop("default", None)
+
+    return schema
+
+
+def bootstrap_storage() -> None:
+    os.makedirs(TARGET_DIR, exist_ok=True)
+    # Seed initial project/asset structure once at startup.
+    seed_tree(SEED_ROOT, TARGET_DIR)
+    seed_assets()
+    os.makedirs(components_runtime_schemas_root(), exist_ok=True)
+    sync_assets("all")
+
+
+def read_devices_file(path: str) -> List[dict]:
+    if not os.path.isfile(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if isinstance(data, list):
+            return [item for item in data if isinstance(item, dict)]
+    except Exception:
+        return []
+    return []
+
+
+def load_devices() -> List[dict]:
+    return device_registry.all()
+
+
+def save_devices(devices: List[dict]) -> None:
+    device_registry.replace(devices)
+
+
+def projects_index_path() -> str:
+    return os.path.join(PROJECT_DIR, "projects.json")
+
+
+def load_projects_index() -> dict:
+    path = projects_index_path()
+    if not os.path.isfile(path):
+        return {
+            "version": 1,
+            "updatedAt": utc_now(),
+            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
+            "projectPlacement": [],
+        }
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+    except Exception:
+        return {
+            "version": 1,
+            "updatedAt": utc_now(),
+            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
+            "projectPlacement": [],
+        }
+    if not isinstance(payload, dict):
+        return {
+            "version": 1,
+            "updatedAt": utc_now(),
+            "folders": [{"id": "root", "name": "Projects", "parentId": None}],
+            "projectPlacement": [],
+        }
+    if not isinstance(payload.get("folders"), list):
+        payload["folders"] = [{"id": "root", "name": "Projects", "parentId": None}]
+    if not isinstance(payload.get("projectPlacement"), list):
+        payload["projectPlacement"] = []
+    if "version" not in payload:
+        payload["version"] = 1
+    return payload
+
+
+def save_projects_index(index_payload: dict) -> None:
+    payload = dict(index_payload or {})
+    payload["updatedAt"] = utc_now()
+    path = projects_index_path()
+    write_json_file_atomic(path, payload)
+
+
+def write_text_file_atomic(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write(content)
+            if not content.endswith("\n"):
+                handle.write("\n")
+        os.replace(temp_path, path)
+    finally:
+        if os.path.isfile(temp_path):
+            try:
+                os.remove(temp_path)
+            except Exception:
+                pass
+
+
+def write_bytes_file_atomic(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(content)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.isfile(temp_path):
+            try:
+                os.remove(temp_path)
+            except Exception:
+                pass
+
+
+def write_json_file_atomic(path: str, data: dict) -> None:
+    body = json.dumps(data, ensure_ascii=False, indent=2)
+    write_text_file_atomic(path, body)
 
 
 def add_project_to_index(project_filename: str, folder_id: str = "root") -> dict:
     index_payload = load_projects_index()
-    folders = index_payload.get("folders")
-    if not isinstance(folders, list) or not folders:
-        folders = [{"id": "root", "name": "Projects", "parentId": None}]
-        index_payload["folders"] = folders
-    valid_folder_ids = {
-        str(folder.get("id") or "")
-        for folder in folders
-        if isinstance(folder, dict) and str(folder.get("id") or "")
+    folders = index_payload.get("folders")
+    if not isinstance(folders, list) or not folders:
+        folders = [{"id": "root", "name": "Projects", "parentId": None}]
+        index_payload["folders"] = folders
+    valid_folder_ids = {
+        str(folder.get("id") or "")
+        for folder in folders
+        if isinstance(folder, dict) and str(folder.get("id") or "")
+    }
+    target_folder_id = folder_id if folder_id in valid_folder_ids else "root"
+    current = index_payload.get("projectPlacement")
+    if not isinstance(current, list):
+        current = []
+    next_items = []
+    found = False
+    now = utc_now()
+    for item in current:
+        if not isinstance(item, dict):
+            continue
+        name = str(item.get("name") or "").strip()
+        if not name:
+            continue
+        if name == project_filename:
+            updated = dict(item)
+            updated["folderId"] = str(updated.get("folderId") or target_folder_id)
+            updated["lastEditedAt"] = now
+            next_items.append(updated)
+            found = True
+            continue
+        next_items.append(item)
+    if not found:
+        next_items.append({"name": project_filename, "folderId": target_folder_id, "lastEditedAt": now})
+    index_payload["projectPlacement"] = next_items
+    return index_payload
+
+
+def remove_project_from_index(project_filename: str) -> bool:
+    index_payload = load_projects_index()
+    current = index_payload.get("projectPlacement")
+    if not isinstance(current, list):
+        current = []
+    next_items = [
+        item
+        for item in current
+        if not (isinstance(item, dict) and str(item.get("name") or "").strip() == project_filename)
+    ]
+    changed = len(next_items) != len(current)
+    if changed:
+        index_payload["projectPlacement"] = next_items
+        save_projects_index(index_payload)
+    return changed
+
+
+def rename_project_in_index(old_name: str, new_name: str) -> bool:
+    if not old_name or not new_name or old_name == new_name:
+        return False
+    index_payload = load_projects_index()
+    current = index_payload.get("projectPlacement")
+    if not isinstance(current, list):
+        current = []
+
+    changed = False
+    deduped = []
+    seen_names = set()
+    for item in current:
+        if not isinstance(item, dict):
+            deduped.append(item)
+            continue
+        name = str(item.get("name") or "").strip()
+        next_name = new_name if name == old_name else name
+        if next_name != name:
+            item = dict(item)
+            item["name"] = next_name
+            changed = True
+        if not next_name:
+            changed = True
+            continue
+        if next_name in seen_names:
+            changed = True
+            continue
+        seen_names.add(next_name)
+        deduped.append(item)
+
+    if changed:
+        index_payload["projectPlacement"] = deduped
+        save_projects_index(index_payload)
+    return changed
+
+
+def unregister_device_record(
+    *,
+    yaml_name: str = "",
+    device_key: str = "",
+) -> Tuple[bool, int]:
+    normalized_yaml = normalize_yaml_filename(yaml_name) if yaml_name else ""
+    normalized_key = normalize_device_key(device_key) if device_key else ""
+    if not normalized_yaml and not normalized_key:
+        return False, 0
+
+    removed = device_registry.remove(yaml_name=normalized_yaml, device_key=normalized_key)
+    if removed:
+        device_history.forget(normalized_key or device_key_from_yaml(normalized_yaml))
+    return bool(removed), removed
+
+
+def device_key_from_yaml(yaml_name: str) -> str:
+    normalized = normalize_yaml_filename(yaml_name)
+    if not normalized:
+        return ""
+    return normalized[:-5].strip().lower()
+
+
+def normalize_device_key(value: str) -> str:
+    raw = str(value or "").strip().lower()
+    if not raw:
+        return ""
+    if raw.endswith(".yaml"):
+        raw = raw[:-5]
+    if raw.endswith(".json"):
+        raw = raw[:-5]
+    if not raw or not VALID_DEVICE.match(raw):
+        return ""
+    return raw
+
+
+def canonical_device_key(device: dict) -> str:
+    yaml_name = str(device.get("yaml") or "").strip()
+    key_from_yaml = device_key_from_yaml(yaml_name)
+    if key_from_yaml:
+        return key_from_yaml
+    return normalize_device_key(str(device.get("name") or ""))
+
+
+def build_device_response(device: dict, checks: Optional[dict] = None) -> dict:
+    key = canonical_device_key(device)
+    yaml_name = normalize_yaml_filename(str(device.get("yaml") or ""))
+    name = str(device.get("name") or "").strip()
+    host = str(device.get("host") or "").strip()
+    status = str(device.get("status") or "").strip().lower()
+    if status not in ("online", "offline", "unknown"):
+        status = "unknown"
+    status_source = str(device.get("status_source") or "").strip().lower()
+    if status_source not in ("dns", "mdns", "ota", "unknown"):
+        status_source = "unknown"
+
+    payload = {
+        **device,
+        "device_key": key,
+        "yaml": yaml_name,
+        "name": name,
+        "host": host,
+        "status": status,
+        "status_source": status_source,
+        "checks": {
+            "dns": bool((checks or {}).get("dns", False)),
+            "mdns": bool((checks or {}).get("mdns", False)),
+            "ota": bool((checks or {}).get("ota", False)),
+            "ota_ms": (checks or {}).get("ota_ms"),
+        },
+    }
+    return payload
+
+
+def normalize_device_record(device: dict) -> bool:
+    """Fill in derived device fields in place; return True when the record changed."""
+    key = canonical_device_key(device)
+    yaml_name = normalize_yaml_filename(str(device.get("yaml") or ""))
+    host = str(device.get("host") or "").strip()
+    if not host:
+        fallback = key or normalize_device_key(str(device.get("name") or ""))
+        if fallback:
+            host = f"{fallback}.local"
+    status = str(device.get("status") or "").strip().lower()
+    if status not in ("online", "offline", "unknown"):
+        status = "unknown"
+    status_source = str(device.get("status_source") or "").strip().lower()
+    if status_source not in ("dns", "mdns", "ota", "unknown"):
+        status_source = "unknown"
+
+    changed = False
+    updates = {"device_key": key, "yaml": yaml_name, "status": status, "status_source": status_source}
+    if key:
+        updates["name"] = key
+    if host:
+        updates["host"] = host
+    for field, value in updates.items():
+        if device.get(field) != value:
+            device[field] = value
+            changed = True
+    return changed
+
+
+class StatusRing:
+    """Append-only status transitions for one device in two parallel arrays.
+
+    Only changes are stored. The oldest events are dropped beyond the capacity or
+    retention window, except the last event before the cutoff, which still defines the
+    state at the start of the window.
+    """
+
+    RECORD = struct.Struct("<db")
+
+    def __init__(self, capacity: int, retention: float) -> None:
+        self.capacity = capacity
+        self.retention = retention
+        self.times = array("d")
+        self.states = array("b")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, timestamp: float, online: bool) -> bool:
+        state = 1 if online else 0
+        if self.states and (self.states[-1] == state or timestamp < self.times[-1]):
+            return False
+        self.times.append(timestamp)
+        self.states.append(state)
+        self.trim(timestamp)
+        return True
+
+    def trim(self, now: float) -> None:
+        drop = max(0, len(self.times) - self.capacity)
+        if self.retention > 0:
+            cutoff = now - self.retention
+            while drop < len(self.times) - 1 and self.times[drop + 1] <= cutoff:
+                drop += 1
+        if drop:
+            del self.times[:drop]
+            del self.states[:drop]
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.RECORD.pack(self.times[index], self.states[index]) for index in range(len(self.times)))
+
+    def load_bytes(self, raw: bytes) -> None:
+        usable = len(raw) - len(raw) % self.RECORD.size
+        for timestamp, state in self.RECORD.iter_unpack(raw[:usable]):
+            if self.states and (self.states[-1] == state or timestamp < self.times[-1]):
+                continue
+            self.times.append(timestamp)
+            self.states.append(state)
+
+    def state_at(self, timestamp: float) -> Optional[int]:
+        index = bisect.bisect_right(self.times, timestamp) - 1
+        return self.states[index] if index >= 0 else None
+
+    def summarize(self, start: float, end: float, buckets: int) -> dict:
+        """Uptime, transition count and an online-fraction timeline for [start, end)."""
+        online_time = 0.0
+        observed_time = 0.0
+        timeline = []
+        span = max(1e-6, (end - start) / buckets)
+        for index in range(buckets):
+            bucket_start = start + index * span
+            online, observed = self._online_time(bucket_start, bucket_start + span)
+            online_time += online
+            observed_time += observed
+            timeline.append(round(online / observed, 3) if observed > 0 else None)
+        # The first event is the initial observation, not a transition.
+        first = max(1, bisect.bisect_left(self.times, start))
+        last = bisect.bisect_left(self.times, end)
+        return {
+            "uptime": round(100.0 * online_time / observed_time, 2) if observed_time > 0 else None,
+            "observed_seconds": round(observed_time, 1),
+            "transitions": max(0, last - first),
+            "offline_events": sum(1 for index in range(first, last) if self.states[index] == 0),
+            "timeline": timeline,
+            "bucket_seconds": round(span, 1),
+        }
+
+    def _online_time(self, start: float, end: float) -> Tuple[float, float]:
+        online = 0.0
+        observed = 0.0
+        index = bisect.bisect_right(self.times, start) - 1
+        cursor = start
+        if index < 0:
+            index = 0
+            if not self.times or self.times[0] >= end:
+                return 0.0, 0.0
+            cursor = self.times[0]
+        while index < len(self.times) and cursor < end:
+            segment_end = self.times[index + 1] if index + 1 < len(self.times) else end
+            segment_end = min(segment_end, end)
+            if segment_end > cursor:
+                observed += segment_end - cursor
+                if self.states[index]:
+                    online += segment_end - cursor
+            cursor = segment_end
+            index += 1
+        return online, observed
+
+
+class DeviceHistoryStore:
+    """Per-device status rings persisted as append-only binary files."""
+
+    def __init__(self, root: str, capacity: int, retention: float) -> None:
+        self.root = root
+        self.capacity = capacity
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.rings = {}
+        self.loaded_root = ""
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.bin")
+
+    def _ring(self, key: str) -> StatusRing:
+        if self.loaded_root != self.root:
+            self.rings = {}
+            self.loaded_root = self.root
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = StatusRing(self.capacity, self.retention)
+            try:
+                with open(self._path(key), "rb") as handle:
+                    ring.load_bytes(handle.read())
+            except OSError:
+                pass
+            ring.trim(time.time())
+            self.rings[key] = ring
+        return ring
+
+    def record(self, key: str, online: bool, timestamp: Optional[float] = None) -> bool:
+        if not key or not VALID_DEVICE.match(key):
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            ring = self._ring(key)
+            if not ring.append(timestamp, online):
+                return False
+            path = self._path(key)
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                size = os.path.getsize(path) if os.path.isfile(path) else 0
+                if size >= 2 * self.capacity * StatusRing.RECORD.size:
+                    write_bytes_file_atomic(path, ring.to_bytes())
+                else:
+                    with open(path, "ab") as handle:
+                        handle.write(StatusRing.RECORD.pack(timestamp, 1 if online else 0))
+            except OSError:
+                pass
+            return True
+
+    def summary(self, key: str, start: float, end: float, buckets: int) -> Optional[dict]:
+        with self.lock:
+            ring = self._ring(key)
+            if not len(ring):
+                return None
+            payload = ring.summarize(start, end, buckets)
+            payload["events"] = len(ring)
+            last_change = ring.times[-1]
+            payload["last_change"] = f"{datetime.utcfromtimestamp(last_change).isoformat()}Z"
+            payload["current"] = "online" if ring.states[-1] else "offline"
+            return payload
+
+    def forget(self, key: str) -> None:
+        with self.lock:
+            self.rings.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+device_history = DeviceHistoryStore(DEVICE_HISTORY_DIR, DEVICE_HISTORY_MAX_EVENTS, DEVICE_HISTORY_RETENTION)
+
+
+class DeviceRegistry:
+    """In-memory device records indexed by device key, YAML name and device name.
+
+    Each index maps a token to its records in file order; lookups take the first.
+    Mutations run under one lock and update the indexes in place. Registrations and removals are written immediately;
+    status updates mark the registry dirty and are flushed together after a short delay.
+    All writes replace devices.json atomically.
+    """
+
+    def __init__(self, flush_delay: float) -> None:
+        self.flush_delay = max(0.0, flush_delay)
+        self.lock = threading.RLock()
+        self.records: List[dict] = []
+        self.by_key = {}
+        self.by_yaml = {}
+        self.by_name = {}
+        self.path = ""
+        self.mtime_ns = None
+        self.dirty = False
+        self.timer: Optional[threading.Timer] = None
+        self.writes = 0
+
+    def _file_mtime(self, path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure_loaded(self) -> None:
+        path = DEVICES_PATH
+        if path == self.path and (self.dirty or self._file_mtime(path) == self.mtime_ns):
+            return
+        if self.dirty and self.path:
+            self._write()
+        self.path = path
+        self.records = read_devices_file(path)
+        normalized = False
+        for record in self.records:
+            if normalize_device_record(record):
+                normalized = True
+        self._reindex()
+        self.mtime_ns = self._file_mtime(path)
+        if normalized:
+            self._write()
+
+    def _reindex(self) -> None:
+        self.by_key = {}
+        self.by_yaml = {}
+        self.by_name = {}
+        for record in self.records:
+            self._index(record)
+
+    def _tokens(self, record: dict) -> list:
+        yaml_name = normalize_yaml_filename(str(record.get("yaml") or ""))
+        return [
+            (self.by_key, canonical_device_key(record)),
+            (self.by_yaml, yaml_name.lower()),
+            (self.by_name, str(record.get("name") or "").strip().lower()),
+        ]
+
+    def _index(self, record: dict) -> None:
+        for table, token in self._tokens(record):
+            if token:
+                table.setdefault(token, []).append(record)
+
+    def _unindex(self, record: dict) -> None:
+        for table, token in self._tokens(record):
+            slots = table.get(token)
+            if not slots:
+                continue
+            slots[:] = [item for item in slots if item is not record]
+            if not slots:
+                del table[token]
+
+    @staticmethod
+    def _first(table: dict, token: str) -> Optional[dict]:
+        slots = table.get(token)
+        return slots[0] if slots else None
+
+    def _write(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        try:
+            write_text_file_atomic(self.path, json.dumps(self.records, ensure_ascii=False, indent=2))
+        except OSError:
+            return
+        self.dirty = False
+        self.writes += 1
+        self.mtime_ns = self._file_mtime(self.path)
+
+    def _schedule_flush(self) -> None:
+        self.dirty = True
+        if self.flush_delay <= 0:
+            self._write()
+            return
+        if self.timer is None:
+            self.timer = threading.Timer(self.flush_delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.timer = None
+            if self.dirty:
+                self._write()
+
+    def all(self) -> List[dict]:
+        with self.lock:
+            self._ensure_loaded()
+            return [dict(record) for record in self.records]
+
+    def _find(self, yaml_name: str = "", device_key: str = "") -> Optional[dict]:
+        if yaml_name:
+            record = self._first(self.by_yaml, yaml_name.lower())
+            if record is not None:
+                return record
+        if device_key:
+            return self._first(self.by_key, device_key)
+        return None
+
+    def get(self, yaml_name: str = "", device_key: str = "") -> Optional[dict]:
+        with self.lock:
+            self._ensure_loaded()
+            record = self._find(yaml_name, device_key)
+            return dict(record) if record is not None else None
+
+    def replace(self, devices: List[dict]) -> None:
+        with self.lock:
+            self._ensure_loaded()
+            self.records = [dict(device) for device in devices]
+            self._reindex()
+            self._write()
+
+    def register(self, key: str, name: str, yaml_name: str, host: str) -> dict:
+        now = utc_now()
+        with self.lock:
+            self._ensure_loaded()
+            record = self._first(self.by_key, key) or self._first(self.by_name, name)
+            if record is None:
+                record = {
+                    "id": uuid.uuid4().hex,
+                    "device_key": key,
+                    "name": key,
+                    "yaml": yaml_name,
+                    "host": host or f"{key}.local",
+                    "status": "offline",
+                    "created_at": now,
+                    "updated_at": now,
+                    "last_seen": "",
+                }
+                self.records.append(record)
+            else:
+                # Re-added below under its new tokens, after any duplicates already there.
+                self._unindex(record)
+                record["device_key"] = key
+                record["yaml"] = yaml_name or record.get("yaml", "")
+                record["name"] = key
+                if host:
+                    record["host"] = host
+                record["updated_at"] = now
+            self._index(record)
+            self._write()
+            return dict(record)
+
+    def remove(self, yaml_name: str = "", device_key: str = "") -> int:
+        with self.lock:
+            self._ensure_loaded()
+            matches = list(self.by_yaml.get(yaml_name.lower(), [])) if yaml_name else []
+            matches += self.by_key.get(device_key, []) if device_key else []
+            removed_ids = {id(record) for record in matches}
+            if not removed_ids:
+                return 0
+            for record in matches:
+                self._unindex(record)
+            self.records = [record for record in self.records if id(record) not in removed_ids]
+            self._write()
+            return len(removed_ids)
+
+    def apply_probe_results(self, results: dict, now: str, hosts: Optional[dict] = None) -> List[dict]:
+        """Apply key -> probe result tuples; return copies of the updated records."""
+        updated = []
+        observed = []
+        with self.lock:
+            self._ensure_loaded()
+            changed = False
+            for key, result in results.items():
+                record = self._first(self.by_key, key)
+                if record is None:
+                    continue
+                host = (hosts or {}).get(key)
+                if host and record.get("host") != host:
+                    record["host"] = host
+                    changed = True
+                if result is not None:
+                    observed.append((key, bool(result[0])))
+                    if apply_device_probe_result(record, result, now):
+                        changed = True
+                updated.append(dict(record))
+            if changed:
+                self._schedule_flush()
+        for key, online in observed:
+            device_history.record(key, online)
+        return updated
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {"devices": len(self.records), "writes": self.writes, "dirty": self.dirty}
+
+
+device_registry = DeviceRegistry(DEVICES_FLUSH_DELAY)
+atexit.register(device_registry.flush)
+
+
+def decode_mdns_txt(properties: Optional[dict]) -> dict:
+    txt = {}
+    for key, value in (properties or {}).items():
+        if isinstance(key, bytes):
+            key = key.decode("utf-8", errors="replace")
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", errors="replace")
+        txt[str(key)] = "" if value is None else str(value)
+    return txt
+
+
+class MDNSPresenceBrowser:
+    """Long-lived browser that keeps a presence table of announced ESPHome nodes."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.table = {}
+        self.zc = None
+        self.browser = None
+        self.started_at = 0.0
+        self.resolve_queue = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self.zc is not None
+
+    def start(self) -> bool:
+        if self.running or not ECD_MDNS_BROWSER or Zeroconf is None or ServiceBrowser is None:
+            return self.running
+        try:
+            if IPVersion is not None:
+                self.zc = Zeroconf(ip_version=IPVersion.All)
+            else:
+                self.zc = Zeroconf()
+            self.browser = ServiceBrowser(self.zc, list(MDNS_SERVICE_TYPES), handlers=[self._on_service_state_change])
+        except Exception:
+            self.close()
+            return False
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._resolve_loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def close(self) -> None:
+        zc, self.zc = self.zc, None
+        if self.browser is not None:
+            try:
+                self.browser.cancel()
+            except Exception:
+                pass
+            self.browser = None
+        if zc is not None:
+            try:
+                zc.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def node_from_service(service_type: str, name: str) -> str:
+        suffix = f".{service_type}"
+        if not name.endswith(suffix):
+            return ""
+        return name[: -len(suffix)].strip().lower()
+
+    def _on_service_state_change(self, zeroconf=None, service_type="", name="", state_change=None) -> None:
+        # Runs on the zeroconf thread: never block here, resolve on our own thread.
+        node = self.node_from_service(service_type, name)
+        if not node:
+            return
+        removed = ServiceStateChange is not None and state_change == ServiceStateChange.Removed
+        if removed:
+            self.mark_removed(node)
+        else:
+            self.resolve_queue.put((service_type, name))
+
+    def _resolve_loop(self) -> None:
+        while self.zc is not None:
+            try:
+                service_type, name = self.resolve_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            zc = self.zc
+            if zc is None:
+                break
+            try:
+                info = zc.get_service_info(service_type, name, timeout=3000)
+            except Exception:
+                info = None
+            if info is not None:
+                self.record(service_type, name, info)
+
+    def record(self, service_type: str, name: str, info) -> None:
+        node = self.node_from_service(service_type, name)
+        if not node:
+            return
+        try:
+            addresses = list(info.parsed_addresses())
+        except Exception:
+            addresses = []
+        now = time.time()
+        with self.lock:
+            entry = self.table.get(node) or {"node": node, "first_seen": now}
+            entry.update(
+                {
+                    "service_type": service_type,
+                    "addresses": addresses,
+                    "port": getattr(info, "port", None),
+                    "txt": decode_mdns_txt(getattr(info, "properties", None)),
+                    "last_seen": now,
+                    "online": True,
+                    "removed_at": None,
+                }
+            )
+            self.table[node] = entry
+
+    def mark_removed(self, node: str) -> None:
+        with self.lock:
+            entry = self.table.get(node)
+            if entry is not None:
+                entry["online"] = False
+                entry["removed_at"] = time.time()
+
+    def lookup(self, host: str) -> Optional[bool]:
+        """Return presence for a .local host, or None when the table cannot answer yet."""
+        normalized = str(host or "").strip().rstrip(".").lower()
+        if not self.running or not normalized.endswith(".local"):
+            return None
+        node = normalized[:-6].strip()
+        with self.lock:
+            entry = self.table.get(node)
+            if entry is not None:
+                # A node that loses power never sends a goodbye; once its last
+                # announcement is too old, let the caller query it actively.
+                if entry["online"] and time.time() - entry["last_seen"] > MDNS_PRESENCE_MAX_AGE:
+                    return None
+                return bool(entry["online"])
+        if time.time() - self.started_at < MDNS_BROWSER_WARMUP:
+            return None
+        return False
+
+    def get(self, node: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.table.get(str(node or "").strip().lower())
+            return dict(entry) if entry else None
+
+    @staticmethod
+    def _describe(entry: dict) -> dict:
+        def iso(value):
+            return f"{datetime.utcfromtimestamp(value).isoformat()}Z" if value else None
+
+        return {
+            **entry,
+            "first_seen": iso(entry.get("first_seen")),
+            "last_seen": iso(entry.get("last_seen")),
+            "removed_at": iso(entry.get("removed_at")),
+        }
+
+    def snapshot(self) -> List[dict]:
+        with self.lock:
+            entries = [dict(entry) for entry in self.table.values()]
+        entries.sort(key=lambda item: item["node"])
+        return [self._describe(entry) for entry in entries]
+
+    def metrics(self) -> dict:
+        with self.lock:
+            online = sum(1 for entry in self.table.values() if entry["online"])
+            total = len(self.table)
+        return {"running": self.running, "nodes": total, "online": online}
+
+
+mdns_presence = MDNSPresenceBrowser()
+
+
+class MDNSProbe:
+    def __init__(self) -> None:
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.zc = None
+        self.zc_lock = threading.Lock()
+        self.closed = False
+
+    def _zeroconf(self):
+        """Create the fallback Zeroconf instance only when the presence table cannot answer."""
+        with self.zc_lock:
+            if self.zc is not None or self.closed or Zeroconf is None:
+                return self.zc
+            try:
+                if IPVersion is not None:
+                    self.zc = Zeroconf(ip_version=IPVersion.All)
+                else:
+                    self.zc = Zeroconf()
+            except Exception:
+                self.zc = None
+            return self.zc
+
+    def is_online(self, host: str) -> bool:
+        normalized = str(host or "").strip().rstrip(".").lower()
+        if not normalized or not normalized.endswith(".local"):
+            return False
+        with self.cache_lock:
+            cached = self.cache.get(normalized)
+        if cached is not None:
+            return cached
+
+        present = mdns_presence.lookup(normalized)
+        if present is not None:
+            return present
+
+        node = normalized[:-6].strip()
+        zc = self._zeroconf() if node else None
+        if zc is None:
+            with self.cache_lock:
+                self.cache[normalized] = False
+            return False
+
+        online = False
+        for service_type in MDNS_SERVICE_TYPES:
+            service_name = f"{node}.{service_type}"
+            try:
+                info = zc.get_service_info(service_type, service_name, timeout=1200)
+            except Exception:
+                info = None
+            if info is not None:
+                online = True
+                mdns_presence.record(service_type, service_name, info)
+                break
+        if not online:
+            mdns_presence.mark_removed(node)
+
+        with self.cache_lock:
+            self.cache[normalized] = online
+        return online
+
+    def close(self) -> None:
+        with self.zc_lock:
+            self.closed = True
+            zc, self.zc = self.zc, None
+        if zc is None:
+            return
+        try:
+            zc.close()
+        except Exception:
+            pass
+
+
+def ping_host(host: str, port: int = PING_PORT, timeout: float = PING_TIMEOUT) -> bool:
+    if not host:
+        return False
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except Exception:
+        return False
+
+
+class HostResolver:
+    """Resolve host names on a thread pool with an LRU cache for successes and failures.
+
+    Concurrent lookups of the same name share one getaddrinfo call. A lookup that misses
+    its timeout is cached as a failure until the pending call finishes or the negative
+    TTL expires, so hanging .local names do not stall every refresh.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, timeout: float, max_entries: int, workers: int) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "timeouts": 0, "failures": 0}
+
+    @staticmethod
+    def normalize(host: str) -> str:
+        return str(host or "").strip().rstrip(".").lower()
+
+    def _store(self, key: str, addresses: list) -> None:
+        ttl = self.ttl if addresses else self.negative_ttl
+        self.cache[key] = (time.monotonic() + ttl, addresses)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def _lookup(self, key: str, future: Future) -> None:
+        try:
+            infos = socket.getaddrinfo(key, None, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys((info[0], info[4]) for info in infos))
+        except Exception:
+            addresses = []
+        with self.lock:
+            if not addresses:
+                self.stats["failures"] += 1
+            self._store(key, addresses)
+            self.pending.pop(key, None)
+        future.set_result(addresses)
+
+    def resolve_async(self, host: str) -> Future:
+        """Return a future for the (family, sockaddr) list of a host; empty when unresolvable."""
+        key = self.normalize(host)
+        with self.lock:
+            cached = self.cache.get(key) if key else (0.0, [])
+            if cached is not None and (not key or cached[0] > time.monotonic()):
+                if key:
+                    self.cache.move_to_end(key)
+                    self.stats["hits" if cached[1] else "negative_hits"] += 1
+                future = Future()
+                future.set_result(cached[1])
+                return future
+            future = self.pending.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            self.stats["misses"] += 1
+            future = Future()
+            self.pending[key] = future
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ecd-dns")
+        self.executor.submit(self._lookup, key, future)
+        return future
+
+    def resolve(self, host: str, timeout: Optional[float] = None) -> list:
+        future = self.resolve_async(host)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            key = self.normalize(host)
+            with self.lock:
+                self.stats["timeouts"] += 1
+                if key in self.pending:
+                    self._store(key, [])
+            return []
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "entries": len(self.cache), "pending": len(self.pending)}
+
+
+host_resolver = HostResolver(DNS_CACHE_TTL, DNS_NEGATIVE_TTL, DNS_TIMEOUT, DNS_CACHE_SIZE, DNS_RESOLVER_WORKERS)
+
+
+def resolve_host(host: str) -> bool:
+    if not host:
+        return False
+    return bool(host_resolver.resolve(host))
+
+
+def evaluate_device_connectivity(
+    host: str,
+    deep: bool = False,
+    mdns_probe: Optional[MDNSProbe] = None,
+) -> Tuple[bool, bool, bool, bool, str]:
+    """Return (online, dns_ok, mdns_ok, ota_ok, source) for a device host."""
+    dns_ok = resolve_host(host)
+    mdns_ok = mdns_probe.is_online(host) if mdns_probe else False
+    ota_ok = ping_host(host) if deep else False
+    online = dns_ok or mdns_ok or ota_ok
+    source = "unknown"
+    if dns_ok:
+        source = "dns"
+    elif mdns_ok:
+        source = "mdns"
+    elif ota_ok:
+        source = "ota"
+    return online, dns_ok, mdns_ok, ota_ok, source
+
+
+def resolve_stream_addresses(hosts: List[str], port: int, deadline: float) -> dict:
+    """Resolve hosts through the shared resolver to their first TCP address under one deadline."""
+    futures = {}
+    for host in hosts:
+        futures.setdefault(host_resolver.resolve_async(host), []).append(host)
+    if not futures:
+        return {}
+    done, _ = wait(futures, timeout=max(0.1, min(deadline, DNS_TIMEOUT)))
+
+    addresses = {}
+    for future in done:
+        resolved = future.result()
+        if not resolved:
+            continue
+        family, sockaddr = resolved[0]
+        for host in futures[future]:
+            addresses[host] = (family, (sockaddr[0], port) + tuple(sockaddr[2:]))
+    return addresses
+
+
+def probe_ota_ports(
+    hosts: List[str],
+    port: Optional[int] = None,
+    timeout: Optional[float] = None,
+    resolve_deadline: Optional[float] = None,
+) -> dict:
+    """Connect to many OTA ports at once; return host -> connect latency in ms, or None.
+
+    Connects are started non-blocking in waves of at most OTA_PROBE_MAX_SOCKETS and
+    collected through the platform selector (epoll on Linux). All waves share one
+    deadline, ``timeout`` after resolution; hosts whose wave never started by then
+    stay None.
+    """
+    port = PING_PORT if port is None else port
+    timeout = PING_TIMEOUT if timeout is None else timeout
+    unique_hosts = list(dict.fromkeys(host for host in hosts if host))
+    results = {host: None for host in unique_hosts}
+    addresses = resolve_stream_addresses(
+        unique_hosts,
+        port,
+        STATUS_PROBE_DEADLINE if resolve_deadline is None else resolve_deadline,
+    )
+    targets = list(addresses.items())
+    deadline = time.monotonic() + max(0.05, timeout)
+    for offset in range(0, len(targets), OTA_PROBE_MAX_SOCKETS):
+        if time.monotonic() >= deadline:
+            break
+        selector = selectors.DefaultSelector()
+        try:
+            for host, (family, sockaddr) in targets[offset:offset + OTA_PROBE_MAX_SOCKETS]:
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError:
+                    continue
+                sock.setblocking(False)
+                started = time.monotonic()
+                code = sock.connect_ex(sockaddr)
+                if code == 0:
+                    results[host] = round((time.monotonic() - started) * 1000, 1)
+                    sock.close()
+                elif code in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                    selector.register(sock, selectors.EVENT_WRITE, (host, started))
+                else:
+                    sock.close()
+
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    sock = key.fileobj
+                    host, started = key.data
+                    selector.unregister(sock)
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        results[host] = round((time.monotonic() - started) * 1000, 1)
+                    sock.close()
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+    return results
+
+
+# Shared by every probe batch, so probes abandoned at a deadline cannot pile up threads.
+status_probe_executor = ThreadPoolExecutor(max_workers=STATUS_PROBE_WORKERS, thread_name_prefix="ecd-probe")
+
+
+def probe_hosts_connectivity(
+    hosts: List[str],
+    deep: bool = False,
+    mdns_probe: Optional[MDNSProbe] = None,
+    deadline: Optional[float] = None,
+    ota_latency: Optional[dict] = None,
+) -> dict:
+    """Probe hosts concurrently; hosts that miss the deadline are left out of the result.
+
+    With deep=True the OTA ports are probed as one batch alongside the DNS/mDNS checks,
+    and the connect latencies are written into ota_latency when given. Without an
+    mdns_probe a private one is created and closed once the last probe has finished,
+    which may be after this call returns.
+    """
+    if deadline is None:
+        deadline = STATUS_PROBE_DEADLINE
+    results = {}
+    if any(not host for host in hosts):
+        results[""] = (False, False, False, False, "unknown")
+    unique_hosts = list(dict.fromkeys(host for host in hosts if host))
+    if not unique_hosts:
+        return results
+    started = time.monotonic()
+    latencies = {}
+    owned_probe = mdns_probe is None
+    if owned_probe:
+        mdns_probe = MDNSProbe()
+    futures = {
+        status_probe_executor.submit(evaluate_device_connectivity, host, False, mdns_probe): host
+        for host in unique_hosts
     }
-    target_folder_id = folder_id if folder_id in valid_folder_ids else "root"
-    current = index_payload.get("projectPlacement")
-    if not isinstance(current, list):
-        current = []
-    next_items = []
-    found = False
-    now = utc_now()
-    for item in current:
-        if not isinstance(item, dict):
+    if owned_probe:
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def release_probe(_future) -> None:
+            with remaining_lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                mdns_probe.close()
+
+        for future in futures:
+            future.add_done_callback(release_probe)
+    try:
+        if deep:
+            latencies = probe_ota_ports(
+                unique_hosts,
+                timeout=min(PING_TIMEOUT, deadline),
+                resolve_deadline=max(0.1, deadline - PING_TIMEOUT),
+            )
+        done, _ = wait(futures, timeout=max(0.1, deadline - (time.monotonic() - started)))
+    finally:
+        for future in futures:
+            future.cancel()
+
+    for future in done:
+        host = futures[future]
+        try:
+            online, dns_ok, mdns_ok, ota_ok, source = future.result()
+        except Exception:
             continue
-        name = str(item.get("name") or "").strip()
-        if not name:
+        if latencies.get(host) is not None:
+            ota_ok = True
+            online = True
+            if source == "unknown":
+                source = "ota"
+        results[host] = (online, dns_ok, mdns_ok, ota_ok, source)
+    if ota_latency is not None:
+        ota_latency.update(latencies)
+    return results
+
+
+def device_probe_host(device: dict) -> str:
+    key = canonical_device_key(device)
+    return str(device.get("host") or "").strip() or (f"{key}.local" if key else "")
+
+
+def apply_device_probe_result(device: dict, result: Tuple[bool, bool, bool, bool, str], now: str) -> bool:
+    """Write a probe result into a device record; return True when a persisted field changed."""
+    online, _, _, _, source = result
+    status = "online" if online else "offline"
+    changed = False
+    if device.get("status") != status:
+        device["status"] = status
+        device["updated_at"] = now
+        changed = True
+    if device.get("status_source") != source:
+        device["status_source"] = source
+        changed = True
+    if online:
+        device["last_seen"] = now
+    return changed
+
+
+class DeviceStatusMonitor:
+    """Refresh device status in the background so status reads can answer from memory.
+
+    Devices that changed recently are probed every fast interval, online devices every
+    base interval, and devices that stay offline back off exponentially up to a cap.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.states = {}
+        self.thread: Optional[threading.Thread] = None
+        self.sweeps = 0
+        self.probes = 0
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+    def start(self) -> None:
+        if not ECD_STATUS_MONITOR or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def next_interval(self, state: dict, now: float) -> float:
+        if now - state.get("changed_at", 0.0) < STATUS_MONITOR_RECENT_WINDOW:
+            return STATUS_MONITOR_FAST_INTERVAL
+        if state.get("status") == "online":
+            return STATUS_MONITOR_INTERVAL
+        failures = max(1, int(state.get("failures") or 1))
+        return min(STATUS_MONITOR_MAX_INTERVAL, STATUS_MONITOR_INTERVAL * (2 ** min(failures - 1, 16)))
+
+    def request_refresh(self, keys: Optional[List[str]] = None) -> None:
+        with self.lock:
+            targets = self.states.keys() if keys is None else [key for key in keys if key in self.states]
+            for key in list(targets):
+                self.states[key]["next_check"] = 0.0
+                self.states[key]["revalidating"] = True
+        self.wake.set()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            state = self.states.get(key)
+            return dict(state) if state else None
+
+    def annotate(self, device: dict) -> dict:
+        """Build a device response from memory with the age of its last check."""
+        key = canonical_device_key(device)
+        state = self.get(key)
+        if not state or not state.get("checked_at"):
+            return {**build_device_response(device), "status_age": None, "revalidating": bool(state)}
+        merged = {**device, "status": state["status"], "status_source": state["source"]}
+        payload = build_device_response(merged, checks=state["checks"])
+        payload["status_age"] = round(max(0.0, time.time() - state["checked_at"]), 1)
+        payload["revalidating"] = bool(state.get("revalidating"))
+        return payload
+
+    def _seed(self, key: str, device: dict, now: float) -> None:
+        if key in self.states:
+            return
+        self.states[key] = {
+            "status": str(device.get("status") or "unknown"),
+            "source": str(device.get("status_source") or "unknown"),
+            "checks": {"dns": False, "mdns": False, "ota": False},
+            "checked_at": 0.0,
+            "changed_at": 0.0,
+            "failures": 0,
+            "next_check": now,
+            "revalidating": True,
+        }
+
+    def track(self, devices: List[dict]) -> None:
+        """Start following devices registered since the last sweep, due right away."""
+        now = time.time()
+        with self.lock:
+            for device in devices:
+                key = canonical_device_key(device)
+                if key:
+                    self._seed(key, device, now)
+        self.wake.set()
+
+    def sync(self, devices: List[dict]) -> None:
+        now = time.time()
+        with self.lock:
+            keys = set()
+            for device in devices:
+                key = canonical_device_key(device)
+                if not key:
+                    continue
+                keys.add(key)
+                self._seed(key, device, now)
+            for key in list(self.states.keys()):
+                if key not in keys:
+                    del self.states[key]
+
+    def run_once(self) -> int:
+        """Probe every due device once; return the number of probed devices."""
+        devices = load_devices()
+        self.sync(devices)
+        started = time.time()
+        with self.lock:
+            due = [
+                device
+                for device in devices
+                if canonical_device_key(device) in self.states
+                and self.states[canonical_device_key(device)]["next_check"] <= started
+            ]
+        if not due:
+            return 0
+
+        latencies = {}
+        results = probe_hosts_connectivity(
+            [device_probe_host(device) for device in due],
+            deep=ECD_STATUS_USE_PING,
+            ota_latency=latencies,
+        )
+
+        probed = self.record_results(due, results, latencies)
+        with self.lock:
+            self.sweeps += 1
+
+        if probed:
+            self._persist(probed)
+        return len(probed)
+
+    def record_results(self, devices: List[dict], results: dict, latencies: dict) -> dict:
+        """Store probe results keyed by host in memory; return the results by device key."""
+        finished = time.time()
+        probed = {}
+        with self.lock:
+            for device in devices:
+                key = canonical_device_key(device)
+                state = self.states.get(key)
+                result = results.get(device_probe_host(device))
+                if state is None:
+                    continue
+                if result is None:
+                    state["next_check"] = finished + STATUS_MONITOR_FAST_INTERVAL
+                    continue
+                online, dns_ok, mdns_ok, ota_ok, source = result
+                status = "online" if online else "offline"
+                if status != state["status"]:
+                    state["changed_at"] = finished
+                state["failures"] = 0 if online else int(state.get("failures") or 0) + 1
+                state.update(
+                    {
+                        "status": status,
+                        "source": source,
+                        "checks": {
+                            "dns": dns_ok,
+                            "mdns": mdns_ok,
+                            "ota": ota_ok,
+                            "ota_ms": latencies.get(device_probe_host(device)),
+                        },
+                        "checked_at": finished,
+                        "revalidating": False,
+                    }
+                )
+                state["next_check"] = finished + self.next_interval(state, finished)
+                probed[key] = result
+            self.probes += len(probed)
+        return probed
+
+    def _persist(self, results: dict) -> None:
+        device_registry.apply_probe_results(results, utc_now())
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                pass
+            with self.lock:
+                pending = [state["next_check"] for state in self.states.values()]
+            delay = min(pending) - time.time() if pending else STATUS_MONITOR_INTERVAL
+            self.wake.wait(timeout=min(STATUS_MONITOR_INTERVAL, max(0.5, delay)))
+            self.wake.clear()
+
+    def metrics(self) -> dict:
+        with self.lock:
+            states = list(self.states.values())
+        now = time.time()
+        ages = [now - state["checked_at"] for state in states if state.get("checked_at")]
+        return {
+            "running": self.running,
+            "devices": len(states),
+            "sweeps": self.sweeps,
+            "probes": self.probes,
+            "max_age": round(max(ages), 1) if ages else None,
+        }
+
+
+status_monitor = DeviceStatusMonitor()
+
+
+def refresh_device_statuses(devices: List[dict], deep: bool) -> List[dict]:
+    """Probe the given devices concurrently, store the results and return device responses.
+
+    When the background monitor runs, the results also replace its in-memory state.
+    """
+    latencies = {}
+    hosts = {canonical_device_key(device): device_probe_host(device) for device in devices}
+    results = probe_hosts_connectivity(list(hosts.values()), deep=deep, ota_latency=latencies)
+    if status_monitor.running:
+        status_monitor.track(devices)
+        status_monitor.record_results(devices, results, latencies)
+
+    by_key = {key: results.get(host) for key, host in hosts.items()}
+    updated = {
+        canonical_device_key(device): device
+        for device in device_registry.apply_probe_results(by_key, utc_now(), hosts=hosts)
+    }
+
+    response_devices = []
+    for device in devices:
+        key = canonical_device_key(device)
+        device = updated.get(key, device)
+        result = by_key.get(key)
+        if result is None:
+            # Probe missed the deadline: keep the last known status.
+            response_devices.append({**build_device_response(device), "probe_timed_out": True})
             continue
-        if name == project_filename:
-            updated = dict(item)
-            updated["folderId"] = str(updated.get("folderId") or target_folder_id)
-            updated["lastEditedAt"] = now
-            next_items.append(updated)
-            found = True
+        _, dns_ok, mdns_ok, ota_ok, _ = result
+        checks = {"dns": dns_ok, "mdns": mdns_ok, "ota": ota_ok, "ota_ms": latencies.get(hosts[key])}
+        response_devices.append(build_device_response(device, checks=checks))
+    return response_devices
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers that use the same key."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def run(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+            else:
+                self.shared += 1
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = func()
+        except Exception as exc:
+            call["error"] = exc
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call["done"].set()
+        return call["result"]
+
+
+status_refresh_flight = SingleFlight()
+
+
+def firmware_build_roots() -> List[str]:
+    build_roots = []
+    for root in (
+        ESPHOME_BUILD_PATH,
+        "/data/build",
+        os.path.join(ESPHOME_DATA_DIR, "build"),
+    ):
+        if root and root not in build_roots and os.path.isdir(root):
+            build_roots.append(root)
+    return build_roots
+
+
+def find_firmware_path(node_name: str, variant: str = "ota", extra_roots: Optional[List[str]] = None) -> str:
+    build_roots = firmware_build_roots()
+    for root in extra_roots or []:
+        if root and root not in build_roots and os.path.isdir(root):
+            build_roots.append(root)
+    if not build_roots:
+        return ""
+
+    target_names = ["firmware.bin"]
+    if variant == "factory":
+        target_names = ["firmware.factory.bin"]
+
+    def add_candidate(candidates: List[Tuple[float, str]], path: str) -> None:
+        if not path or not os.path.isfile(path):
+            return
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        candidates.append((mtime, path))
+
+    candidates = []
+    for build_root in build_roots:
+        build_dir = os.path.join(build_root, node_name)
+        if not os.path.isdir(build_dir):
+            continue
+
+        # Fast path: known ESPHome/PlatformIO output locations.
+        pioenvs_dir = os.path.join(build_dir, ".pioenvs")
+        for filename in target_names:
+            add_candidate(candidates, os.path.join(build_dir, filename))
+            add_candidate(candidates, os.path.join(pioenvs_dir, node_name, filename))
+            if os.path.isdir(pioenvs_dir):
+                for env_name in os.listdir(pioenvs_dir):
+                    add_candidate(candidates, os.path.join(pioenvs_dir, env_name, filename))
+
+    if candidates:
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return candidates[0][1]
+
+    # Fallback: deep scan for non-standard build layouts.
+    for build_root in build_roots:
+        build_dir = os.path.join(build_root, node_name)
+        if not os.path.isdir(build_dir):
             continue
-        next_items.append(item)
-    if not found:
-        next_items.append({"name": project_filename, "folderId": target_folder_id, "lastEditedAt": now})
-    index_payload["projectPlacement"] = next_items
-    return index_payload
+        for root, _, files in os.walk(build_dir):
+            for filename in files:
+                if filename not in target_names:
+                    continue
+                add_candidate(candidates, os.path.join(root, filename))
 
+    if not candidates:
+        return ""
 
-def remove_project_from_index(project_filename: str) -> bool:
-    index_payload = load_projects_index()
-    current = index_payload.get("projectPlacement")
-    if not isinstance(current, list):
-        current = []
-    next_items = [
-        item
-        for item in current
-        if not (isinstance(item, dict) and str(item.get("name") or "").strip() == project_filename)
-    ]
-    changed = len(next_items) != len(current)
-    if changed:
-        index_payload["projectPlacement"] = next_items
-        save_projects_index(index_payload)
-    return changed
+    candidates.sort(key=lambda item: item[0], reverse=True)
+    return candidates[0][1]
 
 
-def rename_project_in_index(old_name: str, new_name: str) -> bool:
-    if not old_name or not new_name or old_name == new_name:
-        return False
-    index_payload = load_projects_index()
-    current = index_payload.get("projectPlacement")
-    if not isinstance(current, list):
-        current = []
+FIRMWARE_ARTIFACT_NAMES = ("firmware.bin", "firmware.factory.bin")
 
-    changed = False
-    deduped = []
-    seen_names = set()
-    for item in current:
-        if not isinstance(item, dict):
-            deduped.append(item)
-            continue
-        name = str(item.get("name") or "").strip()
-        next_name = new_name if name == old_name else name
-        if next_name != name:
-            item = dict(item)
-            item["name"] = next_name
-            changed = True
-        if not next_name:
-            changed = True
-            continue
-        if next_name in seen_names:
-            changed = True
-            continue
-        seen_names.add(next_name)
-        deduped.append(item)
 
-    if changed:
-        index_payload["projectPlacement"] = deduped
-        save_projects_index(index_payload)
-    return changed
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                continue
+    return total
 
 
-def unregister_device_record(
-    *,
-    yaml_name: str = "",
-    device_key: str = "",
-) -> Tuple[bool, int]:
-    normalized_yaml = normalize_yaml_filename(yaml_name) if yaml_name else ""
-    normalized_key = normalize_device_key(device_key) if device_key else ""
-    if not normalized_yaml and not normalized_key:
-        return False, 0
+def load_build_history() -> dict:
+    data = read_json_file(BUILD_HISTORY_PATH) or {}
+    nodes = data.get("nodes")
+    return nodes if isinstance(nodes, dict) else {}
 
-    devices = load_devices()
-    kept = []
-    removed = 0
-    for device in devices:
-        remove = False
-        if normalized_yaml:
-            device_yaml = normalize_yaml_filename(str(device.get("yaml") or ""))
-            if device_yaml and device_yaml.lower() == normalized_yaml.lower():
-                remove = True
-        if not remove and normalized_key:
-            if canonical_device_key(device) == normalized_key:
-                remove = True
-        if remove:
-            removed += 1
+
+def record_build(node_name: str) -> None:
+    if not node_name:
+        return
+    with BUILD_HISTORY_LOCK:
+        nodes = load_build_history()
+        nodes[node_name] = {"built_at": time.time()}
+        try:
+            write_json_file_atomic(BUILD_HISTORY_PATH, {"nodes": nodes})
+        except OSError:
+            pass
+
+
+def trim_build_dir(build_dir: str) -> int:
+    """Remove a node build tree but keep its newest firmware images at the top level."""
+    before = directory_size(build_dir)
+    keep = {}
+    for root, _, files in os.walk(build_dir):
+        for filename in files:
+            if filename not in FIRMWARE_ARTIFACT_NAMES:
+                continue
+            path = os.path.join(root, filename)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if filename not in keep or mtime > keep[filename][0]:
+                keep[filename] = (mtime, path)
+
+    for filename, (_, path) in keep.items():
+        target = os.path.join(build_dir, filename)
+        if path != target:
+            temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+            shutil.copy2(path, temp_path)
+            os.replace(temp_path, target)
+
+    for name in os.listdir(build_dir):
+        path = os.path.join(build_dir, name)
+        if name in keep:
             continue
-        kept.append(device)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return max(0, before - directory_size(build_dir))
 
-    if removed:
-        save_devices(kept)
-        return True, removed
-    return False, 0
 
+class BuildGarbageCollector:
+    """Keep the build directories under a byte budget, evicting least recently built nodes."""
 
-def device_key_from_yaml(yaml_name: str) -> str:
-    normalized = normalize_yaml_filename(yaml_name)
-    if not normalized:
-        return ""
-    return normalized[:-5].strip().lower()
+    def __init__(self, max_bytes: int, interval: float) -> None:
+        self.max_bytes = max_bytes
+        self.interval = max(60.0, interval)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.active_nodes = lambda: set()
+        self.last_report: Optional[dict] = None
+        self.total_reclaimed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def scan(self) -> List[dict]:
+        history = load_build_history()
+        nodes = []
+        for build_root in firmware_build_roots():
+            try:
+                names = os.listdir(build_root)
+            except OSError:
+                continue
+            for name in names:
+                build_dir = os.path.join(build_root, name)
+                if not os.path.isdir(build_dir) or os.path.islink(build_dir):
+                    continue
+                entry = history.get(name) if isinstance(history.get(name), dict) else {}
+                try:
+                    last_built = float(entry.get("built_at") or os.path.getmtime(build_dir))
+                except (OSError, TypeError, ValueError):
+                    last_built = 0.0
+                nodes.append(
+                    {
+                        "node": name,
+                        "path": build_dir,
+                        "size": directory_size(build_dir),
+                        "last_built": last_built,
+                    }
+                )
+        nodes.sort(key=lambda item: item["last_built"])
+        return nodes
 
+    def run_once(self) -> dict:
+        with self.lock:
+            nodes = self.scan()
+            total_before = sum(item["size"] for item in nodes)
+            total = total_before
+            active = set(self.active_nodes() or ())
+            evicted = []
+            for item in nodes:
+                if total <= self.max_bytes:
+                    break
+                if item["node"] in active:
+                    continue
+                try:
+                    reclaimed = trim_build_dir(item["path"])
+                except OSError:
+                    continue
+                if not reclaimed:
+                    continue
+                total -= reclaimed
+                evicted.append({"node": item["node"], "path": item["path"], "reclaimed": reclaimed})
+
+            reclaimed_total = total_before - total
+            self.total_reclaimed += reclaimed_total
+            self.last_report = {
+                "ran_at": utc_now(),
+                "budget": self.max_bytes,
+                "total_before": total_before,
+                "total_after": total,
+                "reclaimed": reclaimed_total,
+                "evicted": evicted,
+            }
+            return dict(self.last_report)
 
-def normalize_device_key(value: str) -> str:
-    raw = str(value or "").strip().lower()
-    if not raw:
-        return ""
-    if raw.endswith(".yaml"):
-        raw = raw[:-5]
-    if raw.endswith(".json"):
-        raw = raw[:-5]
-    if not raw or not VALID_DEVICE.match(raw):
-        return ""
-    return raw
+    def trigger(self) -> None:
+        self.wake.set()
 
+    def start(self) -> None:
+        if not self.enabled or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
 
-def canonical_device_key(device: dict) -> str:
-    yaml_name = str(device.get("yaml") or "").strip()
-    key_from_yaml = device_key_from_yaml(yaml_name)
-    if key_from_yaml:
-        return key_from_yaml
-    return normalize_device_key(str(device.get("name") or ""))
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                pass
+            self.wake.wait(self.interval)
+            self.wake.clear()
 
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "budget": self.max_bytes,
+            "interval": self.interval,
+            "total_reclaimed": self.total_reclaimed,
+            "last_report": self.last_report,
+        }
 
-def build_device_response(device: dict, checks: Optional[dict] = None) -> dict:
-    key = canonical_device_key(device)
-    yaml_name = normalize_yaml_filename(str(device.get("yaml") or ""))
-    name = str(device.get("name") or "").strip()
-    host = str(device.get("host") or "").strip()
-    status = str(device.get("status") or "").strip().lower()
-    if status not in ("online", "offline", "unknown"):
-        status = "unknown"
-    status_source = str(device.get("status_source") or "").strip().lower()
-    if status_source not in ("dns", "mdns", "ota", "unknown"):
-        status_source = "unknown"
 
-    payload = {
-        **device,
-        "device_key": key,
-        "yaml": yaml_name,
-        "name": name,
-        "host": host,
-        "status": status,
-        "status_source": status_source,
-        "checks": {
-            "dns": bool((checks or {}).get("dns", False)),
-            "mdns": bool((checks or {}).get("mdns", False)),
-            "ota": bool((checks or {}).get("ota", False)),
-        },
-    }
-    return payload
+build_gc = BuildGarbageCollector(BUILD_GC_MAX_BYTES, BUILD_GC_INTERVAL)
 
 
-class MDNSProbe:
-    def __init__(self) -> None:
-        self.cache = {}
-        self.zc = None
-        if Zeroconf is None:
-            return
+ESPHOME_VERSION_CACHE = {}
+
+
+def esphome_version() -> str:
+    """Return the installed ESPHome version, asking the CLI once per binary."""
+    if ESPHOME_BIN in ESPHOME_VERSION_CACHE:
+        return ESPHOME_VERSION_CACHE[ESPHOME_BIN]
+    version = ""
+    try:
+        result = subprocess.run(
+            shlex.split(ESPHOME_BIN) + ["version"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+            check=False,
+        )
+        match = re.search(r"(\d+\.\d+\.\d+\S*)", result.stdout or "")
+        version = match.group(1) if match else ""
+    except (OSError, ValueError, subprocess.SubprocessError):
+        version = ""
+    ESPHOME_VERSION_CACHE[ESPHOME_BIN] = version
+    return version
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_with_sha256(source: str, target: str) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    with open(source, "rb") as src, open(temp_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+            size += len(chunk)
+    os.replace(temp_path, target)
+    return size, digest.hexdigest()
+
+
+class ArtifactStore:
+    """Indexed copies of built firmware images, newest first per node, with retention."""
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, root: str, keep: int, max_bytes: int) -> None:
+        self.root = root
+        self.keep = max(1, keep)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.nodes: Optional[dict] = None
+        self.deployed: dict = {}
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, self.INDEX_NAME)
+
+    def _nodes(self) -> dict:
+        if self.nodes is None:
+            data = read_json_file(self.index_path) or {}
+            nodes = data.get("nodes")
+            deployed = data.get("deployed")
+            self.nodes = nodes if isinstance(nodes, dict) else {}
+            self.deployed = deployed if isinstance(deployed, dict) else {}
+        return self.nodes
+
+    def _save(self) -> None:
+        write_json_file_atomic(self.index_path, {"nodes": self._nodes(), "deployed": self.deployed})
+
+    def mark_deployed(self, node_name: str, artifact_id: str) -> None:
+        with self.lock:
+            self._nodes()
+            self.deployed[node_name] = {"id": artifact_id, "deployed_at": utc_now()}
+            self._save()
+
+    def deployment(self, node_name: str) -> Optional[dict]:
+        with self.lock:
+            self._nodes()
+            entry = self.deployed.get(node_name)
+            return dict(entry) if isinstance(entry, dict) else None
+
+    def latest(self, node_name: str) -> Optional[dict]:
+        with self.lock:
+            versions = self._nodes().get(node_name) or []
+            return dict(versions[0]) if versions else None
+
+    def register(self, node_name: str, images: dict, yaml_path: str = "") -> Optional[dict]:
+        """Copy the variant -> path images into the store and index them as a new version."""
+        images = {variant: path for variant, path in images.items() if path and os.path.isfile(path)}
+        if not node_name or "ota" not in images:
+            return None
+        yaml_sha256 = yaml_fingerprint(yaml_path) if yaml_path else ""
+
+        with self.lock:
+            versions = self._nodes().setdefault(node_name, [])
+            ota_sha256 = file_sha256(images["ota"])
+            if versions and versions[0]["files"].get("ota", {}).get("sha256") == ota_sha256:
+                versions[0]["built_at"] = utc_now()
+                versions[0]["yaml_sha256"] = yaml_sha256 or versions[0].get("yaml_sha256", "")
+                for variant, path in images.items():
+                    if variant in versions[0]["files"]:
+                        versions[0]["files"][variant].update(self._source_info(path))
+                self._save()
+                return dict(versions[0])
+
+            artifact_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{ota_sha256[:8]}"
+            version_dir = os.path.join(self.root, node_name, artifact_id)
+            os.makedirs(version_dir, exist_ok=True)
+            files = {}
+            for variant, path in images.items():
+                filename = "firmware.factory.bin" if variant == "factory" else "firmware.bin"
+                size, sha256 = copy_with_sha256(path, os.path.join(version_dir, filename))
+                files[variant] = {"name": filename, "size": size, "sha256": sha256, **self._source_info(path)}
+
+            entry = {
+                "id": artifact_id,
+                "node": node_name,
+                "built_at": utc_now(),
+                "esphome_version": esphome_version(),
+                "yaml_sha256": yaml_sha256,
+                "files": files,
+            }
+            versions.insert(0, entry)
+            self._prune()
+            self._save()
+            return dict(entry)
+
+    @staticmethod
+    def _source_info(path: str) -> dict:
+        # Where the image was copied from, so downloads can spot a newer build of it
+        # by stat'ing this one path instead of probing the build roots.
         try:
-            if IPVersion is not None:
-                self.zc = Zeroconf(ip_version=IPVersion.All)
-            else:
-                self.zc = Zeroconf()
-        except Exception:
-            self.zc = None
+            return {"source": path, "source_mtime_ns": os.stat(path).st_mtime_ns}
+        except OSError:
+            return {}
+
+    @staticmethod
+    def rebuilt_source(info: Optional[dict]) -> str:
+        """Return the build image a stored file was copied from when it has been rewritten
+        since (a build run outside this instance's jobs), else ""."""
+        source = str((info or {}).get("source") or "")
+        if not source:
+            return ""
+        try:
+            newer = os.stat(source).st_mtime_ns > int(info.get("source_mtime_ns") or 0)
+        except (OSError, TypeError, ValueError):
+            return ""
+        return source if newer else ""
 
-    def is_online(self, host: str) -> bool:
-        normalized = str(host or "").strip().rstrip(".").lower()
-        if not normalized or not normalized.endswith(".local"):
-            return False
-        cached = self.cache.get(normalized)
-        if cached is not None:
-            return cached
+    def _remove_version(self, node_name: str, entry: dict) -> None:
+        shutil.rmtree(os.path.join(self.root, node_name, entry["id"]), ignore_errors=True)
 
-        if self.zc is None:
-            self.cache[normalized] = False
-            return False
+    def _prune(self) -> None:
+        nodes = self._nodes()
+        for node_name, versions in nodes.items():
+            for entry in versions[self.keep:]:
+                self._remove_version(node_name, entry)
+            del versions[self.keep:]
 
-        node = normalized[:-6].strip()
-        if not node:
-            self.cache[normalized] = False
-            return False
+        if self.max_bytes <= 0:
+            return
+        total = sum(self._entry_size(entry) for versions in nodes.values() for entry in versions)
+        older = [
+            (entry["built_at"], node_name, entry)
+            for node_name, versions in nodes.items()
+            for entry in versions[1:]
+        ]
+        older.sort(key=lambda item: item[0])
+        for _, node_name, entry in older:
+            if total <= self.max_bytes:
+                break
+            self._remove_version(node_name, entry)
+            nodes[node_name].remove(entry)
+            total -= self._entry_size(entry)
 
-        online = False
-        for service_type in ("_esphomelib._tcp.local.", "_esphome._tcp.local."):
-            service_name = f"{node}.{service_type}"
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        return sum(int(item.get("size") or 0) for item in entry.get("files", {}).values())
+
+    def versions(self, node_name: str) -> List[dict]:
+        with self.lock:
+            return [dict(entry) for entry in self._nodes().get(node_name, [])]
+
+    def lookup(self, node_name: str, variant: str = "ota", version: str = "") -> Tuple[str, Optional[dict]]:
+        """Return (path, file info) of the newest or the requested version of a node image."""
+        with self.lock:
+            versions = self._nodes().get(node_name) or []
+            entry = versions[0] if versions and not version else None
+            if version:
+                entry = next((item for item in versions if item["id"] == version), None)
+            info = (entry or {}).get("files", {}).get(variant)
+            if not entry or not info:
+                return "", None
+            path = os.path.join(self.root, node_name, entry["id"], info["name"])
+        if not os.path.isfile(path):
+            return "", None
+        return path, {**info, "id": entry["id"]}
+
+    def metrics(self) -> dict:
+        with self.lock:
+            nodes = self._nodes()
+            return {
+                "nodes": len(nodes),
+                "versions": sum(len(versions) for versions in nodes.values()),
+                "bytes": sum(self._entry_size(entry) for versions in nodes.values() for entry in versions),
+                "keep": self.keep,
+                "max_bytes": self.max_bytes,
+            }
+
+
+artifact_store = ArtifactStore(ARTIFACTS_DIR, ARTIFACT_KEEP, ARTIFACT_MAX_BYTES)
+
+
+YAML_FINGERPRINT_CACHE = {}
+
+
+def yaml_fingerprint(yaml_path: str) -> str:
+    """sha256 of a YAML and the local files it pulls in, re-hashed only when one of them changes.
+
+    ``!include`` files below the YAML's folder and, when ``!secret`` is used, the
+    ``secrets.yaml`` next to it are part of the fingerprint; a YAML without either
+    hashes to the sha256 of its own bytes.
+    """
+    root = os.path.dirname(os.path.abspath(yaml_path))
+    paths = [yaml_path] + yaml_include_files(yaml_path, root)
+    secrets_path = os.path.join(root, "secrets.yaml")
+    if os.path.isfile(secrets_path) and secrets_path not in paths:
+        for path in paths:
             try:
-                info = self.zc.get_service_info(service_type, service_name, timeout=1200)
-            except Exception:
-                info = None
-            if info is not None:
-                online = True
+                with open(path, "r", encoding="utf-8", errors="replace") as handle:
+                    if "!secret" in handle.read():
+                        paths.append(secrets_path)
+                        break
+            except OSError:
+                continue
+    try:
+        stats = [os.stat(path) for path in paths]
+    except OSError:
+        return ""
+    signature = tuple((path, stat.st_size, stat.st_mtime_ns) for path, stat in zip(paths, stats))
+    cached = YAML_FINGERPRINT_CACHE.get(yaml_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    try:
+        digest = file_sha256(yaml_path)
+        if len(paths) > 1:
+            combined = hashlib.sha256(digest.encode("ascii"))
+            for path in paths[1:]:
+                combined.update(f"\0{os.path.relpath(path, root)}\0{file_sha256(path)}".encode("utf-8"))
+            digest = combined.hexdigest()
+    except OSError:
+        return ""
+    YAML_FINGERPRINT_CACHE[yaml_path] = (signature, digest)
+    return digest
+
+
+def firmware_drift(node_name: str, yaml_name: str, advertised: Optional[dict] = None) -> dict:
+    """Classify a device as up_to_date, needs_rebuild or needs_ota with the reasons why."""
+    reasons = []
+    yaml_sha256 = yaml_fingerprint(os.path.join(TARGET_DIR, yaml_name)) if yaml_name else ""
+    latest = artifact_store.latest(node_name)
+    deployed = artifact_store.deployment(node_name)
+    advertised_version = str((advertised or {}).get("version") or "")
+
+    if not yaml_sha256:
+        reasons.append("yaml_missing")
+    if latest is None:
+        reasons.append("never_built")
+    else:
+        if yaml_sha256 and latest.get("yaml_sha256") != yaml_sha256:
+            reasons.append("yaml_changed")
+        installed_version = ESPHOME_VERSION_CACHE.get(ESPHOME_BIN, "")
+        if installed_version and latest.get("esphome_version") and installed_version != latest["esphome_version"]:
+            reasons.append("esphome_upgraded")
+
+    if "yaml_missing" in reasons:
+        state = "unknown"
+    elif reasons:
+        state = "needs_rebuild"
+    else:
+        if not deployed:
+            reasons.append("deployment_unknown")
+        elif deployed.get("id") != latest["id"]:
+            reasons.append("newer_build_available")
+        if advertised_version and latest.get("esphome_version") and advertised_version != latest["esphome_version"]:
+            reasons.append("advertised_version_differs")
+        state = "needs_ota" if reasons else "up_to_date"
+
+    return {
+        "state": state,
+        "reasons": reasons,
+        "yaml_sha256": yaml_sha256,
+        "artifact": {key: latest.get(key) for key in ("id", "built_at", "esphome_version", "yaml_sha256")}
+        if latest
+        else None,
+        "deployed": deployed,
+        "advertised_version": advertised_version or None,
+    }
+
+
+TOOLCHAIN_PLATFORMS = {
+    "esp32": "espressif32",
+    "esp8266": "espressif8266",
+    "rp2040": "raspberrypi",
+    "bk72xx": "libretiny",
+    "rtl87xx": "libretiny",
+    "ln882x": "libretiny",
+    "nrf52": "nordicnrf52",
+}
+
+
+YAML_INCLUDE_PATTERN = re.compile(r"!include\s+(?:\{[^}]*?\bfile:\s*)?['\"]?([^'\"\s,}]+)")
+YAML_LOCAL_ASSET_PATTERN = re.compile(r"^[ \t-]*(?:file|path):[ \t]*['\"]?([^'\"\s#!{}]+)", re.MULTILINE)
+
+
+def yaml_include_files(yaml_path: str, root: str) -> List[str]:
+    """Return the local files a YAML pulls in through ``!include``, transitively.
+
+    Paths are resolved against the including file and kept only when they stay below
+    ``root``. Remote packages are not followed.
+    """
+    root = os.path.abspath(root)
+    found = []
+    seen = {os.path.abspath(yaml_path)}
+    pending = [os.path.abspath(yaml_path)]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(current, "r", encoding="utf-8", errors="replace") as handle:
+                text = handle.read()
+        except OSError:
+            continue
+        for match in YAML_INCLUDE_PATTERN.finditer(text):
+            candidate = os.path.abspath(os.path.join(os.path.dirname(current), match.group(1)))
+            if candidate in seen or os.path.commonpath([root, candidate]) != root or not os.path.isfile(candidate):
+                continue
+            seen.add(candidate)
+            found.append(candidate)
+            pending.append(candidate)
+    return found
+
+
+def parse_yaml_toolchain_target(text: str) -> Optional[dict]:
+    """Read platform, board, variant and framework from the top level of an ESPHome YAML."""
+    platform = ""
+    values = {}
+    child_indent = None
+    framework_indent = None
+    in_framework = False
+    for raw_line in str(text or "").splitlines():
+        line = raw_line.split(" #", 1)[0].rstrip()
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        key, _, value = line.strip().partition(":")
+        key = key.strip()
+        value = value.strip().strip("'\"")
+        if indent == 0:
+            if platform:
                 break
+            if key in TOOLCHAIN_PLATFORMS:
+                platform = key
+            continue
+        if not platform:
+            continue
+        if child_indent is None:
+            child_indent = indent
+        if indent <= child_indent:
+            in_framework = key == "framework" and not value
+            framework_indent = None
+            if key in ("board", "variant"):
+                values[key] = value
+        elif in_framework:
+            if framework_indent is None:
+                framework_indent = indent
+            if indent == framework_indent and key in ("type", "version"):
+                values[f"framework_{key}"] = value
+
+    if not platform:
+        return None
+    return {
+        "platform": platform,
+        "board": values.get("board", ""),
+        "variant": values.get("variant", ""),
+        "framework": values.get("framework_type", ""),
+        "framework_version": values.get("framework_version", ""),
+    }
 
-        self.cache[normalized] = online
-        return online
 
-    def close(self) -> None:
-        if self.zc is None:
-            return
+def read_yaml_toolchain_target(yaml_path: str, root: str) -> Optional[dict]:
+    """Parse a YAML's toolchain target, filling gaps from the files it includes."""
+    target = None
+    for path in [yaml_path] + yaml_include_files(yaml_path, root):
         try:
-            self.zc.close()
-        except Exception:
-            pass
-        self.zc = None
+            with open(path, "r", encoding="utf-8", errors="replace") as handle:
+                found = parse_yaml_toolchain_target(handle.read())
+        except OSError:
+            continue
+        if not found:
+            continue
+        if target is None:
+            target = found
+        elif found["platform"] == target["platform"]:
+            for key, value in found.items():
+                target[key] = target[key] or value
+    return target
 
 
-def ping_host(host: str, port: int = PING_PORT, timeout: float = PING_TIMEOUT) -> bool:
-    if not host:
-        return False
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except Exception:
-        return False
+def toolchain_target_key(target: dict) -> str:
+    parts = [target.get(name, "") for name in ("platform", "board", "variant", "framework", "framework_version")]
+    return ":".join(str(part or "").lower() for part in parts)
 
 
-def resolve_host(host: str) -> bool:
-    if not host:
-        return False
+def scan_toolchain_targets() -> List[dict]:
+    """Group saved YAML files by the toolchain they need."""
+    targets = {}
     try:
-        socket.getaddrinfo(host, None)
-        return True
-    except Exception:
+        names = sorted(os.listdir(TARGET_DIR))
+    except OSError:
+        return []
+    for name in names:
+        if not VALID_YAML.match(name) or name == SECRETS_FILENAME:
+            continue
+        target = read_yaml_toolchain_target(os.path.join(TARGET_DIR, name), TARGET_DIR)
+        if not target or not (target["board"] or target["variant"]):
+            continue
+        key = toolchain_target_key(target)
+        entry = targets.setdefault(key, {**target, "key": key, "yamls": []})
+        entry["yamls"].append(name)
+    return list(targets.values())
+
+
+def toolchain_work_dir() -> str:
+    return os.path.join(ESPHOME_DATA_DIR, "toolchains")
+
+
+def toolchain_platform_installed(platform: str) -> bool:
+    package_name = TOOLCHAIN_PLATFORMS.get(platform, "")
+    platforms_dir = os.environ.get("PLATFORMIO_PLATFORMS_DIR", "")
+    if not package_name or not platforms_dir or not os.path.isdir(platforms_dir):
         return False
+    return any(
+        name == package_name or name.startswith(f"{package_name}@")
+        for name in os.listdir(platforms_dir)
+    )
 
 
-def evaluate_device_connectivity(
-    host: str,
-    deep: bool = False,
-    mdns_probe: Optional[MDNSProbe] = None,
-) -> Tuple[bool, bool, bool, bool, str]:
-    """Return (online, dns_ok, mdns_ok, ota_ok, source) for a device host."""
-    dns_ok = resolve_host(host)
-    mdns_ok = mdns_probe.is_online(host) if mdns_probe else False
-    ota_ok = ping_host(host) if deep else False
-    online = dns_ok or mdns_ok or ota_ok
-    source = "unknown"
-    if dns_ok:
-        source = "dns"
-    elif mdns_ok:
-        source = "mdns"
-    elif ota_ok:
-        source = "ota"
-    return online, dns_ok, mdns_ok, ota_ok, source
+def write_toolchain_stub(target: dict) -> Tuple[str, str]:
+    """Write a minimal project for a target and return (yaml_path, build_path)."""
+    digest = hashlib.sha256(target["key"].encode("utf-8")).hexdigest()[:10]
+    node_name = f"ecd-toolchain-{digest}"
+    work_dir = toolchain_work_dir()
+    build_path = os.path.join(work_dir, "build", node_name)
+    lines = [
+        "esphome:",
+        f"  name: {node_name}",
+        f"  build_path: {json.dumps(build_path)}",
+        f"{target['platform']}:",
+    ]
+    if target.get("board"):
+        lines.append(f"  board: {json.dumps(target['board'])}")
+    if target.get("variant"):
+        lines.append(f"  variant: {json.dumps(target['variant'])}")
+    if target.get("framework"):
+        lines.append("  framework:")
+        lines.append(f"    type: {json.dumps(target['framework'])}")
+        if target.get("framework_version"):
+            lines.append(f"    version: {json.dumps(target['framework_version'])}")
+    yaml_path = os.path.join(work_dir, f"{node_name}.yaml")
+    write_text_file_atomic(yaml_path, "\n".join(lines))
+    return yaml_path, build_path
+
+
+# PlatformIO post script that prefixes the toolchain compilers with ccache.
+COMPILER_CACHE_SCRIPT = """Import("env")  # noqa: F821
 
+import os
 
-def find_firmware_path(node_name: str, variant: str = "ota") -> str:
-    build_roots = []
-    for root in (
-        ESPHOME_BUILD_PATH,
-        "/data/build",
-        os.path.join(ESPHOME_DATA_DIR, "build"),
-    ):
-        if root and root not in build_roots and os.path.isdir(root):
-            build_roots.append(root)
+ccache = os.environ.get("ECD_CCACHE_BIN", "")
+if ccache:
+    for key in ("CC", "CXX"):
+        value = str(env.get(key) or "")  # noqa: F821
+        if value and not value.startswith(ccache):
+            env.Replace(**{key: '"%s" %s' % (ccache, value)})  # noqa: F821
+"""
 
-    if not build_roots:
+COMPILER_CACHE_TOTALS = {"jobs": 0, "hits": 0, "misses": 0}
+
+
+def compiler_cache_binary() -> str:
+    if not ECD_COMPILER_CACHE or not COMPILER_CACHE_BIN:
         return ""
+    return shutil.which(COMPILER_CACHE_BIN) or ""
 
-    target_names = ["firmware.bin"]
-    if variant == "factory":
-        target_names = ["firmware.factory.bin"]
 
-    def add_candidate(candidates: List[Tuple[float, str]], path: str) -> None:
-        if not path or not os.path.isfile(path):
-            return
-        try:
-            mtime = os.path.getmtime(path)
-        except OSError:
-            return
-        candidates.append((mtime, path))
+def ensure_compiler_cache_script() -> str:
+    path = os.path.join(COMPILER_CACHE_DIR, COMPILER_CACHE_SCRIPT_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            if handle.read() == COMPILER_CACHE_SCRIPT:
+                return path
+    except OSError:
+        pass
+    write_text_file_atomic(path, COMPILER_CACHE_SCRIPT)
+    return path
+
+
+def compiler_cache_base_dir(config_dir: str = "") -> str:
+    """Common parent of the per-node build dirs, so ccache hashes their paths as relative."""
+    roots = [os.path.abspath(config_dir or TARGET_DIR)]
+    if ESPHOME_BUILD_PATH:
+        roots.append(os.path.abspath(ESPHOME_BUILD_PATH))
+    try:
+        common = os.path.commonpath(roots)
+    except ValueError:
+        common = ""
+    if not common or common == os.path.dirname(common):
+        return roots[-1]
+    return common
 
-    candidates = []
-    for build_root in build_roots:
-        build_dir = os.path.join(build_root, node_name)
-        if not os.path.isdir(build_dir):
-            continue
 
-        # Fast path: known ESPHome/PlatformIO output locations.
-        pioenvs_dir = os.path.join(build_dir, ".pioenvs")
-        for filename in target_names:
-            add_candidate(candidates, os.path.join(build_dir, filename))
-            add_candidate(candidates, os.path.join(pioenvs_dir, node_name, filename))
-            if os.path.isdir(pioenvs_dir):
-                for env_name in os.listdir(pioenvs_dir):
-                    add_candidate(candidates, os.path.join(pioenvs_dir, env_name, filename))
+def compiler_cache_env(config_dir: str = "") -> dict:
+    """Return extra environment for compile commands, or {} when ccache is off."""
+    binary = compiler_cache_binary()
+    if not binary:
+        return {}
+    try:
+        os.makedirs(COMPILER_CACHE_DIR, exist_ok=True)
+        script_path = ensure_compiler_cache_script()
+    except OSError:
+        return {}
+    extra_scripts = os.environ.get("PLATFORMIO_EXTRA_SCRIPTS", "").strip()
+    return {
+        "ECD_CCACHE_BIN": binary,
+        "CCACHE_DIR": COMPILER_CACHE_DIR,
+        "CCACHE_MAXSIZE": COMPILER_CACHE_MAX_SIZE,
+        # Each node builds in its own dir; rewriting paths below the common parent to
+        # relative ones keeps their -I flags out of the hash so framework objects are shared.
+        "CCACHE_BASEDIR": compiler_cache_base_dir(config_dir),
+        # Keep the working directory out of the hash of -g builds as well.
+        "CCACHE_NOHASHDIR": "1",
+        "CCACHE_COMPILERCHECK": "content",
+        "IDF_CCACHE_ENABLE": "1",
+        "PLATFORMIO_EXTRA_SCRIPTS": f"{extra_scripts}\n{script_path}" if extra_scripts else script_path,
+    }
 
-    if candidates:
-        candidates.sort(key=lambda item: item[0], reverse=True)
-        return candidates[0][1]
 
-    # Fallback: deep scan for non-standard build layouts.
-    for build_root in build_roots:
-        build_dir = os.path.join(build_root, node_name)
-        if not os.path.isdir(build_dir):
+def compiler_cache_stats() -> dict:
+    binary = compiler_cache_binary()
+    if not binary:
+        return {}
+    env = os.environ.copy()
+    env["CCACHE_DIR"] = COMPILER_CACHE_DIR
+    try:
+        result = subprocess.run(
+            [binary, "--print-stats"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            env=env,
+        )
+    except Exception:
+        return {}
+    if result.returncode != 0:
+        return {}
+    stats = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition("\t")
+        try:
+            stats[key.strip()] = int(value.strip())
+        except ValueError:
             continue
-        for root, _, files in os.walk(build_dir):
-            for filename in files:
-                if filename not in target_names:
-                    continue
-                add_candidate(candidates, os.path.join(root, filename))
+    return stats
 
-    if not candidates:
-        return ""
 
-    candidates.sort(key=lambda item: item[0], reverse=True)
-    return candidates[0][1]
+def compiler_cache_delta(before: dict, after: dict) -> dict:
+    def counter(stats: dict, *keys: str) -> int:
+        return sum(int(stats.get(key, 0) or 0) for key in keys)
+
+    hit_keys = ("direct_cache_hit", "preprocessed_cache_hit")
+    hits = max(0, counter(after, *hit_keys) - counter(before, *hit_keys))
+    misses = max(0, counter(after, "cache_miss") - counter(before, "cache_miss"))
+    return {"hits": hits, "misses": misses}
+
+
+def compiler_cache_metrics() -> dict:
+    with METRICS_LOCK:
+        totals = dict(COMPILER_CACHE_TOTALS)
+    lookups = totals["hits"] + totals["misses"]
+    payload = {
+        "enabled": ECD_COMPILER_CACHE,
+        "available": bool(compiler_cache_binary()),
+        "dir": COMPILER_CACHE_DIR,
+        "maxSize": COMPILER_CACHE_MAX_SIZE,
+        "jobs": totals["jobs"],
+        "hits": totals["hits"],
+        "misses": totals["misses"],
+        "hitRate": round(totals["hits"] / lookups, 4) if lookups else None,
+    }
+    stats = compiler_cache_stats()
+    if stats:
+        payload["sizeKiB"] = stats.get("cache_size_kibibyte")
+        payload["files"] = stats.get("files_in_cache")
+    return payload
+
+
+def collect_metrics() -> dict:
+    return {
+        "compilerCache": compiler_cache_metrics(),
+        "buildGc": build_gc.status(),
+        "buildWorkers": worker_pool.metrics(),
+        "artifacts": artifact_store.metrics(),
+        "mdnsPresence": mdns_presence.metrics(),
+        "statusMonitor": status_monitor.metrics(),
+        "dnsResolver": host_resolver.metrics(),
+        "deviceRegistry": device_registry.metrics(),
+        "statusRefreshShared": status_refresh_flight.shared,
+        "componentCatalog": merged_catalog_cache.metrics(),
+        "schemaCompiler": schema_compiler.metrics(),
+        "staticAssets": static_assets.metrics(),
+        "catalogChanges": catalog_changes.metrics(),
+        "search": search_index.metrics(),
+        "projectValidation": project_validator.metrics(),
+    }
 
 
 def resolve_web_root() -> str:
@@ -1549,52 +5016,464 @@ def read_auth_password() -> str:
         return ""
 
 
-def basic_auth_challenge(message: str = "Authentication required"):
-    response = jsonify({"status": "error", "message": message})
-    response.status_code = 401
-    response.headers["WWW-Authenticate"] = 'Basic realm="ESPConfig Designer"'
-    return response
+def basic_auth_challenge(message: str = "Authentication required"):
+    response = jsonify({"status": "error", "message": message})
+    response.status_code = 401
+    response.headers["WWW-Authenticate"] = 'Basic realm="ESPConfig Designer"'
+    return response
+
+
+def standalone_basic_auth_response():
+    if not is_standalone_mode() or ECD_AUTH_MODE != "basic":
+        return None
+    if request.method == "OPTIONS" or request.path == "/api/health":
+        return None
+    if ECD_WORKER_TOKEN and request.path.startswith("/api/worker/"):
+        # Worker endpoints authenticate the dispatching instance with the worker token.
+        return None
+
+    expected_username = ECD_AUTH_USERNAME
+    expected_password = read_auth_password()
+    if not expected_username or not expected_password:
+        return basic_auth_challenge("Basic authentication is not configured")
+
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.lower().startswith("basic "):
+        return basic_auth_challenge()
+
+    token = auth_header.split(" ", 1)[1].strip()
+    try:
+        decoded = base64.b64decode(token, validate=True).decode("utf-8")
+    except Exception:
+        return basic_auth_challenge()
+
+    username, separator, password = decoded.partition(":")
+    if not separator:
+        return basic_auth_challenge()
+    if not hmac.compare_digest(username, expected_username):
+        return basic_auth_challenge()
+    if not hmac.compare_digest(password, expected_password):
+        return basic_auth_challenge()
+    return None
+
+
+def check_access():
+    if is_standalone_mode():
+        return None
+
+    if request.headers.get("X-Ingress-Path") or request.headers.get("X-HA-Ingress"):
+        return None
+
+    return jsonify({"status": "error", "message": "Ingress required"}), 403
+
+
+def check_worker_access():
+    if not ECD_WORKER_MODE:
+        return jsonify({"status": "error", "message": "Worker mode is disabled"}), 404
+    if not ECD_WORKER_TOKEN:
+        # The dispatching instance only authenticates with the worker token.
+        return jsonify({"status": "error", "message": "ECD_WORKER_TOKEN is not set on the worker"}), 403
+    token = request.headers.get("X-ECD-Worker-Token", "")
+    if not hmac.compare_digest(token, ECD_WORKER_TOKEN):
+        return jsonify({"status": "error", "message": "Invalid worker token"}), 403
+    return None
+
+
+class RemoteWorkerError(Exception):
+    pass
+
+
+def safe_bundle_member_path(name: str) -> str:
+    raw = str(name or "").strip().replace("\\", "/")
+    if not raw or raw.startswith("/") or "\x00" in raw:
+        return ""
+    normalized = posixpath.normpath(raw)
+    if normalized in ("", ".", "..") or normalized.startswith("../") or "/../" in normalized:
+        return ""
+    if normalized.split("/", 1)[0] in WORKER_BUNDLE_EXCLUDED_DIRS:
+        return ""
+    return normalized
+
+
+def yaml_local_assets(paths: List[str], root: str) -> List[str]:
+    """Return the files below ``root`` that ``file:`` or ``path:`` values in the given YAML
+    files point to (fonts, images, local external components), walking folders."""
+    root = os.path.abspath(root)
+    found = []
+    for yaml_path in paths:
+        try:
+            with open(yaml_path, "r", encoding="utf-8", errors="replace") as handle:
+                text = handle.read()
+        except OSError:
+            continue
+        for match in YAML_LOCAL_ASSET_PATTERN.finditer(text):
+            value = match.group(1)
+            if "://" in value or os.path.isabs(value):
+                continue
+            candidate = os.path.abspath(os.path.join(root, value))
+            if candidate == root or os.path.commonpath([root, candidate]) != root:
+                continue
+            if os.path.isfile(candidate):
+                found.append(candidate)
+                continue
+            for dir_root, dir_names, files in os.walk(candidate):
+                dir_names[:] = [item for item in dir_names if item not in WORKER_BUNDLE_EXCLUDED_DIRS]
+                found.extend(os.path.join(dir_root, filename) for filename in files)
+    return found
+
+
+def build_worker_bundle(yaml_name: str, config_dir: Optional[str] = None) -> bytes:
+    """Zip the YAML, the YAML files it includes (transitively), the local files they
+    reference and ``secrets.yaml``; nothing else from the config folder is sent."""
+    root = config_dir or TARGET_DIR
+    yaml_path = os.path.join(root, yaml_name)
+    if not os.path.isfile(yaml_path):
+        raise FileNotFoundError(yaml_path)
+
+    members = [yaml_name]
+    yaml_paths = [yaml_path] + yaml_include_files(yaml_path, root)
+    for path in yaml_paths[1:] + yaml_local_assets(yaml_paths, root):
+        member = safe_bundle_member_path(os.path.relpath(path, root).replace(os.sep, "/"))
+        if member and member not in members:
+            members.append(member)
+    if os.path.isfile(os.path.join(root, SECRETS_FILENAME)) and SECRETS_FILENAME not in members:
+        members.append(SECRETS_FILENAME)
+
+    buffer = io.BytesIO()
+    total = 0
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for member in members:
+            full_path = os.path.join(root, member.replace("/", os.sep))
+            try:
+                total += os.path.getsize(full_path)
+            except OSError:
+                continue
+            if total > WORKER_BUNDLE_MAX_BYTES:
+                raise RemoteWorkerError("Build bundle is too large")
+            archive.write(full_path, member)
+    return buffer.getvalue()
+
+
+def extract_worker_bundle(raw: bytes, target_dir: str) -> None:
+    with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+        total = 0
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            member = safe_bundle_member_path(info.filename)
+            if not member:
+                raise ValueError(f"Invalid bundle member: {info.filename}")
+            total += max(0, int(info.file_size or 0))
+            if total > WORKER_BUNDLE_MAX_BYTES:
+                raise ValueError("Bundle is too large")
+            target = os.path.join(target_dir, member.replace("/", os.sep))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.open(info) as source, open(target, "wb") as handle:
+                shutil.copyfileobj(source, handle)
+
+
+def clear_worker_workspace(workspace: str) -> None:
+    """Remove the bundled sources from a workspace but keep its ``.esphome`` build output."""
+    try:
+        names = os.listdir(workspace)
+    except OSError:
+        return
+    for name in names:
+        if name == ".esphome":
+            continue
+        path = os.path.join(workspace, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def worker_node_workspace(yaml_name: str) -> str:
+    """Stable workspace for a node, so repeated builds reuse its PlatformIO build folder."""
+    digest = hashlib.sha256(yaml_name.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(WORKER_WORKSPACE_ROOT, f"node-{digest}")
+
+
+def prune_worker_workspaces(active: set, now: Optional[float] = None) -> List[str]:
+    """Delete workspaces no job uses: node workspaces idle for ``WORKER_WORKSPACE_TTL`` and
+    one-off workspaces left behind for ``WORKER_WORKSPACE_ORPHAN_TTL`` (e.g. the main
+    instance stopped before releasing its job)."""
+    now = time.time() if now is None else now
+    removed = []
+    try:
+        names = os.listdir(WORKER_WORKSPACE_ROOT)
+    except OSError:
+        return removed
+    for name in names:
+        path = os.path.join(WORKER_WORKSPACE_ROOT, name)
+        if path in active or not os.path.isdir(path) or os.path.islink(path):
+            continue
+        try:
+            idle = now - os.stat(path).st_mtime
+        except OSError:
+            continue
+        ttl = WORKER_WORKSPACE_TTL if name.startswith("node-") else WORKER_WORKSPACE_ORPHAN_TTL
+        if idle > ttl:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def encode_multipart(fields: dict, files: dict) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode("utf-8")
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode("utf-8")
+            + content
+            + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class RemoteWorkerClient:
+    def __init__(self, url: str, token: str = "") -> None:
+        self.url = url.rstrip("/")
+        self.token = token
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        content_type: str = "",
+        timeout: float = WORKER_REQUEST_TIMEOUT,
+    ) -> Tuple[int, bytes]:
+        headers = {}
+        if self.token:
+            headers["X-ECD-Worker-Token"] = self.token
+        if content_type:
+            headers["Content-Type"] = content_type
+        req = Request(f"{self.url}{path}", data=body, headers=headers, method=method)
+        try:
+            with urlopen(req, timeout=timeout) as response:
+                return response.status, response.read()
+        except HTTPError as exc:
+            return exc.code, exc.read()
+        except (URLError, OSError) as exc:
+            raise RemoteWorkerError(f"{self.url}: {exc}") from exc
+
+    def request_json(self, method: str, path: str, **kwargs) -> dict:
+        status, raw = self.request(method, path, **kwargs)
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+        except Exception:
+            payload = {}
+        if status >= 400 or not isinstance(payload, dict):
+            message = payload.get("message") if isinstance(payload, dict) else ""
+            raise RemoteWorkerError(f"{self.url}{path}: HTTP {status} {message or ''}".strip())
+        return payload
+
+    def health(self) -> dict:
+        return self.request_json("GET", "/api/worker/health", timeout=5)
+
+    def submit(self, yaml_name: str, bundle: bytes) -> str:
+        body, content_type = encode_multipart({"yaml": yaml_name}, {"bundle": ("bundle.zip", bundle)})
+        payload = self.request_json("POST", "/api/worker/jobs", body=body, content_type=content_type)
+        job_id = str(payload.get("job_id") or "")
+        if not job_id:
+            raise RemoteWorkerError(f"{self.url}: worker did not return a job id")
+        return job_id
+
+    def tail_wait(self, job_id: str, since: int) -> dict:
+        query = urlencode({"since": since, "timeout": 10, "limit": 1000})
+        return self.request_json("GET", f"/api/worker/jobs/{quote(job_id)}/tail-wait?{query}", timeout=WORKER_REQUEST_TIMEOUT)
+
+    def download_firmware(self, job_id: str, variant: str) -> Optional[bytes]:
+        query = urlencode({"variant": variant})
+        status, raw = self.request("GET", f"/api/worker/jobs/{quote(job_id)}/firmware?{query}", timeout=120)
+        if status == 404:
+            return None
+        if status >= 400:
+            raise RemoteWorkerError(f"{self.url}: firmware download failed with HTTP {status}")
+        return raw
+
+    def cancel(self, job_id: str) -> None:
+        self.request("POST", f"/api/worker/jobs/{quote(job_id)}/cancel")
+
+    def release(self, job_id: str) -> None:
+        self.request("DELETE", f"/api/worker/jobs/{quote(job_id)}")
+
+
+class BuildWorkerPool:
+    """Registered remote build workers with health state and least-loaded selection."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.workers = {}
+        self.thread: Optional[threading.Thread] = None
+
+    def _entry(self, url: str, token: str, name: str, source: str) -> dict:
+        return {
+            "url": url,
+            "token": token,
+            "name": name or url,
+            "source": source,
+            "healthy": False,
+            "load": 0,
+            "active": 0,
+            "last_check": "",
+            "last_error": "",
+            "latency_ms": None,
+        }
+
+    def load(self) -> None:
+        with self.lock:
+            for raw_url in ECD_BUILD_WORKERS.split(","):
+                url = normalize_worker_url(raw_url)
+                if url and url not in self.workers:
+                    self.workers[url] = self._entry(url, ECD_WORKER_TOKEN, "", "env")
+            stored = read_json_file(WORKERS_PATH) or {}
+            for item in stored.get("workers", []) if isinstance(stored.get("workers"), list) else []:
+                if not isinstance(item, dict):
+                    continue
+                url = normalize_worker_url(item.get("url", ""))
+                if url and url not in self.workers:
+                    self.workers[url] = self._entry(
+                        url, str(item.get("token") or ""), str(item.get("name") or ""), "registered"
+                    )
+
+    def _save(self) -> None:
+        registered = [
+            {"url": item["url"], "token": item["token"], "name": item["name"]}
+            for item in self.workers.values()
+            if item["source"] == "registered"
+        ]
+        write_json_file_atomic(WORKERS_PATH, {"workers": registered})
+
+    def register(self, url: str, token: str = "", name: str = "") -> dict:
+        with self.lock:
+            existing = self.workers.get(url)
+            entry = self._entry(url, token, name, existing["source"] if existing else "registered")
+            self.workers[url] = entry
+            self._save()
+        self.check(url)
+        self.start()
+        return self.describe(url)
+
+    def unregister(self, url: str) -> bool:
+        with self.lock:
+            entry = self.workers.get(url)
+            if not entry or entry["source"] != "registered":
+                return False
+            del self.workers[url]
+            self._save()
+        return True
+
+    def describe(self, url: str) -> dict:
+        with self.lock:
+            entry = dict(self.workers.get(url) or {})
+        entry.pop("token", None)
+        return entry
 
+    def list(self) -> List[dict]:
+        with self.lock:
+            urls = sorted(self.workers.keys())
+        return [self.describe(url) for url in urls]
 
-def standalone_basic_auth_response():
-    if not is_standalone_mode() or ECD_AUTH_MODE != "basic":
-        return None
-    if request.method == "OPTIONS" or request.path == "/api/health":
-        return None
+    def client(self, url: str) -> RemoteWorkerClient:
+        with self.lock:
+            token = self.workers.get(url, {}).get("token", "")
+        return RemoteWorkerClient(url, token)
 
-    expected_username = ECD_AUTH_USERNAME
-    expected_password = read_auth_password()
-    if not expected_username or not expected_password:
-        return basic_auth_challenge("Basic authentication is not configured")
+    def check(self, url: str) -> None:
+        started = time.monotonic()
+        with self.lock:
+            token = (self.workers.get(url) or {}).get("token")
+        try:
+            if not token:
+                # Workers only accept dispatches that carry the shared worker token.
+                raise RemoteWorkerError(f"{url}: no worker token configured")
+            health = self.client(url).health()
+            healthy = health.get("status") == "ok"
+            error = ""
+        except RemoteWorkerError as exc:
+            health = {}
+            healthy = False
+            error = str(exc)
+        with self.lock:
+            entry = self.workers.get(url)
+            if entry is None:
+                return
+            entry["healthy"] = healthy
+            entry["load"] = int(health.get("load") or 0)
+            entry["last_check"] = utc_now()
+            entry["last_error"] = error
+            entry["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+
+    def check_all(self) -> None:
+        with self.lock:
+            urls = list(self.workers.keys())
+        for url in urls:
+            self.check(url)
 
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.lower().startswith("basic "):
-        return basic_auth_challenge()
+    def acquire(self) -> Optional[str]:
+        """Reserve the healthy worker with the lowest reported plus dispatched load."""
+        with self.lock:
+            candidates = [item for item in self.workers.values() if item["healthy"]]
+            if not candidates:
+                return None
+            chosen = min(candidates, key=lambda item: (item["load"] + item["active"], item["url"]))
+            chosen["active"] += 1
+            return chosen["url"]
+
+    def release(self, url: str, failed: bool = False) -> None:
+        with self.lock:
+            entry = self.workers.get(url)
+            if entry is None:
+                return
+            entry["active"] = max(0, entry["active"] - 1)
+            if failed:
+                entry["healthy"] = False
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
 
-    token = auth_header.split(" ", 1)[1].strip()
-    try:
-        decoded = base64.b64decode(token, validate=True).decode("utf-8")
-    except Exception:
-        return basic_auth_challenge()
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.check_all()
+            except Exception:
+                pass
+            time.sleep(max(5.0, WORKER_HEALTH_INTERVAL))
 
-    username, separator, password = decoded.partition(":")
-    if not separator:
-        return basic_auth_challenge()
-    if not hmac.compare_digest(username, expected_username):
-        return basic_auth_challenge()
-    if not hmac.compare_digest(password, expected_password):
-        return basic_auth_challenge()
-    return None
+    def metrics(self) -> dict:
+        workers = self.list()
+        return {
+            "workers": len(workers),
+            "healthy": sum(1 for item in workers if item.get("healthy")),
+            "active": sum(int(item.get("active") or 0) for item in workers),
+        }
 
 
-def check_access():
-    if is_standalone_mode():
-        return None
+def normalize_worker_url(value: str) -> str:
+    url = str(value or "").strip().rstrip("/")
+    if not re.match(r"^https?://[A-Za-z0-9._\-\[\]:]+(/[A-Za-z0-9._~/-]*)?$", url):
+        return ""
+    return url
 
-    if request.headers.get("X-Ingress-Path") or request.headers.get("X-HA-Ingress"):
-        return None
 
-    return jsonify({"status": "error", "message": "Ingress required"}), 403
+worker_pool = BuildWorkerPool()
+worker_pool.load()
 
 
 class Job:
@@ -1611,6 +5490,9 @@ class Job:
         ended_at: Optional[str] = None,
         exit_code: Optional[int] = None,
         error_summary: str = "",
+        compiler_cache: Optional[dict] = None,
+        result: Optional[dict] = None,
+        config_dir: str = "",
     ) -> None:
         self.id = job_id
         self.yaml_name = yaml_name
@@ -1623,6 +5505,9 @@ class Job:
         self.ended_at = ended_at
         self.exit_code = exit_code
         self.error_summary = error_summary
+        self.compiler_cache = compiler_cache
+        self.result = result
+        self.config_dir = config_dir
 
         self.log_path = os.path.join(JOB_DIR, f"{self.id}.log")
         self.json_path = os.path.join(JOB_DIR, f"{self.id}.json")
@@ -1650,6 +5535,9 @@ class Job:
             ended_at=data.get("ended_at"),
             exit_code=data.get("exit_code"),
             error_summary=data.get("error_summary", ""),
+            compiler_cache=data.get("compiler_cache"),
+            result=data.get("result"),
+            config_dir=data.get("config_dir", ""),
         )
 
     def to_dict(self) -> dict:
@@ -1665,6 +5553,9 @@ class Job:
             "action": self.action,
             "device": self.device,
             "serial_port": self.serial_port,
+            "compiler_cache": self.compiler_cache,
+            "result": self.result,
+            "config_dir": self.config_dir,
         }
 
     def save_status(self) -> None:
@@ -1741,14 +5632,25 @@ class JobManager:
                 with open(path, "r", encoding="utf-8") as handle:
                     data = json.load(handle)
                 job = Job.from_dict(data)
+                if job.state in ("queued", "running"):
+                    # The queue lives in memory, so nothing will pick these up again.
+                    job.state = "failed"
+                    job.error_summary = job.error_summary or "Interrupted by restart"
                 if job.id:
                     self.jobs[job.id] = job
             except Exception:
                 continue
 
-    def submit(self, yaml_name: str, action: str, device: str, serial_port: str = "") -> Job:
+    def submit(
+        self,
+        yaml_name: str,
+        action: str,
+        device: str,
+        serial_port: str = "",
+        config_dir: str = "",
+    ) -> Job:
         job_id = uuid.uuid4().hex
-        job = Job(job_id, yaml_name, action, device, serial_port=serial_port)
+        job = Job(job_id, yaml_name, action, device, serial_port=serial_port, config_dir=config_dir)
         with self.lock:
             self.jobs[job.id] = job
         os.makedirs(JOB_DIR, exist_ok=True)
@@ -1762,6 +5664,23 @@ class JobManager:
         with self.lock:
             return self.jobs.get(job_id)
 
+    def load(self) -> int:
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job.state in ("queued", "running"))
+
+    def active_nodes(self) -> set:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return {
+            job.yaml_name[:-5]
+            for job in jobs
+            if job.state in ("queued", "running") and job.yaml_name.endswith(".yaml")
+        }
+
+    def active_config_dirs(self) -> set:
+        with self.lock:
+            return {job.config_dir for job in self.jobs.values() if job.config_dir and job.state in ("queued", "running")}
+
     def cancel(self, job_id: str) -> Optional[Job]:
         job = self.get(job_id)
         if not job:
@@ -1803,13 +5722,16 @@ class JobManager:
         job.started_at = utc_now()
         job.save_status()
 
-        yaml_path = os.path.join(TARGET_DIR, job.yaml_name)
+        yaml_path = os.path.join(job.config_dir or TARGET_DIR, job.yaml_name)
+        firmware_file = ""
         if job.action == "logs":
             exit_code = self._run_esphome(job, ["logs", yaml_path, "--device", job.device])
         elif job.action == "validate":
             exit_code = self._run_esphome(job, ["config", yaml_path])
         elif job.action == "clean":
             exit_code = self._run_esphome(job, ["clean", yaml_path])
+        elif job.action == "toolchains":
+            exit_code = self._prepare_toolchains(job)
         elif job.action == "serial":
             try:
                 serial_port = validate_host_serial_port(job.serial_port)
@@ -1823,6 +5745,8 @@ class JobManager:
                 exit_code = self._run_esphome(job, ["config", yaml_path])
                 if exit_code == 0 and not job.cancel_requested:
                     exit_code = self._run_esphome(job, ["compile", yaml_path])
+                    if exit_code == 0:
+                        self._record_compiled(job, yaml_path)
                 if exit_code == 0 and not job.cancel_requested:
                     exit_code = self._run_esphome(
                         job, ["upload", yaml_path, "--device", serial_port]
@@ -1831,11 +5755,14 @@ class JobManager:
             exit_code = self._run_esphome(job, ["config", yaml_path])
 
             if exit_code == 0 and not job.cancel_requested:
-                compile_cmd = ["compile", yaml_path]
-                exit_code = self._run_esphome(job, compile_cmd)
+                exit_code, firmware_file = self._compile(job, yaml_path)
+                if exit_code == 0:
+                    self._record_compiled(job, yaml_path, firmware_file)
 
             if exit_code == 0 and job.action == "ota" and not job.cancel_requested:
                 upload_cmd = ["upload", yaml_path, "--device", job.device]
+                if firmware_file:
+                    upload_cmd += ["--file", firmware_file]
                 exit_code = self._run_esphome(job, upload_cmd)
 
 
@@ -1847,6 +5774,9 @@ class JobManager:
             job.state = "success"
             job.exit_code = 0
             job.error_summary = ""
+            artifact_id = (job.result or {}).get("artifact")
+            if job.action in ("ota", "serial") and artifact_id:
+                artifact_store.mark_deployed(job.yaml_name[:-5], artifact_id)
         else:
             job.state = "failed"
             job.exit_code = exit_code
@@ -1856,6 +5786,189 @@ class JobManager:
         job.save_status()
         job.notify_done()
 
+    def _record_compiled(self, job: Job, yaml_path: str, firmware_file: str = "") -> None:
+        """Note a successful compile right away, so a failed upload still leaves the new image."""
+        record_build(job.yaml_name[:-5])
+        # Jobs with a config_dir are builds this worker runs for another instance;
+        # that instance stores the artifact once it has fetched the image.
+        if not job.config_dir:
+            self._store_artifacts(job, yaml_path, firmware_file)
+        # The build folder just grew; let the collector check the budget now rather
+        # than at its next interval.
+        build_gc.trigger()
+
+    def _store_artifacts(self, job: Job, yaml_path: str, firmware_file: str = "") -> None:
+        node_name = job.yaml_name[:-5]
+        images = {
+            "ota": firmware_file or find_firmware_path(node_name, "ota"),
+            "factory": find_firmware_path(node_name, "factory"),
+        }
+        try:
+            entry = artifact_store.register(node_name, images, yaml_path)
+        except OSError as exc:
+            job.push_log(f"WARNING Failed to store firmware artifact: {exc}")
+            return
+        if entry:
+            job.result = {**(job.result or {}), "artifact": entry["id"]}
+            job.push_log(f"INFO Stored firmware artifact {entry['id']}")
+
+    def _compile(self, job: Job, yaml_path: str) -> Tuple[int, str]:
+        """Compile locally or on a remote worker; return (exit_code, downloaded firmware path)."""
+        worker_url = None if job.config_dir else worker_pool.acquire()
+        if worker_url:
+            failed = False
+            try:
+                return self._run_remote_compile(job, worker_url)
+            except RemoteWorkerError as exc:
+                failed = True
+                job.push_log(f"WARNING Build worker failed: {exc}. Compiling locally.")
+            finally:
+                worker_pool.release(worker_url, failed=failed)
+            if job.cancel_requested:
+                return 1, ""
+        return self._run_esphome(job, ["compile", yaml_path]), ""
+
+    def _run_remote_compile(self, job: Job, worker_url: str) -> Tuple[int, str]:
+        client = worker_pool.client(worker_url)
+        job.result = {**(job.result or {}), "worker": worker_url}
+        job.push_log(f"INFO Dispatching compile to build worker {worker_url}")
+        try:
+            bundle = build_worker_bundle(job.yaml_name)
+        except OSError as exc:
+            raise RemoteWorkerError(f"Failed to bundle {job.yaml_name}: {exc}") from exc
+        remote_id = client.submit(job.yaml_name, bundle)
+        try:
+            remote_job = self._follow_remote_job(job, client, remote_id)
+            if remote_job.get("state") != "success":
+                job.error_summary = str(remote_job.get("error_summary") or "")
+                return int(remote_job.get("exit_code") or 1) or 1, ""
+            firmware_path = self._store_remote_firmware(job, client, remote_id)
+            return 0, firmware_path
+        finally:
+            try:
+                client.release(remote_id)
+            except RemoteWorkerError:
+                pass
+
+    def _follow_remote_job(self, job: Job, client: RemoteWorkerClient, remote_id: str) -> dict:
+        since = 0
+        failures = 0
+        cancel_sent = False
+        with open(job.log_path, "a", encoding="utf-8") as log_handle:
+            while True:
+                if job.cancel_requested and not cancel_sent:
+                    cancel_sent = True
+                    try:
+                        client.cancel(remote_id)
+                    except RemoteWorkerError:
+                        pass
+                try:
+                    payload = client.tail_wait(remote_id, since)
+                except RemoteWorkerError:
+                    failures += 1
+                    if failures >= 3:
+                        raise
+                    time.sleep(1.0)
+                    continue
+                failures = 0
+                lines = payload.get("lines") or []
+                for line in lines:
+                    clean_line = sanitize_log_line(str(line))
+                    log_handle.write(clean_line + "\n")
+                    if clean_line:
+                        job.last_log_line = clean_line
+                    job.push_log(clean_line)
+                log_handle.flush()
+                since = int(payload.get("next_seq") or since)
+                remote_job = payload.get("job") if isinstance(payload.get("job"), dict) else {}
+                if remote_job.get("state") in ("success", "failed", "canceled") and not lines:
+                    return remote_job
+
+    def _store_remote_firmware(self, job: Job, client: RemoteWorkerClient, remote_id: str) -> str:
+        node_name = job.yaml_name[:-5]
+        roots = firmware_build_roots()
+        build_dir = os.path.join(roots[0] if roots else os.path.join(ESPHOME_DATA_DIR, "build"), node_name)
+        os.makedirs(build_dir, exist_ok=True)
+        stored = ""
+        for variant, filename in (("ota", "firmware.bin"), ("factory", "firmware.factory.bin")):
+            content = client.download_firmware(remote_id, variant)
+            if content is None:
+                continue
+            target = os.path.join(build_dir, filename)
+            temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as handle:
+                handle.write(content)
+            os.replace(temp_path, target)
+            job.push_log(f"INFO Fetched {filename} ({len(content)} bytes) from build worker")
+            if variant == "ota":
+                stored = target
+        if not stored:
+            raise RemoteWorkerError("Build worker did not return a firmware image")
+        return stored
+
+    def submit_toolchain_prepare(self) -> Job:
+        with self.lock:
+            for job in self.jobs.values():
+                if job.action == "toolchains" and job.state in ("queued", "running"):
+                    return job
+        return self.submit("", "toolchains", "")
+
+    def _prepare_toolchains(self, job: Job) -> int:
+        targets = scan_toolchain_targets()
+        report = []
+        job.result = {"toolchains": report}
+        if not targets:
+            job.push_log("INFO No saved YAML files reference a supported platform")
+            return 0
+
+        try:
+            pio_prefix = shlex.split(PLATFORMIO_BIN)
+        except ValueError:
+            pio_prefix = []
+        if not pio_prefix:
+            message = "Invalid ECD_PLATFORMIO_BIN"
+            job.push_log(message)
+            job.error_summary = message
+            return 1
+
+        failed = 0
+        for target in targets:
+            if job.cancel_requested:
+                break
+            label = " / ".join(
+                part for part in (target["platform"], target["board"] or target["variant"], target["framework"]) if part
+            )
+            job.push_log(f"INFO Preparing toolchain: {label} ({len(target['yamls'])} project(s))")
+            try:
+                stub_path, build_path = write_toolchain_stub(target)
+            except OSError as exc:
+                job.push_log(f"ERROR Failed to write toolchain project: {exc}")
+                exit_code = 1
+            else:
+                exit_code = self._run_esphome(job, ["compile", "--only-generate", stub_path])
+                if exit_code == 0 and not job.cancel_requested:
+                    exit_code = self._run_command(job, pio_prefix + ["pkg", "install", "--project-dir", build_path])
+            ready = exit_code == 0 and not job.cancel_requested
+            if not ready:
+                failed += 1
+            report.append(
+                {
+                    "platform": target["platform"],
+                    "board": target["board"],
+                    "variant": target["variant"],
+                    "framework": target["framework"],
+                    "yamls": target["yamls"],
+                    "ready": ready,
+                }
+            )
+
+        ready_count = sum(1 for item in report if item["ready"])
+        job.push_log(f"INFO Toolchains ready: {ready_count}/{len(targets)}")
+        if failed:
+            job.error_summary = f"{failed} toolchain(s) failed to install"
+            return 1
+        return 0
+
     def _run_esphome(self, job: Job, args: List[str]) -> int:
         try:
             cmd_prefix = shlex.split(ESPHOME_BIN)
@@ -1873,7 +5986,27 @@ class JobManager:
             job.error_summary = message
             return 1
 
-        return self._run_command(job, cmd_prefix + args)
+        compiles = args[:1] == ["compile"] and "--only-generate" not in args
+        cache_env = compiler_cache_env(job.config_dir) if compiles else {}
+        if not cache_env:
+            return self._run_command(job, cmd_prefix + args)
+
+        before = compiler_cache_stats()
+        exit_code = self._run_command(job, cmd_prefix + args, extra_env=cache_env)
+        self._record_compiler_cache(job, compiler_cache_delta(before, compiler_cache_stats()))
+        return exit_code
+
+    def _record_compiler_cache(self, job: Job, delta: dict) -> None:
+        previous = job.compiler_cache or {}
+        job.compiler_cache = {
+            "hits": int(previous.get("hits", 0)) + delta["hits"],
+            "misses": int(previous.get("misses", 0)) + delta["misses"],
+        }
+        with METRICS_LOCK:
+            COMPILER_CACHE_TOTALS["jobs"] += 1
+            COMPILER_CACHE_TOTALS["hits"] += delta["hits"]
+            COMPILER_CACHE_TOTALS["misses"] += delta["misses"]
+        job.push_log(f"INFO Compiler cache: {delta['hits']} hits, {delta['misses']} misses")
 
     def _run_command(
         self,
@@ -1997,6 +6130,23 @@ class JobManager:
 
 bootstrap_storage()
 job_manager = JobManager()
+build_gc.active_nodes = job_manager.active_nodes
+
+
+def start_background_services() -> None:
+    prune_component_import_staging()
+    static_assets.start()
+    search_index.start()
+    mdns_presence.start()
+    status_monitor.start()
+    build_gc.start()
+    if ECD_WORKER_MODE:
+        prune_worker_workspaces(job_manager.active_config_dirs())
+    if worker_pool.list():
+        worker_pool.start()
+    if ECD_PREPARE_TOOLCHAINS_ON_START:
+        job_manager.submit_toolchain_prepare()
+
 
 app = Flask(__name__)
 
@@ -2044,6 +6194,15 @@ def api_runtime():
     return jsonify(payload)
 
 
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    access = check_access()
+    if access:
+        return access
+
+    return jsonify({"status": "ok", "metrics": collect_metrics()})
+
+
 @app.route("/api/component-catalog", methods=["GET", "OPTIONS"])
 def api_component_catalog():
     if request.method == "OPTIONS":
@@ -2053,11 +6212,155 @@ def api_component_catalog():
     if access:
         return access
 
-    base_catalog = load_components_catalog(COMPONENTS_BASE_LIST_PATH)
-    runtime_path = components_runtime_list_path()
-    runtime_catalog = load_components_catalog(runtime_path) if os.path.isfile(runtime_path) else None
-    merged = merge_component_catalogs(base_catalog, runtime_catalog)
-    return jsonify({"status": "ok", "catalog": merged})
+    body, etag = merged_catalog_cache.get()
+    revision = catalog_changes.sync(schemas=False)
+    if request.if_none_match.contains(etag):
+        merged_catalog_cache.note_not_modified()
+        response = make_response("", 304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Catalog-Revision"] = str(revision)
+    response.headers["X-Catalog-Epoch"] = catalog_changes.epoch
+    return response
+
+
+@app.route("/api/search", methods=["GET", "OPTIONS"])
+def api_search():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    query = str(request.args.get("q") or "").strip()
+    if not query:
+        return json_error("Missing query", "SEARCH_QUERY_REQUIRED", 400)
+    types = {item.strip() for item in str(request.args.get("type") or "").split(",") if item.strip()}
+    if types - set(SEARCH_TYPES):
+        return json_error(f"type must be one of {', '.join(SEARCH_TYPES)}", "SEARCH_TYPE_INVALID", 400)
+    try:
+        limit = min(SEARCH_MAX_LIMIT, max(1, int(request.args.get("limit", "20"))))
+    except ValueError:
+        return json_error("limit must be an integer", "SEARCH_LIMIT_INVALID", 400)
+
+    started = time.perf_counter()
+    results, total = search_index.search(query, types, limit)
+    took_ms = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify({"status": "ok", "query": query, "total": total, "results": results, "took_ms": took_ms})
+
+
+@app.route("/api/component-catalog/changes", methods=["GET", "OPTIONS"])
+def api_component_catalog_changes():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    try:
+        since = int(request.args.get("since", "0"))
+    except ValueError:
+        return json_error("since must be an integer revision", "COMPONENTS_REVISION_INVALID", 400)
+
+    changes = catalog_changes.changes(since, str(request.args.get("epoch") or "").strip())
+    return jsonify({"status": "ok", **changes})
+
+
+@app.route("/api/component-schemas", methods=["GET", "OPTIONS"])
+def api_component_schemas_compiled():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    requested = request.args.getlist("path")
+    if requested:
+        relpaths = []
+        for value in requested:
+            relpath = normalize_component_schema_relpath(value)
+            if not relpath:
+                return json_error("Invalid schema path", "COMPONENTS_SCHEMA_PATH_INVALID", 400)
+            relpaths.append(relpath)
+    else:
+        relpaths = schema_compiler.schema_paths()
+
+    schemas, errors = schema_compiler.compile_many(list(dict.fromkeys(relpaths)))
+    body = json.dumps({"status": "ok", "schemas": schemas, "errors": errors}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = hashlib.sha256(body).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/component-schemas/bundle", methods=["POST", "OPTIONS"])
+def api_component_schemas_bundle():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    payload = request.get_json(silent=True) or {}
+    requested = payload.get("paths")
+    if not isinstance(requested, list) or not requested:
+        return json_error("paths must be a non-empty list", "COMPONENTS_SCHEMA_BUNDLE_INVALID", 400)
+    if len(requested) > COMPONENTS_SCHEMA_BUNDLE_MAX:
+        return json_error("Too many schema paths", "COMPONENTS_SCHEMA_BUNDLE_TOO_LARGE", 400)
+    relpaths = []
+    for value in requested:
+        relpath = normalize_component_schema_relpath(value) if isinstance(value, str) else ""
+        if not relpath:
+            return json_error("Invalid schema path", "COMPONENTS_SCHEMA_PATH_INVALID", 400)
+        relpaths.append(relpath)
+    relpaths = list(dict.fromkeys(relpaths))
+
+    compiled = bool(payload.get("compiled"))
+    etag = schema_compiler.bundle_etag(relpaths, compiled)
+    use_gzip = "gzip" in request.accept_encodings
+    # Each representation gets its own validator, like the precompressed static files.
+    response_etag = f"{etag}-gzip" if use_gzip else etag
+    if request.if_none_match.contains(response_etag):
+        response = make_response("", 304)
+        response.set_etag(response_etag)
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    if compiled:
+        schemas, errors = schema_compiler.compile_many(relpaths)
+        missing = sorted(errors)
+    else:
+        schemas = {}
+        missing = []
+        for relpath in relpaths:
+            source_path = schema_compiler.source_path(relpath)
+            data = read_json_file(source_path) if source_path else None
+            if data is None:
+                missing.append(relpath)
+            else:
+                schemas[relpath] = data
+
+    body = json.dumps({"status": "ok", "schemas": schemas, "missing": missing}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if use_gzip:
+        response = Response(gzip_schema_bundle(etag, body), mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(response_etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
 
 @app.route("/api/component-schemas/<path:relpath>", methods=["GET", "OPTIONS"])
@@ -2087,6 +6390,121 @@ def api_component_schema(relpath):
     return json_error("Schema not found", "COMPONENTS_SCHEMA_NOT_FOUND", 404)
 
 
+class ZipStreamBuffer:
+    """Write-only sink for ``zipfile`` that hands out what was written since the last drain.
+
+    It reports a position but cannot seek, so ``zipfile`` writes data descriptors and the
+    archive can be sent while it is being built.
+    """
+
+    def __init__(self) -> None:
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def split_query_values(name: str) -> List[str]:
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(part.strip() for part in str(raw).split(","))
+    return [value for value in values if value]
+
+
+def select_components_for_export(catalog_payload: dict, category_slugs: set, component_ids: set) -> Tuple[dict, List[str]]:
+    """Copy the category tree keeping only the matching entries that have a schema file.
+
+    A category slug matches its subcategories too. Empty categories are dropped. Returns
+    the catalog for ``components_list.json`` and the schema paths it references.
+    """
+    schema_paths = {}
+
+    def select(categories: list, chain_slugs: list) -> list:
+        selected = []
+        for category in categories:
+            if not isinstance(category, dict):
+                continue
+            slugs = chain_slugs + [str(category.get("slug") or "").strip().lower()]
+            in_category = not category_slugs or bool(category_slugs.intersection(slugs))
+            items = []
+            for item in category.get("items") or []:
+                normalized, _ = normalize_component_entry(item)
+                if not normalized or not in_category:
+                    continue
+                if component_ids and normalized["id"] not in component_ids:
+                    continue
+                schema_path = normalized["schemaPath"]
+                if schema_path not in schema_paths:
+                    schema_paths[schema_path] = schema_compiler.source_path(schema_path)
+                if schema_paths[schema_path]:
+                    items.append(normalized)
+            subcategories = select(category.get("subcategories") or [], slugs)
+            if items or subcategories:
+                node = {key: value for key, value in category.items() if key not in ("items", "subcategories")}
+                node["items"] = items
+                node["subcategories"] = subcategories
+                selected.append(node)
+        return selected
+
+    categories = catalog_payload.get("categories") if isinstance(catalog_payload, dict) else None
+    selected = select(categories if isinstance(categories, list) else [], [])
+    exported = {"generatedAt": utc_now(), "categories": selected}
+    used = sorted({item["schemaPath"] for item in extract_catalog_items(exported)})
+    return exported, [(relpath, schema_paths[relpath]) for relpath in used]
+
+
+def iter_component_export_zip(catalog_payload: dict, schema_files: List[Tuple[str, str]]):
+    """Yield a component package zip piece by piece, reading each schema in chunks."""
+    sink = ZipStreamBuffer()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("components_list.json", json.dumps(catalog_payload, ensure_ascii=False, indent=2) + "\n")
+        yield sink.drain()
+        for relpath, source_path in schema_files:
+            try:
+                with open(source_path, "rb") as source, archive.open(f"schemas/{relpath}", "w") as target:
+                    for chunk in iter(lambda: source.read(COMPONENTS_EXPORT_CHUNK_BYTES), b""):
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            except OSError:
+                continue
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stage_component_schema(archive: zipfile.ZipFile, info: zipfile.ZipInfo, staging_root: str, member: str) -> str:
+    """Validate one schema member of an import and copy its bytes into the staging folder.
+
+    Returns the staged path, or "" when the member is not a JSON object or list.
+    """
+    try:
+        raw = archive.read(info)
+        if not isinstance(json.loads(raw.decode("utf-8")), (dict, list)):
+            return ""
+    except Exception:
+        return ""
+    staged_path = os.path.join(staging_root, *member.split("/"))
+    os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+    with open(staged_path, "wb") as handle:
+        handle.write(raw)
+    return staged_path
+
+
 @app.route("/api/components/import-zip", methods=["POST", "OPTIONS"])
 def api_components_import_zip():
     if request.method == "OPTIONS":
@@ -2104,21 +6522,33 @@ def api_components_import_zip():
     if not filename.endswith(".zip"):
         return json_error("Only .zip imports are supported", "COMPONENTS_ZIP_REQUIRED", 400)
 
-    raw = upload.stream.read(COMPONENTS_IMPORT_MAX_UPLOAD_BYTES + 1)
-    if len(raw) > COMPONENTS_IMPORT_MAX_UPLOAD_BYTES:
-        return json_error("Zip file too large", "COMPONENTS_ZIP_TOO_LARGE", 413)
-    if not raw:
+    spool = tempfile.SpooledTemporaryFile(max_size=COMPONENTS_IMPORT_SPOOL_BYTES)
+    received = 0
+    for chunk in iter(lambda: upload.stream.read(1024 * 1024), b""):
+        received += len(chunk)
+        if received > COMPONENTS_IMPORT_MAX_UPLOAD_BYTES:
+            spool.close()
+            return json_error("Zip file too large", "COMPONENTS_ZIP_TOO_LARGE", 413)
+        spool.write(chunk)
+    if not received:
+        spool.close()
         return json_error("Empty zip file", "COMPONENTS_EMPTY_ZIP", 400)
+    spool.seek(0)
 
     try:
-        archive = zipfile.ZipFile(io.BytesIO(raw))
+        archive = zipfile.ZipFile(spool)
     except Exception:
+        spool.close()
         return json_error("Invalid zip archive", "COMPONENTS_INVALID_ZIP", 400)
 
+    def close_upload() -> None:
+        archive.close()
+        spool.close()
+
     try:
         infos = archive.infolist()
     except Exception:
-        archive.close()
+        close_upload()
         return json_error("Failed to read zip archive", "COMPONENTS_INVALID_ZIP", 400)
 
     total_unpacked = 0
@@ -2129,20 +6559,20 @@ def api_components_import_zip():
         if info.is_dir() or raw_member_name.endswith("/") or raw_member_name.endswith("\\"):
             continue
         if len(safe_members) >= COMPONENTS_IMPORT_MAX_FILES:
-            archive.close()
+            close_upload()
             return json_error("Too many files in zip", "COMPONENTS_ZIP_TOO_MANY_FILES", 400)
 
         safe_name = safe_zip_component_package_member_path(info.filename)
         if not safe_name:
-            archive.close()
+            close_upload()
             return json_error("Invalid file in zip package", "COMPONENTS_ZIP_INVALID_FILE", 400)
         if safe_name in safe_members:
-            archive.close()
+            close_upload()
             return json_error("Duplicate file path in zip package", "COMPONENTS_ZIP_DUPLICATE_PATH", 400)
 
         total_unpacked += max(0, int(info.file_size or 0))
         if total_unpacked > COMPONENTS_IMPORT_MAX_UNPACKED_BYTES:
-            archive.close()
+            close_upload()
             return json_error("Zip unpacked size is too large", "COMPONENTS_ZIP_UNPACKED_TOO_LARGE", 400)
 
         safe_members[safe_name] = info
@@ -2152,21 +6582,21 @@ def api_components_import_zip():
             schema_members.add(safe_name)
 
     if "components_list.json" not in safe_members:
-        archive.close()
+        close_upload()
         return json_error("Zip must include components_list.json", "COMPONENTS_ZIP_MISSING_CATALOG", 400)
     if not schema_members:
-        archive.close()
+        close_upload()
         return json_error("Zip must include schemas/components/*.json", "COMPONENTS_ZIP_MISSING_SCHEMAS", 400)
 
     try:
         catalog_data = json.loads(archive.read("components_list.json").decode("utf-8"))
     except Exception:
-        archive.close()
+        close_upload()
         return json_error("Invalid components_list.json", "COMPONENTS_INVALID_CATALOG", 400)
 
     zip_entries, entry_errors = parse_zip_components_catalog(catalog_data)
     if entry_errors and not zip_entries:
-        archive.close()
+        close_upload()
         return jsonify(
             {
                 "status": "error",
@@ -2186,63 +6616,88 @@ def api_components_import_zip():
     skipped = 0
     errors = list(entry_errors[:COMPONENTS_IMPORT_MAX_ITEM_ERRORS])
 
-    with COMPONENTS_LOCK:
-        runtime_path = components_runtime_list_path()
-        runtime_catalog = load_components_catalog(runtime_path) if os.path.isfile(runtime_path) else default_components_catalog()
-        runtime_items = extract_catalog_items(runtime_catalog)
-        runtime_by_key = {component_catalog_entry_key(item): item for item in runtime_items}
-        existing_runtime_keys = set(runtime_by_key.keys())
-        imported_keys = set()
-
-        for zip_item in zip_entries:
-            entry = zip_item["entry"]
-            chain = zip_item["chain"]
-            comp_id = str(entry["id"])
-            entry_key = component_catalog_entry_key(entry)
-            schema_member = f"schemas/{entry['schemaPath']}"
-            member_info = safe_members.get(schema_member)
-            if not member_info:
-                skipped += 1
-                if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
-                    errors.append(f"Missing schema file for {comp_id}: {schema_member}")
-                continue
-
-            try:
-                schema_raw = archive.read(member_info)
-                schema_obj = json.loads(schema_raw.decode("utf-8"))
-            except Exception:
-                skipped += 1
-                if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
-                    errors.append(f"Invalid schema JSON for {comp_id}: {schema_member}")
-                continue
+    staging_root = os.path.join(components_runtime_staging_root(), f".import-{uuid.uuid4().hex}")
+    needed_members = sorted({f"schemas/{item['entry']['schemaPath']}" for item in zip_entries} & set(safe_members))
+    try:
+        with ThreadPoolExecutor(max_workers=COMPONENTS_IMPORT_WORKERS, thread_name_prefix="ecd-import") as pool:
+            staged_paths = pool.map(
+                lambda member: stage_component_schema(archive, safe_members[member], staging_root, member),
+                needed_members,
+            )
+            staged = dict(zip(needed_members, staged_paths))
+
+        # Schemas already swapped in, with the file each one replaced (or None), so
+        # a failed catalog write can put them back.
+        replaced = []
+
+        def restore_schemas() -> None:
+            for schema_target, previous in reversed(replaced):
+                try:
+                    if previous:
+                        os.replace(previous, schema_target)
+                    elif os.path.isfile(schema_target):
+                        os.remove(schema_target)
+                except OSError:
+                    pass
 
-            schema_target = runtime_schema_target_path(entry["schemaPath"])
-            if not schema_target:
-                skipped += 1
-                if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
-                    errors.append(f"Invalid schema path for {comp_id}")
-                continue
+        try:
+            with runtime_catalog_transaction(rollback=restore_schemas) as runtime_catalog:
+                existing_runtime_keys = {component_catalog_entry_key(item) for item in runtime_catalog.items()}
+                imported_keys = set()
+                committed = set()
+
+                for zip_item in zip_entries:
+                    entry = zip_item["entry"]
+                    chain = zip_item["chain"]
+                    comp_id = str(entry["id"])
+                    entry_key = component_catalog_entry_key(entry)
+                    schema_member = f"schemas/{entry['schemaPath']}"
+                    if schema_member not in staged:
+                        skipped += 1
+                        if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
+                            errors.append(f"Missing schema file for {comp_id}: {schema_member}")
+                        continue
 
-            os.makedirs(os.path.dirname(schema_target), exist_ok=True)
-            with open(schema_target, "w", encoding="utf-8") as handle:
-                json.dump(schema_obj, handle, ensure_ascii=False, indent=2)
-                handle.write("\n")
+                    staged_path = staged[schema_member]
+                    if not staged_path:
+                        skipped += 1
+                        if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
+                            errors.append(f"Invalid schema JSON for {comp_id}: {schema_member}")
+                        continue
 
-            was_existing = entry_key in existing_runtime_keys
-            if entry_key not in imported_keys:
-                remove_catalog_item_all_by_key(runtime_catalog, entry_key)
-                imported_keys.add(entry_key)
-            target_items = ensure_category_path(runtime_catalog, chain)
-            target_items.append(entry)
-            runtime_by_key[entry_key] = entry
-            if was_existing:
-                updated += 1
-            else:
-                imported += 1
+                    schema_target = runtime_schema_target_path(entry["schemaPath"])
+                    if not schema_target:
+                        skipped += 1
+                        if len(errors) < COMPONENTS_IMPORT_MAX_ITEM_ERRORS:
+                            errors.append(f"Invalid schema path for {comp_id}")
+                        continue
 
-        save_runtime_components_catalog(runtime_catalog)
+                    if schema_member not in committed:
+                        os.makedirs(os.path.dirname(schema_target), exist_ok=True)
+                        previous = None
+                        if os.path.isfile(schema_target):
+                            previous = os.path.join(staging_root, "previous", str(len(replaced)))
+                            os.makedirs(os.path.dirname(previous), exist_ok=True)
+                            os.replace(schema_target, previous)
+                        replaced.append((schema_target, previous))
+                        os.replace(staged_path, schema_target)
+                        committed.add(schema_member)
+
+                    was_existing = entry_key in existing_runtime_keys
+                    if entry_key not in imported_keys:
+                        runtime_catalog.remove_key(entry_key)
+                        imported_keys.add(entry_key)
+                    runtime_catalog.append(chain, entry)
+                    if was_existing:
+                        updated += 1
+                    else:
+                        imported += 1
+        except OSError:
+            return json_error("Failed to save imported components", "COMPONENTS_IMPORT_FAILED", 500)
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+        close_upload()
 
-    archive.close()
     return jsonify(
         {
             "status": "ok",
@@ -2256,6 +6711,37 @@ def api_components_import_zip():
     )
 
 
+@app.route("/api/components/export-zip", methods=["GET", "OPTIONS"])
+def api_components_export_zip():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    category_slugs = {value.lower() for value in split_query_values("category")}
+    component_ids = set()
+    for value in split_query_values("id"):
+        component_id = normalize_component_id(value)
+        if not component_id:
+            return json_error("Invalid component id", "COMPONENTS_ID_INVALID", 400)
+        component_ids.add(component_id)
+
+    with COMPONENTS_LOCK:
+        runtime_path = components_runtime_list_path()
+        runtime_catalog = load_components_catalog(runtime_path) if os.path.isfile(runtime_path) else default_components_catalog()
+        exported, schema_files = select_components_for_export(runtime_catalog, category_slugs, component_ids)
+    if not schema_files:
+        return json_error("No components to export", "COMPONENTS_EXPORT_EMPTY", 404)
+
+    response = Response(iter_component_export_zip(exported, schema_files), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="components-{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}.zip"'
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Component-Count"] = str(len(extract_catalog_items(exported)))
+    return response
+
+
 @app.route("/api/custom-components", methods=["POST", "OPTIONS"])
 def api_custom_components_create():
     if request.method == "OPTIONS":
@@ -2318,21 +6804,11 @@ def api_custom_components_create():
     elif not isinstance(schema_data, (dict, list)):
         return json_error("Invalid schema", "COMPONENTS_SCHEMA_INVALID", 400)
 
-    with COMPONENTS_LOCK:
-        runtime_path = components_runtime_list_path()
-        runtime_catalog = load_components_catalog(runtime_path) if os.path.isfile(runtime_path) else default_components_catalog()
-
-        runtime_items = extract_catalog_items(runtime_catalog)
-        existing_ids = {item.get("id") for item in runtime_items}
-        if component_id in existing_ids:
+    with runtime_catalog_transaction() as runtime_catalog:
+        if runtime_catalog.get(component_id):
             return json_error("Component id already exists", "COMPONENTS_ID_CONFLICT", 409)
-
-        normalized_name = name.lower()
-        for item in runtime_items:
-            item_id = str(item.get("id") or "")
-            item_name = str(item.get("name") or "").strip().lower()
-            if item_id.startswith("custom/") and item_name == normalized_name:
-                return json_error("Component name already exists", "COMPONENTS_NAME_CONFLICT", 409)
+        if runtime_catalog.custom_name_taken(name):
+            return json_error("Component name already exists", "COMPONENTS_NAME_CONFLICT", 409)
 
         schema_target = runtime_schema_target_path(entry["schemaPath"])
         if not schema_target:
@@ -2342,9 +6818,7 @@ def api_custom_components_create():
             json.dump(schema_data, handle, ensure_ascii=False, indent=2)
             handle.write("\n")
 
-        custom_items = ensure_custom_category(runtime_catalog)
-        custom_items.append(entry)
-        save_runtime_components_catalog(runtime_catalog)
+        runtime_catalog.append([], entry)
 
     return jsonify({"status": "ok", "item": entry})
 
@@ -2380,35 +6854,19 @@ def api_custom_components_update(id_or_key):
         return json_error("Invalid available flag", "COMPONENTS_AVAILABLE_INVALID", 400)
 
     new_key = slugify_component_key(name)
-    if not new_key:
-        return json_error("Invalid custom component key", "COMPONENTS_CUSTOM_KEY_INVALID", 400)
-    new_id = f"custom/{new_key}"
-
-    with COMPONENTS_LOCK:
-        runtime_path = components_runtime_list_path()
-        if not os.path.isfile(runtime_path):
-            return json_error("Component not found", "COMPONENTS_NOT_FOUND", 404)
-        runtime_catalog = load_components_catalog(runtime_path)
+    if not new_key:
+        return json_error("Invalid custom component key", "COMPONENTS_CUSTOM_KEY_INVALID", 400)
+    new_id = f"custom/{new_key}"
 
-        existing_ref = find_catalog_item_ref(runtime_catalog, component_id)
-        if not existing_ref:
+    with runtime_catalog_transaction() as runtime_catalog:
+        existing_item = runtime_catalog.get(component_id)
+        if not existing_item:
             return json_error("Component not found", "COMPONENTS_NOT_FOUND", 404)
-        target_items, target_index, existing_item = existing_ref
-
-        runtime_items = extract_catalog_items(runtime_catalog)
-        normalized_name = name.strip().lower()
-        for item in runtime_items:
-            item_id = str(item.get("id") or "")
-            item_name = str(item.get("name") or "").strip().lower()
-            if item_id == component_id:
-                continue
-            if item_id.startswith("custom/") and item_name == normalized_name:
-                return json_error("Component name already exists", "COMPONENTS_NAME_CONFLICT", 409)
 
-        if new_id != component_id:
-            for item in runtime_items:
-                if str(item.get("id") or "") == new_id:
-                    return json_error("Component id already exists", "COMPONENTS_ID_CONFLICT", 409)
+        if runtime_catalog.custom_name_taken(name, exclude_id=component_id):
+            return json_error("Component name already exists", "COMPONENTS_NAME_CONFLICT", 409)
+        if new_id != component_id and runtime_catalog.get(new_id):
+            return json_error("Component id already exists", "COMPONENTS_ID_CONFLICT", 409)
 
         updated_entry = {
             "name": name,
@@ -2442,8 +6900,7 @@ def api_custom_components_update(id_or_key):
             except Exception:
                 return json_error("Failed to delete old schema", "COMPONENTS_SCHEMA_DELETE_FAILED", 500)
 
-        target_items[target_index] = updated_entry
-        save_runtime_components_catalog(runtime_catalog)
+        runtime_catalog.replace(component_id, updated_entry)
 
     return jsonify(
         {
@@ -2469,23 +6926,19 @@ def api_custom_components_delete(id_or_key):
     if not component_id:
         return json_error("Invalid component id", "COMPONENTS_ID_INVALID", 400)
 
-    with COMPONENTS_LOCK:
-        runtime_path = components_runtime_list_path()
-        if not os.path.isfile(runtime_path):
-            return json_error("Component not found", "COMPONENTS_NOT_FOUND", 404)
-        runtime_catalog = load_components_catalog(runtime_path)
-        removed = remove_catalog_item(runtime_catalog, component_id)
-        if not removed:
+    with runtime_catalog_transaction() as runtime_catalog:
+        existing_item = runtime_catalog.get(component_id)
+        if not existing_item:
             return json_error("Component not found", "COMPONENTS_NOT_FOUND", 404)
 
-        schema_path = runtime_schema_target_path(str(removed.get("schemaPath") or ""))
+        schema_path = runtime_schema_target_path(str(existing_item.get("schemaPath") or ""))
         if schema_path and os.path.isfile(schema_path):
             try:
                 os.remove(schema_path)
             except Exception:
                 return json_error("Failed to delete schema", "COMPONENTS_SCHEMA_DELETE_FAILED", 500)
 
-        save_runtime_components_catalog(runtime_catalog)
+        runtime_catalog.remove(component_id)
 
     return jsonify({"status": "ok", "removed": component_id})
 
@@ -3176,6 +7629,53 @@ def purge_project_bundle():
     )
 
 
+@app.route("/api/projects/validate", methods=["POST", "OPTIONS"])
+def api_projects_validate():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return json_error("Payload must be an object", "PROJECT_VALIDATE_INVALID", 400)
+    started = time.perf_counter()
+    batch = []
+    if "project" in payload:
+        batch.append((str(payload.get("name") or ""), payload.get("project")))
+    projects = payload.get("projects", [])
+    names = payload.get("names", [])
+    if not isinstance(projects, list) or not isinstance(names, list):
+        return json_error("projects and names must be lists", "PROJECT_VALIDATE_INVALID", 400)
+    for index, item in enumerate(projects):
+        if isinstance(item, dict) and "data" in item:
+            batch.append((str(item.get("name") or index), item.get("data")))
+        else:
+            batch.append((str(index), item))
+    for name_value in names:
+        filename = normalize_filename(str(name_value or ""), ".json")
+        if not filename:
+            return json_error("Invalid name", "PROJECT_NAME_INVALID", 400)
+        batch.append((filename, read_json_file(os.path.join(PROJECT_DIR, filename))))
+    if not batch:
+        return json_error("Missing project", "PROJECT_VALIDATE_EMPTY", 400)
+    if len(batch) > PROJECT_VALIDATE_MAX_PROJECTS:
+        return json_error("Too many projects", "PROJECT_VALIDATE_TOO_MANY", 400)
+
+    results = []
+    for name, project in batch:
+        errors = project_validator.validate(project) if project is not None else [
+            {"component": None, "index": None, "path": "", "message": "Project not found or invalid JSON"}
+        ]
+        results.append({"name": name, "valid": not errors, "errors": errors})
+    took_ms = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(
+        {"status": "ok", "valid": all(item["valid"] for item in results), "results": results, "took_ms": took_ms}
+    )
+
+
 @app.route("/projects/rename", methods=["POST", "OPTIONS"])
 def rename_project():
     if request.method == "OPTIONS":
@@ -3332,46 +7832,7 @@ def api_devices_register():
     if host and not VALID_DEVICE.match(host):
         host = ""
 
-    devices = load_devices()
-    now = utc_now()
-    updated = False
-    for device in devices:
-        current_key = canonical_device_key(device)
-        if current_key and current_key == key:
-            device["device_key"] = key
-            device["yaml"] = yaml_name or device.get("yaml", "")
-            device["name"] = key
-            if host:
-                device["host"] = host
-            device["updated_at"] = now
-            updated = True
-            break
-        if str(device.get("name") or "").strip().lower() == name:
-            device["device_key"] = key
-            device["yaml"] = yaml_name or device.get("yaml", "")
-            device["name"] = key
-            if host:
-                device["host"] = host
-            device["updated_at"] = now
-            updated = True
-            break
-
-    if not updated:
-        devices.append(
-            {
-                "id": uuid.uuid4().hex,
-                "device_key": key,
-                "name": key,
-                "yaml": yaml_name,
-                "host": host or f"{key}.local",
-                "status": "offline",
-                "created_at": now,
-                "updated_at": now,
-                "last_seen": "",
-            }
-        )
-
-    save_devices(devices)
+    device_registry.register(key, name, yaml_name, host)
     return jsonify({"status": "ok"})
 
 
@@ -3383,83 +7844,136 @@ def api_devices_list():
 
     devices = load_devices()
     refresh = str(request.args.get("refresh", "0")).strip() in ("1", "true", "yes")
-    deep = str(request.args.get("deep", "0")).strip() in ("1", "true", "yes") or ECD_STATUS_USE_PING
-    response_devices = []
-    normalized_any = False
+    deep_requested = str(request.args.get("deep", "0")).strip() in ("1", "true", "yes")
+    deep = deep_requested or ECD_STATUS_USE_PING
 
-    for device in devices:
+    # An explicit deep refresh still probes the OTA ports on demand; plain refreshes
+    # only ask the monitor to revalidate.
+    if status_monitor.running and not (refresh and deep_requested):
+        status_monitor.sync(devices)
+        if refresh:
+            status_monitor.request_refresh()
+        return jsonify({"status": "ok", "devices": [status_monitor.annotate(device) for device in devices]})
+
+    if not refresh:
+        return jsonify({"status": "ok", "devices": [build_device_response(device) for device in devices]})
+
+    return jsonify({"status": "ok", "devices": refresh_device_statuses(devices, deep)})
+
+
+@app.route("/api/devices/status/batch", methods=["POST", "OPTIONS"])
+def api_device_status_batch():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    payload = request.get_json(silent=True) or {}
+    selectors_raw = payload.get("devices")
+    if not isinstance(selectors_raw, list) or not selectors_raw:
+        return jsonify({"status": "error", "message": "devices must be a non-empty list"}), 400
+    if len(selectors_raw) > DEVICE_STATUS_BATCH_MAX:
+        return jsonify({"status": "error", "message": f"At most {DEVICE_STATUS_BATCH_MAX} devices per batch"}), 400
+    refresh = is_truthy(payload.get("refresh", False))
+    deep = is_truthy(payload.get("deep", False)) or ECD_STATUS_USE_PING
+
+    lookups = []
+    targets = {}
+    for raw in selectors_raw:
+        selector = str(raw or "").strip()
+        yaml_name = normalize_yaml_filename(selector) if selector.lower().endswith(".yaml") else ""
+        device_key = "" if yaml_name else normalize_device_key(selector)
+        device = device_registry.get(yaml_name=yaml_name, device_key=device_key) if (yaml_name or device_key) else None
+        key = canonical_device_key(device) if device else ""
+        if key:
+            targets.setdefault(key, device)
+        lookups.append((selector, key))
+
+    # A batch names the devices it needs now, so refreshes probe them even while the
+    # monitor runs; the monitor picks up the shared results.
+    if refresh and targets:
+        flight_key = (tuple(sorted(targets)), deep)
+        devices = [targets[key] for key in flight_key[0]]
+        responses = {
+            canonical_device_key(item): item
+            for item in status_refresh_flight.run(flight_key, lambda: refresh_device_statuses(devices, deep))
+        }
+    elif status_monitor.running:
+        responses = {key: status_monitor.annotate(device) for key, device in targets.items()}
+    else:
+        responses = {key: build_device_response(device) for key, device in targets.items()}
+
+    results = [{"selector": selector, "device": responses.get(key) if key else None} for selector, key in lookups]
+    return jsonify({"status": "ok", "results": results})
+
+
+@app.route("/api/devices/presence", methods=["GET"])
+def api_devices_presence():
+    access = check_access()
+    if access:
+        return access
+
+    return jsonify({"status": "ok", "running": mdns_presence.running, "devices": mdns_presence.snapshot()})
+
+
+@app.route("/api/devices/drift", methods=["GET"])
+def api_devices_drift():
+    access = check_access()
+    if access:
+        return access
+
+    devices = []
+    summary = {"up_to_date": 0, "needs_rebuild": 0, "needs_ota": 0, "unknown": 0}
+    for device in device_registry.all():
         key = canonical_device_key(device)
+        presence = mdns_presence.get(key) or {}
         yaml_name = normalize_yaml_filename(str(device.get("yaml") or ""))
-        host = str(device.get("host") or "").strip()
-        if not host:
-            fallback = key or normalize_device_key(str(device.get("name") or ""))
-            if fallback:
-                host = f"{fallback}.local"
-        status = str(device.get("status") or "").strip().lower()
-        if status not in ("online", "offline", "unknown"):
-            status = "unknown"
-        status_source = str(device.get("status_source") or "").strip().lower()
-        if status_source not in ("dns", "mdns", "ota", "unknown"):
-            status_source = "unknown"
-
-        if device.get("device_key") != key:
-            device["device_key"] = key
-            normalized_any = True
-        if device.get("name") != key and key:
-            device["name"] = key
-            normalized_any = True
-        if device.get("yaml") != yaml_name:
-            device["yaml"] = yaml_name
-            normalized_any = True
-        if device.get("host") != host and host:
-            device["host"] = host
-            normalized_any = True
-        if device.get("status") != status:
-            device["status"] = status
-            normalized_any = True
-        if device.get("status_source") != status_source:
-            device["status_source"] = status_source
-            normalized_any = True
-
-    if refresh:
-        now = utc_now()
-        updated_any = normalized_any
-        mdns_probe = MDNSProbe()
-        try:
-            for device in devices:
-                key = canonical_device_key(device)
-                host = str(device.get("host") or "").strip() or (f"{key}.local" if key else "")
-                online, dns_ok, mdns_ok, ota_ok, source = evaluate_device_connectivity(
-                    host,
-                    deep=deep,
-                    mdns_probe=mdns_probe,
-                )
-                status = "online" if online else "offline"
-                if device.get("host") != host:
-                    device["host"] = host
-                    updated_any = True
-                if device.get("status") != status:
-                    device["status"] = status
-                    device["updated_at"] = now
-                    updated_any = True
-                if device.get("status_source") != source:
-                    device["status_source"] = source
-                    updated_any = True
-                if online:
-                    device["last_seen"] = now
-                checks = {"dns": dns_ok, "mdns": mdns_ok, "ota": ota_ok}
-                response_devices.append(build_device_response(device, checks=checks))
-        finally:
-            mdns_probe.close()
-        if updated_any:
-            save_devices(devices)
+        # Artifacts are stored under the case-preserved YAML stem, not the device key.
+        drift = firmware_drift(yaml_name[:-5] if yaml_name else key, yaml_name, presence.get("txt"))
+        summary[drift["state"]] += 1
+        devices.append({"device_key": key, "yaml": device.get("yaml", ""), **drift})
+    return jsonify({"status": "ok", "summary": summary, "devices": devices})
 
-        return jsonify({"status": "ok", "devices": response_devices})
 
-    if normalized_any:
-        save_devices(devices)
+@app.route("/api/devices/history", methods=["GET"])
+def api_devices_history():
+    access = check_access()
+    if access:
+        return access
+
+    try:
+        hours = float(request.args.get("hours", "24"))
+    except ValueError:
+        hours = 24.0
+    max_hours = DEVICE_HISTORY_RETENTION / 3600 if DEVICE_HISTORY_RETENTION > 0 else 24.0 * 365
+    hours = max(1.0 / 60, min(max_hours, hours))
+    try:
+        buckets = int(request.args.get("buckets", "48"))
+    except ValueError:
+        buckets = 48
+    buckets = max(1, min(1000, buckets))
+    end = time.time()
+    start = end - hours * 3600
 
-    return jsonify({"status": "ok", "devices": [build_device_response(device) for device in devices]})
+    yaml_query = normalize_yaml_filename(str(request.args.get("yaml", "")))
+    key_query = normalize_device_key(str(request.args.get("name", "")))
+    if yaml_query or key_query:
+        target = device_registry.get(yaml_name=yaml_query, device_key=key_query)
+        key = canonical_device_key(target) if target else key_query or device_key_from_yaml(yaml_query)
+        summary = device_history.summary(key, start, end, buckets)
+        device = {"device_key": key, **summary} if summary else None
+        return jsonify({"status": "ok", "hours": hours, "device": device})
+
+    devices = []
+    for device in device_registry.all():
+        key = canonical_device_key(device)
+        summary = device_history.summary(key, start, end, buckets)
+        if summary:
+            devices.append({"device_key": key, **summary})
+    devices.sort(key=lambda item: (-item["transitions"], item["device_key"]))
+    return jsonify({"status": "ok", "hours": hours, "devices": devices})
 
 
 @app.route("/api/devices/status", methods=["GET"])
@@ -3473,59 +7987,24 @@ def api_device_status():
     if not yaml_query and not key_query:
         return jsonify({"status": "error", "message": "Invalid device selector"}), 400
 
-    devices = load_devices()
-    target = None
-    for device in devices:
-        device_yaml = normalize_yaml_filename(str(device.get("yaml") or ""))
-        device_key = canonical_device_key(device)
-        if yaml_query and device_yaml and device_yaml.lower() == yaml_query.lower():
-            target = device
-            break
-        if key_query and device_key == key_query:
-            target = device
-            break
-
+    target = device_registry.get(yaml_name=yaml_query, device_key=key_query)
     if not target:
         return jsonify({"status": "ok", "device": None})
 
     refresh = str(request.args.get("refresh", "0")).strip() in ("1", "true", "yes")
-    deep = str(request.args.get("deep", "0")).strip() in ("1", "true", "yes") or ECD_STATUS_USE_PING
+    deep_requested = str(request.args.get("deep", "0")).strip() in ("1", "true", "yes")
+    deep = deep_requested or ECD_STATUS_USE_PING
+    if status_monitor.running and not (refresh and deep_requested):
+        if refresh:
+            # A device registered since the last sweep has no state yet to refresh.
+            status_monitor.track([target])
+            status_monitor.request_refresh([canonical_device_key(target)])
+        return jsonify({"status": "ok", "device": status_monitor.annotate(target)})
+
     if not refresh:
         return jsonify({"status": "ok", "device": build_device_response(target)})
 
-    now = utc_now()
-    key = canonical_device_key(target)
-    host = str(target.get("host") or "").strip() or (f"{key}.local" if key else "")
-    mdns_probe = MDNSProbe()
-    try:
-        online, dns_ok, mdns_ok, ota_ok, source = evaluate_device_connectivity(
-            host,
-            deep=deep,
-            mdns_probe=mdns_probe,
-        )
-    finally:
-        mdns_probe.close()
-
-    status = "online" if online else "offline"
-    changed = False
-    if target.get("host") != host:
-        target["host"] = host
-        changed = True
-    if target.get("status") != status:
-        target["status"] = status
-        target["updated_at"] = now
-        changed = True
-    if target.get("status_source") != source:
-        target["status_source"] = source
-        changed = True
-    if online:
-        target["last_seen"] = now
-
-    if changed:
-        save_devices(devices)
-
-    checks = {"dns": dns_ok, "mdns": mdns_ok, "ota": ota_ok}
-    return jsonify({"status": "ok", "device": build_device_response(target, checks=checks)})
+    return jsonify({"status": "ok", "device": refresh_device_statuses([target], deep)[0]})
 
 
 @app.route("/api/serial/ports", methods=["GET"])
@@ -3643,6 +8122,10 @@ def api_job_tail_wait(job_id):
     if not job:
         return jsonify({"status": "error", "message": "Not found"}), 404
 
+    return jsonify(job_tail_wait_payload(job))
+
+
+def job_tail_wait_payload(job: Job) -> dict:
     try:
         since = int(request.args.get("since", "0"))
     except ValueError:
@@ -3663,17 +8146,15 @@ def api_job_tail_wait(job_id):
     limit = max(1, min(1000, limit))
 
     entries = job.get_seq_entries(since=since, limit=limit)
-    if entries:
+    if entries or job.state in ("success", "failed", "canceled"):
         lines = [line for _, line in entries]
-        next_seq = entries[-1][0]
-        return jsonify(
-            {
-                "status": "ok",
-                "job": job.to_dict(),
-                "lines": lines,
-                "next_seq": next_seq,
-            }
-        )
+        next_seq = entries[-1][0] if entries else job.get_last_seq()
+        return {
+            "status": "ok",
+            "job": job.to_dict(),
+            "lines": lines,
+            "next_seq": next_seq,
+        }
 
     listener = job.add_listener()
     done_payload = None
@@ -3698,14 +8179,224 @@ def api_job_tail_wait(job_id):
     next_seq = entries[-1][0] if entries else job.get_last_seq()
 
     payload_job = done_payload if done_payload else job.to_dict()
-    return jsonify(
-        {
-            "status": "ok",
-            "job": payload_job,
-            "lines": lines,
-            "next_seq": next_seq,
-        }
-    )
+    return {
+        "status": "ok",
+        "job": payload_job,
+        "lines": lines,
+        "next_seq": next_seq,
+    }
+
+
+@app.route("/api/build-gc", methods=["GET", "POST", "OPTIONS"])
+def api_build_gc():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    if request.method == "POST":
+        if not build_gc.enabled:
+            return jsonify({"status": "error", "message": "Build GC is disabled"}), 400
+        report = build_gc.run_once()
+        return jsonify({"status": "ok", "report": report, "gc": build_gc.status()})
+
+    return jsonify({"status": "ok", "gc": build_gc.status()})
+
+
+@app.route("/api/toolchains", methods=["GET"])
+def api_toolchains():
+    access = check_access()
+    if access:
+        return access
+
+    items = []
+    for target in scan_toolchain_targets():
+        items.append(
+            {
+                "platform": target["platform"],
+                "board": target["board"],
+                "variant": target["variant"],
+                "framework": target["framework"],
+                "yamls": target["yamls"],
+                "platformInstalled": toolchain_platform_installed(target["platform"]),
+            }
+        )
+    return jsonify({"status": "ok", "toolchains": items})
+
+
+@app.route("/api/toolchains/prepare", methods=["POST", "OPTIONS"])
+def api_toolchains_prepare():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    job = job_manager.submit_toolchain_prepare()
+    return jsonify({"status": "ok", "job_id": job.id, "job": job.to_dict()})
+
+
+@app.route("/api/workers", methods=["GET", "POST", "DELETE", "OPTIONS"])
+def api_workers():
+    if request.method == "OPTIONS":
+        return make_response("", 204)
+
+    access = check_access()
+    if access:
+        return access
+
+    if request.method == "POST":
+        payload = request.get_json(silent=True) or {}
+        url = normalize_worker_url(payload.get("url", ""))
+        if not url:
+            return jsonify({"status": "error", "message": "Invalid worker url"}), 400
+        token = str(payload.get("token") or "")
+        if not token:
+            return jsonify({"status": "error", "message": "Worker token required"}), 400
+        name = str(payload.get("name") or "").strip()
+        worker = worker_pool.register(url, token=token, name=name)
+        return jsonify({"status": "ok", "worker": worker})
+
+    if request.method == "DELETE":
+        url = normalize_worker_url(request.args.get("url", ""))
+        if not url:
+            return jsonify({"status": "error", "message": "Invalid worker url"}), 400
+        if not worker_pool.unregister(url):
+            return jsonify({"status": "error", "message": "Not found"}), 404
+        return jsonify({"status": "ok", "removed": url})
+
+    if is_truthy(request.args.get("check", "")):
+        worker_pool.check_all()
+    return jsonify({"status": "ok", "workers": worker_pool.list()})
+
+
+@app.route("/api/worker/health", methods=["GET"])
+def api_worker_health():
+    access = check_worker_access()
+    if access:
+        return access
+
+    return jsonify({"status": "ok", "worker": True, "load": job_manager.load(), "version": ECD_VERSION})
+
+
+def release_worker_workspace(workspace: str) -> None:
+    """Drop the bundled sources; node workspaces keep their build output for the next build."""
+    if os.path.basename(workspace).startswith("node-"):
+        clear_worker_workspace(workspace)
+        try:
+            os.utime(workspace)
+        except OSError:
+            pass
+    else:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def get_worker_job(job_id: str) -> Optional[Job]:
+    job = job_manager.get(job_id)
+    if not job or not job.config_dir:
+        return None
+    return job
+
+
+@app.route("/api/worker/jobs", methods=["POST"])
+def api_worker_jobs_submit():
+    access = check_worker_access()
+    if access:
+        return access
+
+    yaml_name = normalize_yaml_filename(str(request.form.get("yaml", "")))
+    if not yaml_name:
+        return jsonify({"status": "error", "message": "Invalid yaml"}), 400
+    if "bundle" not in request.files:
+        return jsonify({"status": "error", "message": "Missing bundle"}), 400
+
+    raw = request.files["bundle"].stream.read(WORKER_BUNDLE_MAX_BYTES + 1)
+    if len(raw) > WORKER_BUNDLE_MAX_BYTES:
+        return jsonify({"status": "error", "message": "Bundle too large"}), 413
+
+    active = job_manager.active_config_dirs()
+    prune_worker_workspaces(active)
+    workspace = worker_node_workspace(yaml_name)
+    if workspace in active:
+        workspace = os.path.join(WORKER_WORKSPACE_ROOT, uuid.uuid4().hex)
+    try:
+        os.makedirs(workspace, exist_ok=True)
+        clear_worker_workspace(workspace)
+        os.utime(workspace)
+        extract_worker_bundle(raw, workspace)
+    except (OSError, ValueError, zipfile.BadZipFile) as exc:
+        release_worker_workspace(workspace)
+        return jsonify({"status": "error", "message": f"Invalid bundle: {exc}"}), 400
+    if not os.path.isfile(os.path.join(workspace, yaml_name)):
+        release_worker_workspace(workspace)
+        return jsonify({"status": "error", "message": "YAML not found in bundle"}), 400
+
+    job = job_manager.submit(yaml_name, "compile", "", config_dir=workspace)
+    return jsonify({"status": "ok", "job_id": job.id, "job": job.to_dict()})
+
+
+@app.route("/api/worker/jobs/<job_id>/tail-wait", methods=["GET"])
+def api_worker_job_tail_wait(job_id):
+    access = check_worker_access()
+    if access:
+        return access
+
+    job = get_worker_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    return jsonify(job_tail_wait_payload(job))
+
+
+@app.route("/api/worker/jobs/<job_id>/firmware", methods=["GET"])
+def api_worker_job_firmware(job_id):
+    access = check_worker_access()
+    if access:
+        return access
+
+    job = get_worker_job(job_id)
+    if not job or job.state != "success":
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    variant = str(request.args.get("variant", "ota")).strip().lower()
+    if variant not in ("ota", "factory"):
+        return jsonify({"status": "error", "message": "Invalid variant"}), 400
+
+    workspace_build = os.path.join(job.config_dir, ".esphome", "build")
+    firmware_path = find_firmware_path(job.yaml_name[:-5], variant, extra_roots=[workspace_build])
+    if not firmware_path or not os.path.isfile(firmware_path):
+        return jsonify({"status": "error", "message": "Firmware not found"}), 404
+    return send_file(firmware_path, mimetype="application/octet-stream")
+
+
+@app.route("/api/worker/jobs/<job_id>/cancel", methods=["POST"])
+def api_worker_job_cancel(job_id):
+    access = check_worker_access()
+    if access:
+        return access
+
+    job = get_worker_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    job_manager.cancel(job_id)
+    return jsonify({"status": "ok", "job": job.to_dict()})
+
+
+@app.route("/api/worker/jobs/<job_id>", methods=["DELETE"])
+def api_worker_job_release(job_id):
+    access = check_worker_access()
+    if access:
+        return access
+
+    job = get_worker_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    if job.state in ("queued", "running"):
+        job_manager.cancel(job_id)
+    if is_same_filesystem_path(os.path.dirname(job.config_dir), WORKER_WORKSPACE_ROOT):
+        release_worker_workspace(job.config_dir)
+    return jsonify({"status": "ok"})
 
 
 @app.route("/api/firmware", methods=["GET"])
@@ -3723,24 +8414,60 @@ def api_firmware():
         return jsonify({"status": "error", "message": "Invalid variant"}), 400
 
     node_name = yaml_name[:-5]
-    firmware_path = find_firmware_path(node_name, variant)
+    version = str(request.args.get("version", "")).strip()
+    download_name = f"{node_name}.bin"
+    if variant == "factory":
+        download_name = f"{node_name}.factory.bin"
+
+    firmware_path, info = artifact_store.lookup(node_name, variant, version)
+    rebuilt_path = ""
+    if firmware_path and not version:
+        # A build run outside this instance's jobs (e.g. the ESPHome dashboard) rewrites
+        # the image the stored artifact was copied from.
+        rebuilt_path = artifact_store.rebuilt_source(info)
+    if firmware_path and not rebuilt_path:
+        response = send_file(
+            firmware_path,
+            mimetype="application/octet-stream",
+            as_attachment=True,
+            download_name=download_name,
+            etag=info["sha256"],
+            conditional=True,
+        )
+        response.headers["X-Firmware-Version"] = info["id"]
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    if version:
+        return jsonify({"status": "error", "message": "Firmware version not found"}), 404
+
+    firmware_path = rebuilt_path or find_firmware_path(node_name, variant)
     if not firmware_path or not os.path.isfile(firmware_path):
         if variant == "factory":
             return jsonify({"status": "error", "message": "Factory firmware not found"}), 404
         return jsonify({"status": "error", "message": "Firmware not found"}), 404
 
-    download_name = f"{node_name}.bin"
-    if variant == "factory":
-        download_name = f"{node_name}.factory.bin"
-
     return send_file(
         firmware_path,
         mimetype="application/octet-stream",
         as_attachment=True,
         download_name=download_name,
+        conditional=True,
     )
 
 
+@app.route("/api/firmware/versions", methods=["GET"])
+def api_firmware_versions():
+    access = check_access()
+    if access:
+        return access
+
+    yaml_name = normalize_yaml_filename(str(request.args.get("yaml", "")))
+    if not yaml_name:
+        return jsonify({"status": "error", "message": "Invalid yaml"}), 400
+
+    return jsonify({"status": "ok", "yaml": yaml_name, "versions": artifact_store.versions(yaml_name[:-5])})
+
+
 def format_sse(event: str, data: str) -> str:
     return f"event: {event}\ndata: {data}\n\n"
 
@@ -3806,6 +8533,23 @@ def api_job_cancel(job_id):
     return jsonify({"status": "ok", "job": job.to_dict()})
 
 
+@app.route("/api/static-manifest", methods=["GET"])
+def api_static_manifest():
+    access = check_access()
+    if access:
+        return access
+
+    return jsonify({"status": "ok", "ready": static_assets.ready, "manifest": static_assets.manifest()})
+
+
+@app.route("/h/<digest>/<path:relpath>")
+def serve_hashed_static(digest, relpath):
+    entry = static_assets.lookup(relpath)
+    if not entry:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    return static_assets.response(entry, immutable=entry["sha256"].startswith(digest) and len(digest) == 16)
+
+
 @app.route("/", defaults={"path": "index.html"})
 @app.route("/<path:path>")
 def serve_ui(path):
@@ -3822,6 +8566,9 @@ def serve_ui(path):
         file_path = os.path.join(web_root, path)
 
     if os.path.isfile(file_path):
+        entry = static_assets.lookup(path.replace(os.sep, "/"))
+        if entry:
+            return static_assets.response(entry)
         return send_from_directory(web_root, path)
 
     index_path = os.path.join(web_root, "index.html")
@@ -3832,4 +8579,5 @@ def serve_ui(path):
 
 
 if __name__ == "__main__":
+    start_background_services()
     app.run(host="0.0.0.0", port=PORT)
@@ -0,0 +1,265 @@
+"""Simulated ESPHome device fleet for scaling tests of the device status endpoints.
+
+Each simulated device gets its own loopback address (127.1.x.y) with an optional TCP
+listener on the OTA port, an entry in the mDNS presence table and a DNS answer for
+``<name>.local``. Offline devices have none of these. Lossy devices randomly miss their
+mDNS and DNS answers, and every lookup can be delayed to mimic a slow network.
+
+Run directly to benchmark ``/api/devices/list?refresh=1`` at several fleet sizes:
+
+    python tests/fleet_sim.py --sizes 10,100,1000
+"""
+
+import argparse
+import importlib.util
+import os
+import pathlib
+import random
+import resource
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+from unittest.mock import patch
+
+
+SERVER_PATH = pathlib.Path(__file__).resolve().parents[1] / "server.py"
+SERVICE_TYPE = "_esphomelib._tcp.local."
+
+
+def load_server(module_name: str = "ecd_server_fleet_sim"):
+    sys.modules.setdefault("pty", types.SimpleNamespace(openpty=lambda: (_ for _ in ()).throw(NotImplementedError())))
+    spec = importlib.util.spec_from_file_location(module_name, SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def raise_fd_limit(required: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = required if hard == resource.RLIM_INFINITY else min(required, hard)
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+class FakeServiceInfo:
+    def __init__(self, address: str, port: int, txt: dict) -> None:
+        self.address = address
+        self.port = port
+        self.properties = txt
+
+    def parsed_addresses(self):
+        return [self.address]
+
+
+class SimulatedDevice:
+    def __init__(self, index: int, online: bool, lossy: bool) -> None:
+        self.name = f"sim{index:04d}"
+        self.address = f"127.1.{index // 250}.{index % 250 + 1}"
+        self.online = online
+        self.lossy = lossy
+
+    @property
+    def host(self) -> str:
+        return f"{self.name}.local"
+
+
+class FleetSimulation:
+    """Context manager that installs a fake fleet into a loaded server module."""
+
+    def __init__(
+        self,
+        server,
+        count: int,
+        offline_ratio: float = 0.2,
+        loss_ratio: float = 0.0,
+        latency: float = 0.0,
+        port: int = 0,
+        seed: int = 1,
+    ) -> None:
+        self.server = server
+        self.count = count
+        self.offline_ratio = offline_ratio
+        self.loss_ratio = loss_ratio
+        self.latency = latency
+        self.port = port
+        self.random = random.Random(seed)
+        self.devices = []
+        self.listeners = []
+        self.selector = None
+        self.accept_thread = None
+        self.stopping = threading.Event()
+        self.patches = []
+        self.temp_dir = None
+
+    @property
+    def online_names(self) -> set:
+        return {device.name for device in self.devices if device.online}
+
+    def __enter__(self) -> "FleetSimulation":
+        raise_fd_limit(self.count * 3 + 256)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        offline_count = int(round(self.count * self.offline_ratio))
+        offline = set(self.random.sample(range(self.count), offline_count))
+        self.devices = [
+            SimulatedDevice(index, index not in offline, self.random.random() < self.loss_ratio)
+            for index in range(self.count)
+        ]
+        self._start_listeners()
+        self._install()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for item in reversed(self.patches):
+            item.stop()
+        self.patches = []
+        self.stopping.set()
+        if self.accept_thread is not None:
+            self.accept_thread.join(timeout=2)
+        for listener in self.listeners:
+            listener.close()
+        if self.selector is not None:
+            self.selector.close()
+        self.temp_dir.cleanup()
+
+    def _start_listeners(self) -> None:
+        self.selector = selectors.DefaultSelector()
+        port = self.port
+        for device in self.devices:
+            if not device.online:
+                continue
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((device.address, port))
+            port = port or listener.getsockname()[1]
+            listener.listen(16)
+            listener.setblocking(False)
+            self.selector.register(listener, selectors.EVENT_READ)
+            self.listeners.append(listener)
+        self.port = port
+        self.accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.accept_thread.start()
+
+    def _accept_loop(self) -> None:
+        while not self.stopping.is_set():
+            for key, _ in self.selector.select(0.2):
+                try:
+                    connection, _ = key.fileobj.accept()
+                    connection.close()
+                except OSError:
+                    continue
+
+    def _answers(self, device: SimulatedDevice) -> bool:
+        if not device.online:
+            return False
+        return not (device.lossy and self.random.random() < 0.5)
+
+    def _install(self) -> None:
+        server = self.server
+        by_host = {device.host: device for device in self.devices}
+        real_getaddrinfo = socket.getaddrinfo
+
+        def fake_getaddrinfo(host, port, *args, **kwargs):
+            device = by_host.get(str(host).rstrip(".").lower())
+            if device is None:
+                return real_getaddrinfo(host, port, *args, **kwargs)
+            if self.latency:
+                time.sleep(self.latency)
+            if not self._answers(device):
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (device.address, port or 0))]
+
+        presence = server.MDNSPresenceBrowser()
+        presence.zc = object()
+        presence.started_at = time.time() - 3600
+        for device in self.devices:
+            if self._answers(device):
+                presence.record(SERVICE_TYPE, f"{device.name}.{SERVICE_TYPE}", FakeServiceInfo(device.address, 6053, {}))
+
+        registry = server.DeviceRegistry(flush_delay=0.5)
+        resolver = server.HostResolver(
+            server.DNS_CACHE_TTL,
+            server.DNS_NEGATIVE_TTL,
+            server.DNS_TIMEOUT,
+            max(server.DNS_CACHE_SIZE, self.count * 2),
+            server.DNS_RESOLVER_WORKERS,
+        )
+        devices_path = os.path.join(self.temp_dir.name, "devices.json")
+        self.patches = [
+            patch("socket.getaddrinfo", fake_getaddrinfo),
+            patch.object(server, "DEVICES_PATH", devices_path),
+            patch.object(server, "PING_PORT", self.port),
+            patch.object(server, "mdns_presence", presence),
+            patch.object(server, "device_registry", registry),
+            patch.object(server, "host_resolver", resolver),
+            patch.object(server, "status_monitor", server.DeviceStatusMonitor()),
+            patch.object(server.device_history, "root", os.path.join(self.temp_dir.name, "history")),
+        ]
+        for item in self.patches:
+            item.start()
+        server.save_devices(
+            [
+                {"device_key": device.name, "name": device.name, "yaml": f"{device.name}.yaml", "host": device.host}
+                for device in self.devices
+            ]
+        )
+
+
+def measure(action) -> dict:
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    threads_before = threading.active_count()
+    started = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "result": result,
+        "seconds": elapsed,
+        "cpu_seconds": (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime),
+        "peak_threads": max(threads_before, threading.active_count()),
+        "max_rss_mb": usage_after.ru_maxrss / 1024.0,
+    }
+
+
+def run_benchmark(sizes, offline_ratio: float, loss_ratio: float, latency: float, deep: bool) -> None:
+    server = load_server()
+    client = server.app.test_client()
+    headers = {"X-Ingress-Path": "/bench"}
+    query = "/api/devices/list?refresh=1" + ("&deep=1" if deep else "")
+    print(f"{'devices':>8} {'refresh s':>10} {'cached s':>9} {'status ms':>10} {'cpu s':>7} {'threads':>8} {'rss MB':>8} {'online':>7}")
+    for size in sizes:
+        with FleetSimulation(server, size, offline_ratio, loss_ratio, latency) as fleet:
+            cold = measure(lambda: client.get(query, headers=headers).get_json())
+            warm = measure(lambda: client.get(query, headers=headers).get_json())
+            sample = fleet.devices[: min(20, size)]
+            status = measure(
+                lambda: [
+                    client.get(f"/api/devices/status?name={device.name}&refresh=1", headers=headers)
+                    for device in sample
+                ]
+            )
+            online = sum(1 for item in cold["result"]["devices"] if item["status"] == "online")
+            print(
+                f"{size:>8} {cold['seconds']:>10.3f} {warm['seconds']:>9.3f} "
+                f"{status['seconds'] * 1000 / len(sample):>10.1f} {cold['cpu_seconds']:>7.2f} "
+                f"{cold['peak_threads']:>8} {cold['max_rss_mb']:>8.1f} {online:>7}/{len(fleet.online_names)}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--offline", type=float, default=0.2, help="share of devices that are offline")
+    parser.add_argument("--loss", type=float, default=0.0, help="share of online devices with flaky answers")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every DNS lookup")
+    parser.add_argument("--deep", action="store_true", help="also probe the OTA port")
+    args = parser.parse_args()
+    sizes = [int(item) for item in args.sizes.split(",") if item.strip()]
+    run_benchmark(sizes, args.offline, args.loss, args.latency, args.deep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+import importlib.util
+import os
+import pathlib
+import sys
+import tempfile
+import types
+import unittest
+import zipfile
+from unittest.mock import patch
+
+
+SERVER_PATH = pathlib.Path(__file__).resolve().parents[1] / "server.py"
+sys.modules.setdefault("pty", types.SimpleNamespace(openpty=lambda: (_ for _ in ()).throw(NotImplementedError())))
+SPEC = importlib.util.spec_from_file_location("ecd_server_build_jobs", SERVER_PATH)
+server = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(server)
+
+
+class CompilerCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.original = (
+            server.ECD_COMPILER_CACHE,
+            server.COMPILER_CACHE_DIR,
+            server.COMPILER_CACHE_BIN,
+            server.JOB_DIR,
+            dict(server.COMPILER_CACHE_TOTALS),
+        )
+        self.temp_dir = tempfile.TemporaryDirectory()
+        fake_ccache = pathlib.Path(self.temp_dir.name) / "ccache"
+        fake_ccache.write_text("#!/bin/sh\nexit 0\n", encoding="utf-8")
+        fake_ccache.chmod(0o755)
+        server.ECD_COMPILER_CACHE = True
+        server.COMPILER_CACHE_BIN = str(fake_ccache)
+        server.COMPILER_CACHE_DIR = os.path.join(self.temp_dir.name, "ccache-dir")
+        server.JOB_DIR = self.temp_dir.name
+
+    def tearDown(self):
+        (
+            server.ECD_COMPILER_CACHE,
+            server.COMPILER_CACHE_DIR,
+            server.COMPILER_CACHE_BIN,
+            server.JOB_DIR,
+            totals,
+        ) = self.original
+        server.COMPILER_CACHE_TOTALS.clear()
+        server.COMPILER_CACHE_TOTALS.update(totals)
+        self.temp_dir.cleanup()
+
+    def test_compiler_cache_env_is_empty_when_disabled(self):
+        server.ECD_COMPILER_CACHE = False
+
+        self.assertEqual({}, server.compiler_cache_env())
+
+    def test_compiler_cache_env_points_platformio_at_wrapper_script(self):
+        env = server.compiler_cache_env()
+
+        self.assertEqual(server.COMPILER_CACHE_DIR, env["CCACHE_DIR"])
+        self.assertEqual(server.COMPILER_CACHE_BIN, env["ECD_CCACHE_BIN"])
+        script_path = env["PLATFORMIO_EXTRA_SCRIPTS"].splitlines()[-1]
+        self.assertEqual(server.COMPILER_CACHE_SCRIPT, pathlib.Path(script_path).read_text(encoding="utf-8"))
+
+    def test_compiler_cache_base_dir_covers_every_node_build_dir(self):
+        with patch.object(server, "TARGET_DIR", "/config/esphome"), patch.object(server, "ESPHOME_BUILD_PATH", ""):
+            self.assertEqual("/config/esphome", server.compiler_cache_env()["CCACHE_BASEDIR"])
+            self.assertEqual("/data/workspaces/job", server.compiler_cache_env("/data/workspaces/job")["CCACHE_BASEDIR"])
+        with patch.object(server, "TARGET_DIR", "/config/esphome"), patch.object(server, "ESPHOME_BUILD_PATH", "/data/build"):
+            self.assertEqual("/data/build", server.compiler_cache_base_dir())
+
+    def test_compile_job_records_cache_hits_and_misses(self):
+        manager = object.__new__(server.JobManager)
+        job = server.Job("cache-test", "device.yaml", "compile", "")
+        commands = []
+        manager._run_command = lambda current_job, cmd, extra_env=None: commands.append((cmd, extra_env)) or 0
+        stats = iter(
+            [
+                {"direct_cache_hit": 3, "preprocessed_cache_hit": 1, "cache_miss": 10},
+                {"direct_cache_hit": 40, "preprocessed_cache_hit": 4, "cache_miss": 12},
+            ]
+        )
+        with patch.object(server, "compiler_cache_stats", side_effect=lambda: next(stats)):
+            exit_code = manager._run_esphome(job, ["compile", "device.yaml"])
+
+        self.assertEqual(0, exit_code)
+        self.assertEqual({"hits": 40, "misses": 2}, job.compiler_cache)
+        self.assertEqual({"hits": 40, "misses": 2}, job.to_dict()["compiler_cache"])
+        self.assertIn("CCACHE_DIR", commands[0][1])
+        self.assertEqual(40, server.collect_metrics()["compilerCache"]["hits"])
+
+    def test_non_compile_commands_do_not_use_compiler_cache(self):
+        manager = object.__new__(server.JobManager)
+        job = server.Job("config-test", "device.yaml", "validate", "")
+        commands = []
+        manager._run_command = lambda current_job, cmd, extra_env=None: commands.append(extra_env) or 0
+
+        manager._run_esphome(job, ["config", "device.yaml"])
+        manager._run_esphome(job, ["compile", "--only-generate", "device.yaml"])
+
+        self.assertEqual([None, None], commands)
+        self.assertIsNone(job.compiler_cache)
+        self.assertEqual(0, server.COMPILER_CACHE_TOTALS["jobs"])
+
+
+class ToolchainPrepareTests(unittest.TestCase):
+    def setUp(self):
+        self.original = (server.TARGET_DIR, server.ESPHOME_DATA_DIR, server.JOB_DIR)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.target_dir = pathlib.Path(self.temp_dir.name) / "config"
+        self.target_dir.mkdir()
+        server.TARGET_DIR = str(self.target_dir)
+        server.ESPHOME_DATA_DIR = os.path.join(self.temp_dir.name, "data")
+        server.JOB_DIR = self.temp_dir.name
+
+    def tearDown(self):
+        server.TARGET_DIR, server.ESPHOME_DATA_DIR, server.JOB_DIR = self.original
+        self.temp_dir.cleanup()
+
+    def test_parse_yaml_toolchain_target_reads_framework_block(self):
+        target = server.parse_yaml_toolchain_target(
+            "esphome:\n  name: kitchen\nesp32:\n  board: esp32dev  # DevKit\n"
+            "  framework:\n    type: esp-idf\n    sdkconfig_options:\n      CONFIG_X: y\n"
+            "wifi:\n  ssid: !secret wifi_ssid\n"
+        )
+
+        self.assertEqual("esp32", target["platform"])
+        self.assertEqual("esp32dev", target["board"])
+        self.assertEqual("esp-idf", target["framework"])
+
+    def test_parse_yaml_toolchain_target_follows_file_indentation(self):
+        target = server.parse_yaml_toolchain_target(
+            "esp32:\n    board: esp32-s3-devkitc-1\n    framework:\n        type: arduino\n        version: 3.1.0\n"
+            "logger:\n    level: DEBUG\n"
+        )
+
+        self.assertEqual(
+            ("esp32-s3-devkitc-1", "arduino", "3.1.0"),
+            (target["board"], target["framework"], target["framework_version"]),
+        )
+
+    def test_scan_reads_platform_from_included_packages(self):
+        packages = self.target_dir / "packages"
+        packages.mkdir()
+        (packages / "board.yaml").write_text("esp32:\n  board: esp32dev\n  framework:\n    type: esp-idf\n", encoding="utf-8")
+        (packages / "common.yaml").write_text("packages:\n  board: !include board.yaml\n", encoding="utf-8")
+        (self.target_dir / "kitchen.yaml").write_text(
+            "esphome:\n  name: kitchen\npackages:\n  common: !include packages/common.yaml\n", encoding="utf-8"
+        )
+
+        targets = server.scan_toolchain_targets()
+
+        self.assertEqual([("esp32", "esp32dev", "esp-idf", ["kitchen.yaml"])], [
+            (item["platform"], item["board"], item["framework"], item["yamls"]) for item in targets
+        ])
+
+    def test_prepare_job_installs_each_distinct_toolchain_once(self):
+        for name in ("a.yaml", "b.yaml"):
+            (self.target_dir / name).write_text("esp32:\n  board: esp32dev\n", encoding="utf-8")
+        (self.target_dir / "c.yaml").write_text("esp8266:\n  board: d1_mini\n", encoding="utf-8")
+        (self.target_dir / "secrets.yaml").write_text("wifi_ssid: test\n", encoding="utf-8")
+
+        manager = object.__new__(server.JobManager)
+        job = server.Job("toolchain-test", "", "toolchains", "")
+        commands = []
+        manager._run_esphome = lambda current_job, args: commands.append(args) or 0
+        manager._run_command = lambda current_job, cmd, extra_env=None: commands.append(cmd) or 0
+
+        manager._run_job(job)
+
+        self.assertEqual("success", job.state)
+        report = job.result["toolchains"]
+        self.assertEqual([["a.yaml", "b.yaml"], ["c.yaml"]], [item["yamls"] for item in report])
+        self.assertTrue(all(item["ready"] for item in report))
+        self.assertEqual(4, len(commands))
+        stub_path = commands[0][2]
+        self.assertIn("board: \"esp32dev\"", pathlib.Path(stub_path).read_text(encoding="utf-8"))
+        self.assertEqual(["pkg", "install", "--project-dir"], commands[1][1:4])
+
+
+class BuildGarbageCollectorTests(unittest.TestCase):
+    def setUp(self):
+        self.original = (server.ESPHOME_BUILD_PATH, server.BUILD_HISTORY_PATH)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.build_root = pathlib.Path(self.temp_dir.name) / "build"
+        self.build_root.mkdir()
+        server.ESPHOME_BUILD_PATH = str(self.build_root)
+        server.BUILD_HISTORY_PATH = os.path.join(self.temp_dir.name, "build_history.json")
+
+    def tearDown(self):
+        server.ESPHOME_BUILD_PATH, server.BUILD_HISTORY_PATH = self.original
+        self.temp_dir.cleanup()
+
+    def make_node(self, name, size):
+        env_dir = self.build_root / name / ".pioenvs" / name
+        env_dir.mkdir(parents=True)
+        (env_dir / "firmware.bin").write_bytes(b"F" * 16)
+        (env_dir / "objects.o").write_bytes(b"x" * size)
+        return self.build_root / name
+
+    def test_gc_evicts_least_recently_built_node_and_keeps_firmware(self):
+        old_node = self.make_node("old", 4000)
+        new_node = self.make_node("new", 4000)
+        server.record_build("new")
+        with patch.object(server.time, "time", return_value=1.0):
+            server.record_build("old")
+        collector = server.BuildGarbageCollector(6000, 3600)
+
+        report = collector.run_once()
+
+        self.assertEqual(["old"], [item["node"] for item in report["evicted"]])
+        self.assertEqual(4000, report["reclaimed"])
+        self.assertEqual(["firmware.bin"], os.listdir(old_node))
+        self.assertEqual(str(old_node / "firmware.bin"), server.find_firmware_path("old"))
+        self.assertTrue((new_node / ".pioenvs" / "new" / "objects.o").is_file())
+
+    def test_gc_skips_nodes_with_active_jobs(self):
+        self.make_node("busy", 4000)
+        collector = server.BuildGarbageCollector(100, 3600)
+        collector.active_nodes = lambda: {"busy"}
+
+        report = collector.run_once()
+
+        self.assertEqual([], report["evicted"])
+        self.assertEqual(0, report["reclaimed"])
+
+
+class RemoteBuildWorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.original = (
+            server.TARGET_DIR,
+            server.JOB_DIR,
+            server.ESPHOME_BUILD_PATH,
+            server.WORKER_WORKSPACE_ROOT,
+            server.ECD_WORKER_MODE,
+            server.ECD_WORKER_TOKEN,
+        )
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        self.target_dir = root / "config"
+        self.target_dir.mkdir()
+        (root / "build").mkdir()
+        server.TARGET_DIR = str(self.target_dir)
+        server.JOB_DIR = str(root / "jobs")
+        server.ESPHOME_BUILD_PATH = str(root / "build")
+        server.WORKER_WORKSPACE_ROOT = str(root / "worker")
+        server.ECD_WORKER_MODE = True
+        server.ECD_WORKER_TOKEN = "secret"
+
+    def tearDown(self):
+        (
+            server.TARGET_DIR,
+            server.JOB_DIR,
+            server.ESPHOME_BUILD_PATH,
+            server.WORKER_WORKSPACE_ROOT,
+            server.ECD_WORKER_MODE,
+            server.ECD_WORKER_TOKEN,
+        ) = self.original
+        self.temp_dir.cleanup()
+
+    def write_config(self):
+        (self.target_dir / "kitchen.yaml").write_text(
+            "packages:\n  base: !include common.yaml\nesp32:\n  board: esp32dev\n"
+            "font:\n  - file: \"fonts/font.ttf\"\n    id: body\n",
+            encoding="utf-8",
+        )
+        (self.target_dir / "common.yaml").write_text(
+            "wifi:\n  ssid: !secret wifi_ssid\nsensor: !include sensors.yaml\n", encoding="utf-8"
+        )
+        (self.target_dir / "sensors.yaml").write_text("- platform: uptime\n", encoding="utf-8")
+        (self.target_dir / "other.yaml").write_text("esp8266:\n  board: d1_mini\n", encoding="utf-8")
+        (self.target_dir / "secrets.yaml").write_text("wifi_ssid: test\n", encoding="utf-8")
+        (self.target_dir / "fonts").mkdir()
+        (self.target_dir / "fonts" / "font.ttf").write_bytes(b"TTF")
+        (self.target_dir / "fonts" / "unused.ttf").write_bytes(b"UNUSED")
+        (self.target_dir / "images").mkdir()
+        (self.target_dir / "images" / "logo.png").write_bytes(b"PNG")
+        (self.target_dir / ".esphome" / "build").mkdir(parents=True)
+        (self.target_dir / ".esphome" / "build" / "big.o").write_bytes(b"x" * 100)
+
+    def test_bundle_contains_referenced_files_and_skips_build_output(self):
+        self.write_config()
+
+        bundle = server.build_worker_bundle("kitchen.yaml")
+
+        with zipfile.ZipFile(server.io.BytesIO(bundle)) as archive:
+            names = sorted(archive.namelist())
+        self.assertEqual(["common.yaml", "fonts/font.ttf", "kitchen.yaml", "secrets.yaml", "sensors.yaml"], names)
+        target = pathlib.Path(self.temp_dir.name) / "extracted"
+        server.extract_worker_bundle(bundle, str(target))
+        self.assertEqual(b"TTF", (target / "fonts" / "font.ttf").read_bytes())
+
+    def test_extract_rejects_paths_outside_workspace(self):
+        buffer = server.io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("../escape.yaml", "x")
+
+        with self.assertRaises(ValueError):
+            server.extract_worker_bundle(buffer.getvalue(), os.path.join(self.temp_dir.name, "out"))
+
+    def test_pool_acquires_least_loaded_healthy_worker(self):
+        pool = server.BuildWorkerPool()
+        for url, healthy, load in (("http://a", True, 2), ("http://b", True, 0), ("http://c", False, 0)):
+            pool.workers[url] = pool._entry(url, "", "", "env")
+            pool.workers[url].update({"healthy": healthy, "load": load})
+
+        self.assertEqual("http://b", pool.acquire())
+        self.assertEqual("http://b", pool.acquire())
+        self.assertEqual("http://a", pool.acquire())
+        pool.release("http://a", failed=True)
+        self.assertFalse(pool.workers["http://a"]["healthy"])
+        self.assertEqual(0, pool.workers["http://a"]["active"])
+
+    def test_remote_compile_streams_logs_and_fetches_firmware(self):
+        self.write_config()
+        test_client = server.app.test_client()
+        submitted = []
+
+        def route(worker_client, method, path, body=None, content_type="", timeout=None):
+            response = test_client.open(
+                path,
+                method=method,
+                data=body,
+                content_type=content_type or None,
+                headers={"X-ECD-Worker-Token": worker_client.token},
+            )
+            return response.status_code, response.data
+
+        def fake_submit(yaml_name, action, device, serial_port="", config_dir=""):
+            job = server.Job("remote-" + yaml_name, yaml_name, action, device, config_dir=config_dir)
+            firmware_dir = pathlib.Path(config_dir) / ".esphome" / "build" / "kitchen" / ".pioenvs" / "kitchen"
+            firmware_dir.mkdir(parents=True)
+            (firmware_dir / "firmware.bin").write_bytes(b"OTA-IMAGE")
+            job.push_log("INFO Successfully compiled program.")
+            job.state = "success"
+            job.exit_code = 0
+            server.job_manager.jobs[job.id] = job
+            submitted.append(job)
+            return job
+
+        manager = object.__new__(server.JobManager)
+        job = server.Job("local-job", "kitchen.yaml", "compile", "")
+        os.makedirs(server.JOB_DIR, exist_ok=True)
+        client = server.RemoteWorkerClient("http://worker", "secret")
+        with patch.object(server.RemoteWorkerClient, "request", route), patch.object(
+            server.job_manager, "submit", fake_submit
+        ), patch.object(server.worker_pool, "client", return_value=client):
+            exit_code, firmware_path = manager._run_remote_compile(job, "http://worker")
+
+        self.assertEqual(0, exit_code)
+        self.assertEqual(b"OTA-IMAGE", pathlib.Path(firmware_path).read_bytes())
+        self.assertIn("INFO Successfully compiled program.", job.get_recent_lines())
+        workspace = server.worker_node_workspace("kitchen.yaml")
+        self.assertEqual(workspace, submitted[0].config_dir)
+        self.assertEqual([".esphome"], os.listdir(workspace))
+        self.assertEqual(workspace, server.Job.from_dict(submitted[0].to_dict()).config_dir)
+        server.job_manager.jobs.pop(submitted[0].id, None)
+
+    def test_prune_removes_idle_and_orphaned_workspaces(self):
+        root = pathlib.Path(server.WORKER_WORKSPACE_ROOT)
+        for name in ("node-idle", "node-recent", "node-active", "orphan", "fresh"):
+            (root / name).mkdir(parents=True)
+        now = server.time.time()
+        old = now - server.WORKER_WORKSPACE_TTL - 60
+        for name in ("node-idle", "node-active"):
+            os.utime(root / name, (old, old))
+        stale = now - server.WORKER_WORKSPACE_ORPHAN_TTL - 60
+        os.utime(root / "orphan", (stale, stale))
+        os.utime(root / "node-recent", (stale, stale))
+
+        removed = server.prune_worker_workspaces({str(root / "node-active")}, now)
+
+        self.assertEqual(["node-idle", "orphan"], sorted(removed))
+        self.assertEqual(["fresh", "node-active", "node-recent"], sorted(os.listdir(root)))
+
+    def test_worker_endpoints_require_token(self):
+        response = server.app.test_client().get("/api/worker/health", headers={"X-ECD-Worker-Token": "wrong"})
+
+        self.assertEqual(403, response.status_code)
+
+        server.ECD_WORKER_TOKEN = ""
+        response = server.app.test_client().get("/api/worker/health", headers={"X-Ingress-Path": "/test"})
+
+        self.assertEqual(403, response.status_code)
+        self.assertIn("ECD_WORKER_TOKEN", response.json["message"])
+
+    def test_workers_without_token_are_refused(self):
+        response = server.app.test_client().post(
+            "/api/workers", json={"url": "http://worker:8099"}, headers={"X-Ingress-Path": "/test"}
+        )
+        self.assertEqual(400, response.status_code)
+
+        pool = server.BuildWorkerPool()
+        pool.workers["http://worker:8099"] = pool._entry("http://worker:8099", "", "", "env")
+        with patch.object(server.RemoteWorkerClient, "request", side_effect=AssertionError("dispatched without token")):
+            pool.check("http://worker:8099")
+
+        self.assertFalse(pool.workers["http://worker:8099"]["healthy"])
+        self.assertIn("no worker token", pool.workers["http://worker:8099"]["last_error"])
+        self.assertIsNone(pool.acquire())
+
+
+class ArtifactStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.original = (server.artifact_store, server.ESPHOME_VERSION_CACHE.get(server.ESPHOME_BIN))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.temp_dir.name)
+        self.store = server.ArtifactStore(str(self.root / "artifacts"), 2, 0)
+        server.artifact_store = self.store
+        server.ESPHOME_VERSION_CACHE[server.ESPHOME_BIN] = "2025.1.0"
+
+    def tearDown(self):
+        server.artifact_store, version = self.original
+        if version is None:
+            server.ESPHOME_VERSION_CACHE.pop(server.ESPHOME_BIN, None)
+        else:
+            server.ESPHOME_VERSION_CACHE[server.ESPHOME_BIN] = version
+        self.temp_dir.cleanup()
+
+    def build(self, content):
+        image = self.root / "firmware.bin"
+        image.write_bytes(content)
+        yaml_path = self.root / "kitchen.yaml"
+        yaml_path.write_text("esp32:\n  board: esp32dev\n", encoding="utf-8")
+        return self.store.register("kitchen", {"ota": str(image), "factory": ""}, str(yaml_path))
+
+    def test_register_indexes_versions_and_applies_retention(self):
+        first = self.build(b"one")
+        self.assertEqual(first["id"], self.build(b"one")["id"])
+        self.build(b"two")
+        latest = self.build(b"three")
+
+        versions = self.store.versions("kitchen")
+        self.assertEqual([latest["id"]], [versions[0]["id"]])
+        self.assertEqual(2, len(versions))
+        self.assertFalse((self.root / "artifacts" / "kitchen" / first["id"]).exists())
+        self.assertEqual("2025.1.0", latest["esphome_version"])
+        self.assertEqual(server.hashlib.sha256(b"three").hexdigest(), latest["files"]["ota"]["sha256"])
+        path, info = self.store.lookup("kitchen", "ota", versions[1]["id"])
+        self.assertEqual(b"two", pathlib.Path(path).read_bytes())
+        self.assertEqual(("", None), self.store.lookup("kitchen", "factory"))
+
+    def test_firmware_download_supports_etag_and_range(self):
+        entry = self.build(b"0123456789")
+        client = server.app.test_client()
+        ingress = {"X-Ingress-Path": "/test"}
+
+        response = client.get("/api/firmware?yaml=kitchen.yaml", headers=ingress)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(entry["id"], response.headers["X-Firmware-Version"])
+        etag = response.headers["ETag"]
+        self.assertIn(entry["files"]["ota"]["sha256"], etag)
+
+        cached = client.get("/api/firmware?yaml=kitchen.yaml", headers={**ingress, "If-None-Match": etag})
+        self.assertEqual(304, cached.status_code)
+        partial = client.get("/api/firmware?yaml=kitchen.yaml", headers={**ingress, "Range": "bytes=2-4"})
+        self.assertEqual(206, partial.status_code)
+        self.assertEqual(b"234", partial.data)
+
+    def test_ota_job_stores_artifact_even_when_upload_fails(self):
+        build_root = self.root / "build"
+        env_dir = build_root / "kitchen" / ".pioenvs" / "kitchen"
+        env_dir.mkdir(parents=True)
+        (env_dir / "firmware.bin").write_bytes(b"NEW-IMAGE")
+        (self.root / "kitchen.yaml").write_text("esp32:\n  board: esp32dev\n", encoding="utf-8")
+        manager = object.__new__(server.JobManager)
+        job = server.Job("ota-upload-fails", "kitchen.yaml", "ota", "192.168.1.20")
+        manager._compile = lambda current_job, yaml_path: (0, "")
+        manager._run_esphome = lambda current_job, args: 2 if args[0] == "upload" else 0
+        with patch.object(server, "TARGET_DIR", str(self.root)), patch.object(
+            server, "JOB_DIR", str(self.root / "jobs")
+        ), patch.object(server, "ESPHOME_BUILD_PATH", str(build_root)), patch.object(
+            server, "BUILD_HISTORY_PATH", str(self.root / "history.json")
+        ), patch.object(server.build_gc, "trigger") as trigger_gc:
+            manager._run_job(job)
+
+        self.assertEqual("failed", job.state)
+        trigger_gc.assert_called_once_with()
+        latest = self.store.latest("kitchen")
+        self.assertEqual(latest["id"], job.result["artifact"])
+        self.assertEqual(server.hashlib.sha256(b"NEW-IMAGE").hexdigest(), latest["files"]["ota"]["sha256"])
+        self.assertIsNone(self.store.deployment("kitchen"))
+
+    def test_firmware_download_prefers_newer_build_tree_image(self):
+        build_root = self.root / "build"
+        env_dir = build_root / "kitchen" / ".pioenvs" / "kitchen"
+        env_dir.mkdir(parents=True)
+        image = env_dir / "firmware.bin"
+        image.write_bytes(b"stored")
+        entry = self.store.register("kitchen", {"ota": str(image)})
+        client = server.app.test_client()
+        ingress = {"X-Ingress-Path": "/test"}
+
+        with patch.object(server, "find_firmware_path", side_effect=AssertionError("build roots probed")):
+            self.assertEqual(b"stored", client.get("/api/firmware?yaml=kitchen.yaml", headers=ingress).data)
+
+        image.write_bytes(b"outside-build")
+        later = os.stat(image).st_mtime + 10
+        os.utime(image, (later, later))
+        with patch.object(server, "find_firmware_path", side_effect=AssertionError("build roots probed")):
+            latest = client.get("/api/firmware?yaml=kitchen.yaml", headers=ingress)
+            pinned = client.get(f"/api/firmware?yaml=kitchen.yaml&version={entry['id']}", headers=ingress)
+
+        self.assertEqual(b"outside-build", latest.data)
+        self.assertNotIn("X-Firmware-Version", latest.headers)
+        self.assertEqual(b"stored", pinned.data)
+
+if __name__ == "__main__":
+    unittest.main()
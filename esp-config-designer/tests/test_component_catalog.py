@@ -1,6 +1,8 @@
+import gzip
 import importlib.util
 import io
 import json
+import os
 import pathlib
 import sys
 import tempfile
@@ -8,6 +10,7 @@ import types
 import unittest
 import zipfile
 from base64 import b64encode
+from unittest.mock import patch
 
 
 SERVER_PATH = pathlib.Path(__file__).resolve().parents[1] / "server.py"
@@ -101,7 +104,7 @@ class ComponentCatalogTests(unittest.TestCase):
         self.assertFalse(items["sensor/homeassistant/sensor"]["available"])
         self.assertEqual(2, len(items))
 
-    def test_remove_catalog_item_by_key_keeps_sibling_variants(self):
+    def test_catalog_remove_key_keeps_sibling_variants(self):
         catalog = catalog_with_items(
             [
                 component_entry(
@@ -117,8 +120,9 @@ class ComponentCatalogTests(unittest.TestCase):
             ]
         )
 
-        removed = server.remove_catalog_item_all_by_key(catalog, "sensor/ltr501/ltr301")
-        items = server.extract_catalog_items(catalog)
+        index = server.ComponentCatalog(catalog)
+        removed = index.remove_key("sensor/ltr501/ltr301")
+        items = index.items()
 
         self.assertEqual(1, removed)
         self.assertEqual(["sensor/ltr501/ltr501"], [server.component_catalog_entry_key(item) for item in items])
@@ -245,6 +249,186 @@ class ComponentCatalogTests(unittest.TestCase):
             server.TARGET_DIR = original_target_dir
             server.COMPONENTS_BASE_LIST_PATH = original_base_list_path
 
+    def test_import_zip_stages_valid_schemas_verbatim_and_skips_invalid_ones(self):
+        zip_catalog = catalog_with_items(
+            [
+                component_entry("Good Sensor", "sensor/good"),
+                component_entry("Scalar Sensor", "sensor/scalar"),
+                component_entry("Broken Sensor", "sensor/broken"),
+            ]
+        )
+        good_schema = '{"id": "sensor.good", "fields": []}'
+        padding = json.dumps({"id": "custom.large", "fields": [{"key": f"field_{index}"} for index in range(50000)]})
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr("components_list.json", json.dumps(zip_catalog))
+            archive.writestr("schemas/components/sensor/good.json", good_schema)
+            archive.writestr("schemas/components/sensor/scalar.json", "42")
+            archive.writestr("schemas/components/sensor/broken.json", "{not json")
+            archive.writestr("schemas/components/custom/large.json", padding)
+        self.assertGreater(buffer.tell(), server.COMPONENTS_IMPORT_SPOOL_BYTES)
+        buffer.seek(0)
+
+        original_target_dir = server.TARGET_DIR
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                server.TARGET_DIR = temp_dir
+                response = server.app.test_client().post(
+                    "/api/components/import-zip",
+                    data={"file": (buffer, "components.zip")},
+                    content_type="multipart/form-data",
+                    headers={"X-Ingress-Path": "/test"},
+                )
+
+                self.assertEqual(200, response.status_code, response.get_data(as_text=True))
+                summary = response.json["summary"]
+                self.assertEqual((1, 0, 2), (summary["imported"], summary["updated"], summary["skipped"]))
+                self.assertEqual(
+                    [
+                        "Invalid schema JSON for sensor/scalar: schemas/components/sensor/scalar.json",
+                        "Invalid schema JSON for sensor/broken: schemas/components/sensor/broken.json",
+                    ],
+                    summary["errors"],
+                )
+                runtime_root = pathlib.Path(server.components_runtime_root())
+                self.assertEqual(good_schema, (runtime_root / "schemas/components/sensor/good.json").read_text(encoding="utf-8"))
+                self.assertEqual([], os.listdir(server.components_runtime_staging_root()))
+        finally:
+            server.TARGET_DIR = original_target_dir
+
+    def test_runtime_catalog_save_replaces_file_atomically(self):
+        original_target_dir = server.TARGET_DIR
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                server.TARGET_DIR = temp_dir
+                server.save_runtime_components_catalog(catalog_with_items([component_entry("Old Sensor", "sensor/old")]))
+                list_path = server.components_runtime_list_path()
+                before = pathlib.Path(list_path).read_text(encoding="utf-8")
+
+                with patch.object(server.os, "replace", side_effect=OSError("disk full")):
+                    with self.assertRaises(OSError):
+                        server.save_runtime_components_catalog(catalog_with_items([component_entry("New Sensor", "sensor/new")]))
+
+                self.assertEqual(before, pathlib.Path(list_path).read_text(encoding="utf-8"))
+                self.assertEqual([server.COMPONENTS_RUNTIME_FILENAME], os.listdir(os.path.dirname(list_path)))
+        finally:
+            server.TARGET_DIR = original_target_dir
+
+    def test_startup_sweeps_import_staging_left_by_dead_imports(self):
+        original_target_dir = server.TARGET_DIR
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                server.TARGET_DIR = temp_dir
+                staging_root = pathlib.Path(server.components_runtime_staging_root())
+                (staging_root / ".import-abc" / "schemas").mkdir(parents=True)
+                (staging_root / "keep").mkdir()
+                legacy = pathlib.Path(server.components_runtime_root()) / ".import-def"
+                legacy.mkdir()
+
+                self.assertEqual([".import-abc", ".import-def"], sorted(server.prune_component_import_staging()))
+                self.assertEqual(["keep"], os.listdir(staging_root))
+                self.assertFalse(legacy.exists())
+        finally:
+            server.TARGET_DIR = original_target_dir
+
+    def test_import_zip_restores_schemas_when_catalog_write_fails(self):
+        zip_catalog = catalog_with_items([component_entry("Good Sensor", "sensor/good"), component_entry("New Sensor", "sensor/new")])
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("components_list.json", json.dumps(zip_catalog))
+            archive.writestr("schemas/components/sensor/good.json", '{"id": "sensor.good", "fields": [{"key": "new"}]}')
+            archive.writestr("schemas/components/sensor/new.json", '{"id": "sensor.new", "fields": []}')
+        buffer.seek(0)
+
+        original_target_dir = server.TARGET_DIR
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                server.TARGET_DIR = temp_dir
+                schemas_root = pathlib.Path(server.components_runtime_schemas_root())
+                (schemas_root / "sensor").mkdir(parents=True)
+                (schemas_root / "sensor" / "good.json").write_text('{"id": "sensor.good", "fields": []}', encoding="utf-8")
+
+                with patch.object(server, "save_runtime_components_catalog", side_effect=OSError("disk full")):
+                    response = server.app.test_client().post(
+                        "/api/components/import-zip",
+                        data={"file": (buffer, "components.zip")},
+                        content_type="multipart/form-data",
+                        headers={"X-Ingress-Path": "/test"},
+                    )
+
+                self.assertEqual(500, response.status_code)
+                self.assertEqual("COMPONENTS_IMPORT_FAILED", response.json["code"])
+                self.assertEqual('{"id": "sensor.good", "fields": []}', (schemas_root / "sensor" / "good.json").read_text(encoding="utf-8"))
+                self.assertFalse((schemas_root / "sensor" / "new.json").exists())
+                self.assertFalse(os.path.exists(server.components_runtime_list_path()))
+        finally:
+            server.TARGET_DIR = original_target_dir
+
+    def test_export_zip_streams_filtered_package_that_imports_back(self):
+        runtime_catalog = catalog_with_items([component_entry("Dht Sensor", "sensor/dht")])
+        runtime_catalog["categories"][0]["subcategories"] = [
+            {
+                "title": "Lights",
+                "slug": "lights",
+                "items": [component_entry("Strip Light", "light/strip"), component_entry("Bulb Light", "light/bulb")],
+                "subcategories": [],
+            }
+        ]
+        schemas = {
+            "sensor/dht": {"id": "sensor.dht", "fields": []},
+            "light/strip": {"id": "light.strip", "fields": [{"key": "pin"}]},
+        }
+        headers = {"X-Ingress-Path": "/test"}
+        original_target_dir = server.TARGET_DIR
+        try:
+            with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as target_dir:
+                server.TARGET_DIR = source_dir
+                runtime_root = pathlib.Path(server.components_runtime_root())
+                for component_id, schema in schemas.items():
+                    schema_path = runtime_root / "schemas" / "components" / f"{component_id}.json"
+                    schema_path.parent.mkdir(parents=True, exist_ok=True)
+                    schema_path.write_text(json.dumps(schema), encoding="utf-8")
+                server.save_runtime_components_catalog(runtime_catalog)
+                client = server.app.test_client()
+
+                response = client.get("/api/components/export-zip?category=lights", headers=headers)
+                self.assertEqual(200, response.status_code)
+                self.assertTrue(response.is_streamed)
+                self.assertEqual("application/zip", response.mimetype)
+                self.assertEqual("1", response.headers["X-Component-Count"])
+                package = response.get_data()
+                with zipfile.ZipFile(io.BytesIO(package)) as archive:
+                    self.assertEqual(["components_list.json", "schemas/components/light/strip.json"], archive.namelist())
+                    exported = json.loads(archive.read("components_list.json"))
+                    self.assertEqual(schemas["light/strip"], json.loads(archive.read("schemas/components/light/strip.json")))
+                self.assertEqual(["lights"], [node["slug"] for node in exported["categories"][0]["subcategories"]])
+                self.assertEqual([], exported["categories"][0]["items"])
+
+                by_id = client.get("/api/components/export-zip?id=sensor/dht,light/strip", headers=headers)
+                with zipfile.ZipFile(io.BytesIO(by_id.get_data())) as archive:
+                    self.assertEqual(
+                        ["components_list.json", "schemas/components/light/strip.json", "schemas/components/sensor/dht.json"],
+                        archive.namelist(),
+                    )
+
+                missing = client.get("/api/components/export-zip?id=sensor/unknown", headers=headers)
+                self.assertEqual(404, missing.status_code)
+                self.assertEqual("COMPONENTS_EXPORT_EMPTY", missing.json["code"])
+
+                server.TARGET_DIR = target_dir
+                imported = client.post(
+                    "/api/components/import-zip",
+                    data={"file": (io.BytesIO(package), "components.zip")},
+                    content_type="multipart/form-data",
+                    headers=headers,
+                )
+                self.assertEqual(200, imported.status_code, imported.get_data(as_text=True))
+                self.assertEqual(1, imported.json["summary"]["imported"])
+                items = server.extract_catalog_items(server.load_components_catalog(server.components_runtime_list_path()))
+                self.assertEqual(["light/strip"], [item["id"] for item in items])
+        finally:
+            server.TARGET_DIR = original_target_dir
+
     def test_import_zip_ignores_root_license_markdown(self):
         base_catalog = catalog_with_items([component_entry("Template Sensor", "sensor/template", available=False)])
         zip_catalog = catalog_with_items([component_entry("Template Sensor", "sensor/template", available=True)])
@@ -279,6 +463,685 @@ class ComponentCatalogTests(unittest.TestCase):
             server.COMPONENTS_BASE_LIST_PATH = original_base_list_path
 
 
+    def test_component_catalog_is_cached_with_etag_until_runtime_changes(self):
+        base_catalog = catalog_with_items([component_entry("Template Sensor", "sensor/template", available=False)])
+        original_target_dir = server.TARGET_DIR
+        original_base_list_path = server.COMPONENTS_BASE_LIST_PATH
+        original_changes = server.catalog_changes
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                base_path = pathlib.Path(temp_dir) / "base_components_list.json"
+                base_path.write_text(json.dumps(base_catalog), encoding="utf-8")
+                server.TARGET_DIR = temp_dir
+                server.COMPONENTS_BASE_LIST_PATH = str(base_path)
+                server.catalog_changes = server.ComponentChangeLog(str(pathlib.Path(temp_dir) / "revisions.json"), 100)
+
+                client = server.app.test_client()
+                headers = {"X-Ingress-Path": "/test"}
+                first = client.get("/api/component-catalog", headers=headers)
+                self.assertEqual(200, first.status_code)
+                etag = first.headers["ETag"]
+                self.assertFalse(etag.startswith("W/"))
+                items = server.extract_catalog_items(first.json["catalog"])
+                self.assertEqual([False], [item["available"] for item in items])
+
+                builds = server.merged_catalog_cache.stats["builds"]
+                cached = client.get("/api/component-catalog", headers={**headers, "If-None-Match": etag})
+                self.assertEqual(304, cached.status_code)
+                self.assertEqual(builds, server.merged_catalog_cache.stats["builds"])
+
+                server.save_runtime_components_catalog(
+                    catalog_with_items([component_entry("Template Sensor", "sensor/template", available=True)])
+                )
+                changed = client.get("/api/component-catalog", headers={**headers, "If-None-Match": etag})
+                self.assertEqual(200, changed.status_code)
+                self.assertNotEqual(etag, changed.headers["ETag"])
+                items = server.extract_catalog_items(changed.json["catalog"])
+                self.assertEqual([True], [item["available"] for item in items])
+                self.assertEqual("2", changed.headers["X-Catalog-Revision"])
+        finally:
+            server.TARGET_DIR = original_target_dir
+            server.COMPONENTS_BASE_LIST_PATH = original_base_list_path
+            server.catalog_changes = original_changes
+
+
+    def test_indexed_catalog_keeps_slots_valid_across_removals(self):
+        catalog = server.ComponentCatalog(
+            catalog_with_items(
+                [
+                    component_entry("First", "sensor/first"),
+                    component_entry("Second", "sensor/second"),
+                    component_entry("Third", "sensor/third"),
+                ]
+            )
+        )
+        chain = [{"slug": "test-components", "title": "Test Components"}]
+
+        self.assertEqual("sensor/first", catalog.remove("sensor/first")["id"])
+        self.assertEqual(1, catalog.remove_key("components/sensor/second"))
+        self.assertEqual("Third", catalog.get("sensor/third")["name"])
+        catalog.replace("sensor/third", component_entry("Third v2", "sensor/third"))
+        catalog.append(chain, component_entry("Fourth", "sensor/fourth"))
+        catalog.append([], component_entry("Mine", "custom/mine"))
+
+        self.assertTrue(catalog.dirty)
+        self.assertTrue(catalog.custom_name_taken("MINE"))
+        self.assertFalse(catalog.custom_name_taken("mine", exclude_id="custom/mine"))
+        self.assertEqual(["custom/mine", "sensor/third", "sensor/fourth"], [item["id"] for item in catalog.items()])
+        self.assertEqual("Third v2", catalog.get("sensor/third")["name"])
+        self.assertIsNone(catalog.get("sensor/second"))
+
+    def test_custom_component_crud_writes_runtime_catalog_once_per_request(self):
+        original_target_dir = server.TARGET_DIR
+        original_save = server.save_runtime_components_catalog
+        saves = []
+
+        def counting_save(payload):
+            saves.append(payload)
+            original_save(payload)
+
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                server.TARGET_DIR = temp_dir
+                server.save_runtime_components_catalog = counting_save
+                client = server.app.test_client()
+                headers = {"X-Ingress-Path": "/test"}
+
+                created = client.post("/api/custom-components", json={"name": "Relay Board"}, headers=headers)
+                self.assertEqual(200, created.status_code, created.get_data(as_text=True))
+                conflict = client.post("/api/custom-components", json={"name": "relay board", "key": "other"}, headers=headers)
+                self.assertEqual(409, conflict.status_code)
+                renamed = client.put("/api/custom-components/relay-board", json={"name": "Relay Bank"}, headers=headers)
+                self.assertEqual("custom/relay-bank", renamed.json["currentId"])
+                removed = client.delete("/api/custom-components/relay-bank", headers=headers)
+                self.assertEqual(200, removed.status_code)
+                missing = client.delete("/api/custom-components/relay-bank", headers=headers)
+                self.assertEqual(404, missing.status_code)
+
+                self.assertEqual(3, len(saves))
+                runtime_catalog = json.loads(pathlib.Path(server.components_runtime_list_path()).read_text(encoding="utf-8"))
+                self.assertEqual([], server.extract_catalog_items(runtime_catalog))
+        finally:
+            server.TARGET_DIR = original_target_dir
+            server.save_runtime_components_catalog = original_save
+
+
+class SchemaCompilerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        self.web_root = root / "web"
+        self.original_web_root = server.WEB_ROOT
+        self.original_target_dir = server.TARGET_DIR
+        self.original_compiler = server.schema_compiler
+        server.WEB_ROOT = str(self.web_root)
+        server.TARGET_DIR = str(root / "config")
+        server.schema_compiler = server.SchemaCompiler(str(root / "cache"))
+        self.write_schema(
+            "components/base_component/base_sensor.json",
+            {
+                "helpUrl": "https://esphome.io/components/sensor/",
+                "requirements": ["sensor"],
+                "fields": [
+                    {"key": "name", "type": "string"},
+                    {"key": "update_interval", "type": "duration"},
+                ],
+            },
+        )
+        self.write_schema("general/timezones.json", {"options": ["UTC", "Europe/Berlin"]})
+        self.write_schema(
+            "components/sensor/demo.json",
+            {
+                "id": "sensor.demo",
+                "extends": "base_sensor.json",
+                "fields": [
+                    {"key": "update_interval", "type": "duration", "default": "10s"},
+                    {"key": "zone", "type": "select", "optionsFrom": "general/timezones.json"},
+                    {"key": "on_value", "type": "list", "item": {"type": "object", "extends": "base_actions.json"}},
+                    {"key": "temperature", "type": "object", "extends": "base_sensor.json", "fields": []},
+                ],
+            },
+        )
+        self.client = server.app.test_client()
+        self.headers = {"X-Ingress-Path": "/test"}
+
+    def tearDown(self):
+        server.WEB_ROOT = self.original_web_root
+        server.TARGET_DIR = self.original_target_dir
+        server.schema_compiler = self.original_compiler
+        self.temp_dir.cleanup()
+
+    def write_schema(self, relpath, payload, root=None):
+        path = (root or self.web_root / "schemas") / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload), encoding="utf-8")
+        return path
+
+    def test_compiled_schema_merges_extends_and_inlines_options(self):
+        response = self.client.get("/api/component-schemas", headers=self.headers)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({}, response.json["errors"])
+        self.assertEqual(["components/sensor/demo.json"], list(response.json["schemas"]))
+        schema = response.json["schemas"]["components/sensor/demo.json"]
+        fields = {field["key"]: field for field in schema["fields"]}
+        self.assertEqual(["update_interval", "zone", "on_value", "temperature", "name"], list(fields))
+        self.assertEqual("10s", fields["update_interval"]["default"])
+        self.assertEqual(["UTC", "Europe/Berlin"], fields["zone"]["options"])
+        self.assertEqual([], fields["on_value"]["item"]["fields"])
+        self.assertEqual(["sensor"], fields["temperature"]["requirements"])
+        self.assertEqual("https://esphome.io/components/sensor/", fields["temperature"]["helpUrl"])
+        self.assertEqual(["name", "update_interval"], [field["key"] for field in fields["temperature"]["fields"]])
+
+        cached = self.client.get(
+            "/api/component-schemas", headers={**self.headers, "If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(304, cached.status_code)
+
+    def test_compiled_schema_cache_follows_source_hashes_and_runtime_overrides(self):
+        compiler = server.schema_compiler
+        compiler.compile("components/sensor/demo.json")
+        server.schema_compiler = server.SchemaCompiler(compiler.cache_dir)
+        server.schema_compiler.compile("components/sensor/demo.json")
+        self.assertEqual(1, server.schema_compiler.stats["disk_hits"])
+
+        self.write_schema("general/timezones.json", {"options": ["UTC", "Asia/Tokyo"]})
+        schema = server.schema_compiler.compile("components/sensor/demo.json")
+        self.assertEqual(1, server.schema_compiler.stats["compiled"])
+        self.assertEqual(["UTC", "Asia/Tokyo"], schema["fields"][1]["options"])
+
+        runtime_root = pathlib.Path(server.components_runtime_root()) / "schemas"
+        self.write_schema("components/sensor/demo.json", {"id": "sensor.demo", "fields": []}, root=runtime_root)
+        response = self.client.get(
+            "/api/component-schemas?path=components/sensor/demo.json&path=components/sensor/missing.json",
+            headers=self.headers,
+        )
+        self.assertEqual([], response.json["schemas"]["components/sensor/demo.json"]["fields"])
+        self.assertIn("components/sensor/missing.json", response.json["errors"])
+
+    def test_schema_bundle_returns_gzip_with_per_encoding_etag(self):
+        runtime_root = pathlib.Path(server.components_runtime_root()) / "schemas"
+        self.write_schema("components/custom/relay.json", {"id": "custom.relay", "fields": []}, root=runtime_root)
+        paths = ["components/sensor/demo.json", "schemas/components/custom/relay.json", "components/sensor/missing.json"]
+
+        response = self.client.post(
+            "/api/component-schemas/bundle",
+            json={"paths": paths},
+            headers={**self.headers, "Accept-Encoding": "gzip"},
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        payload = json.loads(gzip.decompress(response.data))
+        self.assertEqual(["components/sensor/demo.json", "components/custom/relay.json"], list(payload["schemas"]))
+        self.assertEqual("base_sensor.json", payload["schemas"]["components/sensor/demo.json"]["extends"])
+        self.assertEqual(["components/sensor/missing.json"], payload["missing"])
+
+        self.assertTrue(response.headers["ETag"].endswith('-gzip"'))
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+
+        with patch.object(server, "read_json_file", side_effect=AssertionError("body built for a 304")):
+            cached = self.client.post(
+                "/api/component-schemas/bundle",
+                json={"paths": paths},
+                headers={**self.headers, "Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]},
+            )
+        self.assertEqual(304, cached.status_code)
+
+        identity = self.client.post(
+            "/api/component-schemas/bundle",
+            json={"paths": paths},
+            headers={**self.headers, "If-None-Match": response.headers["ETag"]},
+        )
+        self.assertEqual(200, identity.status_code)
+        self.assertNotEqual(response.headers["ETag"], identity.headers["ETag"])
+
+        compiled = self.client.post(
+            "/api/component-schemas/bundle", json={"paths": paths[:1], "compiled": True}, headers=self.headers
+        )
+        self.assertNotIn("Content-Encoding", compiled.headers)
+        self.assertNotEqual(identity.headers["ETag"], compiled.headers["ETag"])
+
+        self.write_schema("general/timezones.json", {"options": ["UTC"]})
+        recompiled = self.client.post(
+            "/api/component-schemas/bundle",
+            json={"paths": paths[:1], "compiled": True},
+            headers={**self.headers, "If-None-Match": compiled.headers["ETag"]},
+        )
+        self.assertEqual(200, recompiled.status_code)
+        self.assertIn("name", [field["key"] for field in compiled.json["schemas"]["components/sensor/demo.json"]["fields"]])
+
+        invalid = self.client.post("/api/component-schemas/bundle", json={"paths": ["../secrets.json"]}, headers=self.headers)
+        self.assertEqual(400, invalid.status_code)
+
+
+class ComponentChangeLogTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        self.base_path = root / "web" / "components_list" / "components_list.json"
+        self.base_path.parent.mkdir(parents=True)
+        self.base_path.write_text(
+            json.dumps(
+                catalog_with_items(
+                    [
+                        component_entry("Template Sensor", "sensor/template", available=False),
+                        component_entry("DHT", "sensor/dht"),
+                    ]
+                )
+            ),
+            encoding="utf-8",
+        )
+        self.schema_path = root / "web" / "schemas" / "components" / "sensor" / "dht.json"
+        self.schema_path.parent.mkdir(parents=True)
+        self.schema_path.write_text(json.dumps({"id": "sensor.dht", "fields": []}), encoding="utf-8")
+        self.revisions_path = root / "revisions.json"
+        self.originals = {
+            name: getattr(server, name)
+            for name in (
+                "WEB_ROOT",
+                "TARGET_DIR",
+                "COMPONENTS_BASE_LIST_PATH",
+                "merged_catalog_cache",
+                "schema_compiler",
+                "catalog_changes",
+            )
+        }
+        server.WEB_ROOT = str(root / "web")
+        server.TARGET_DIR = str(root / "config")
+        server.COMPONENTS_BASE_LIST_PATH = str(self.base_path)
+        server.merged_catalog_cache = server.MergedCatalogCache()
+        server.schema_compiler = server.SchemaCompiler(str(root / "cache"))
+        server.catalog_changes = server.ComponentChangeLog(str(self.revisions_path), 100)
+        self.client = server.app.test_client()
+        self.headers = {"X-Ingress-Path": "/test"}
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(server, name, value)
+        self.temp_dir.cleanup()
+
+    def changes(self, since, epoch=""):
+        response = self.client.get(f"/api/component-catalog/changes?since={since}&epoch={epoch}", headers=self.headers)
+        self.assertEqual(200, response.status_code, response.get_data(as_text=True))
+        return response.json
+
+    def test_changes_report_only_entries_and_schemas_touched_since_revision(self):
+        initial = self.changes(0)
+        self.assertTrue(initial["reset"])
+        self.assertEqual(1, initial["revision"])
+        self.assertEqual(
+            ["components/sensor/dht", "components/sensor/template"], [item["key"] for item in initial["entries"]["added"]]
+        )
+        self.assertEqual(["components/sensor/dht.json"], [item["path"] for item in initial["schemas"]["added"]])
+
+        unchanged = self.changes(1, initial["epoch"])
+        self.assertFalse(unchanged["reset"])
+        self.assertEqual(1, unchanged["revision"])
+        self.assertEqual({"added": [], "updated": [], "removed": []}, unchanged["entries"])
+
+        created = self.client.post("/api/custom-components", json={"name": "Relay"}, headers=self.headers)
+        self.assertEqual(200, created.status_code)
+        server.save_runtime_components_catalog(
+            catalog_with_items(
+                [
+                    component_entry("Template Sensor", "sensor/template", available=True),
+                    component_entry("Relay", "custom/relay"),
+                ]
+            )
+        )
+        delta = self.changes(1, initial["epoch"])
+        self.assertEqual(2, delta["revision"])
+        self.assertEqual(["components/custom/relay"], [item["key"] for item in delta["entries"]["added"]])
+        self.assertEqual(["components/sensor/template"], [item["key"] for item in delta["entries"]["updated"]])
+        self.assertTrue(delta["entries"]["updated"][0]["placements"][0]["item"]["available"])
+        self.assertEqual(["components/custom/relay.json"], [item["path"] for item in delta["schemas"]["added"]])
+
+        self.schema_path.unlink()
+        removed = self.changes(2, initial["epoch"])
+        self.assertEqual(["components/sensor/dht.json"], removed["schemas"]["removed"])
+        self.assertEqual([], removed["entries"]["updated"])
+
+        server.catalog_changes = server.ComponentChangeLog(str(self.revisions_path), 100)
+        restarted = self.changes(3, initial["epoch"])
+        self.assertFalse(restarted["reset"])
+        self.assertEqual(3, restarted["revision"])
+        self.assertTrue(self.changes(3, "other-epoch")["reset"])
+
+
+    def test_sync_skips_rehashing_until_catalog_or_schema_tree_changes(self):
+        initial = self.changes(0)
+        self.assertEqual(200, self.client.get("/api/component-catalog", headers=self.headers).status_code)
+
+        with patch.object(server.schema_compiler, "source_digest", side_effect=AssertionError("schemas rehashed")), patch.object(
+            server, "catalog_entry_placements", side_effect=AssertionError("catalog rehashed")
+        ):
+            self.assertEqual(200, self.client.get("/api/component-catalog", headers=self.headers).status_code)
+            self.assertEqual(1, self.changes(1, initial["epoch"])["revision"])
+
+        self.schema_path.write_text(json.dumps({"id": "sensor.dht", "fields": [{"key": "pin"}]}), encoding="utf-8")
+        self.assertEqual(1, self.changes(1, initial["epoch"])["revision"])
+        with patch.object(server, "CATALOG_REVISIONS_RESCAN", 0.0):
+            edited = self.changes(1, initial["epoch"])
+        self.assertEqual(2, edited["revision"])
+        self.assertEqual(["components/sensor/dht.json"], [item["path"] for item in edited["schemas"]["updated"]])
+
+class SearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        web_root = root / "web"
+        files = {
+            "components_list/components_list.json": catalog_with_items(
+                [component_entry("DHT Temperature", "sensor/dht"), component_entry("Template Sensor", "sensor/template")]
+            ),
+            "action_list/base_actions.json": {
+                "actions": [{"id": "switch.toggle", "label": "Switch Toggle", "description": "Toggle a switch."}]
+            },
+            "condition_list/base_conditions.json": {
+                "conditions": [{"id": "and", "label": "All (AND)", "description": "All nested conditions must pass."}]
+            },
+            "schemas/components/sensor/dht.json": {
+                "id": "sensor.dht",
+                "fields": [
+                    {"key": "update_interval", "type": "duration"},
+                    {"key": "temperature", "type": "object", "fields": [{"key": "accuracy_decimals", "type": "number"}]},
+                ],
+            },
+        }
+        for relpath, payload in files.items():
+            path = web_root / relpath
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(payload), encoding="utf-8")
+        self.originals = {
+            name: getattr(server, name)
+            for name in ("WEB_ROOT", "TARGET_DIR", "COMPONENTS_BASE_LIST_PATH", "merged_catalog_cache", "schema_compiler", "search_index")
+        }
+        server.WEB_ROOT = str(web_root)
+        server.TARGET_DIR = str(root / "config")
+        server.COMPONENTS_BASE_LIST_PATH = str(web_root / "components_list" / "components_list.json")
+        server.merged_catalog_cache = server.MergedCatalogCache()
+        server.schema_compiler = server.SchemaCompiler(str(root / "cache"))
+        server.search_index = server.SearchIndex()
+        self.client = server.app.test_client()
+        self.headers = {"X-Ingress-Path": "/test"}
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(server, name, value)
+        self.temp_dir.cleanup()
+
+    def search(self, query):
+        response = self.client.get(f"/api/search?{query}", headers=self.headers)
+        self.assertEqual(200, response.status_code, response.get_data(as_text=True))
+        return [(item["type"], item["id"]) for item in response.json["results"]]
+
+    def test_search_ranks_prefix_matches_across_sources(self):
+        self.assertEqual(
+            [("component", "sensor/template"), ("component", "sensor/dht"), ("field", "temperature")],
+            self.search("q=temp")[:3],
+        )
+        self.assertEqual([("field", "update_interval")], self.search("q=dht+update"))
+        self.assertEqual([("field", "temperature.accuracy_decimals")], self.search("q=accuracy+dec"))
+        self.assertEqual([("action", "switch.toggle")], self.search("q=toggle"))
+        self.assertEqual([("condition", "and")], self.search("q=nested&type=condition"))
+        self.assertEqual([("field", "update_interval")], self.search("q=update_int&type=field"))
+        self.assertEqual(400, self.client.get("/api/search?q=x&type=widget", headers=self.headers).status_code)
+
+    def test_search_follows_catalog_and_schema_mutations(self):
+        self.assertEqual([], self.search("q=relay"))
+        created = self.client.post("/api/custom-components", json={"name": "Relay Board"}, headers=self.headers)
+        self.assertEqual(200, created.status_code)
+        self.assertEqual([("component", "custom/relay-board")], self.search("q=relay&type=component"))
+        self.assertIn(("field", "custom_config"), self.search("q=custom_config&type=field"))
+
+        self.client.delete("/api/custom-components/relay-board", headers=self.headers)
+        self.assertEqual([], self.search("q=relay"))
+
+    def test_search_rescans_schema_files_edited_in_place_after_interval(self):
+        self.assertEqual([("field", "update_interval")], self.search("q=update_int&type=field"))
+        schema_path = pathlib.Path(server.WEB_ROOT) / "schemas" / "components" / "sensor" / "dht.json"
+        schema_path.write_text(json.dumps({"id": "sensor.dht", "fields": [{"key": "poll_period", "type": "duration"}]}), encoding="utf-8")
+
+        with patch.object(server.schema_compiler, "schema_paths", side_effect=AssertionError("schema tree rescanned")):
+            self.assertEqual([], self.search("q=poll&type=field"))
+        with patch.object(server, "SEARCH_INDEX_RESCAN", 0.0):
+            self.assertEqual([("field", "poll_period")], self.search("q=poll&type=field"))
+        self.assertEqual([], self.search("q=update_int&type=field"))
+
+    def test_search_rescans_schema_files_after_catalog_write(self):
+        self.assertEqual([("field", "update_interval")], self.search("q=update_int&type=field"))
+        schema_path = pathlib.Path(server.WEB_ROOT) / "schemas" / "components" / "sensor" / "dht.json"
+        schema_path.write_text(json.dumps({"id": "sensor.dht", "fields": [{"key": "poll_period", "type": "duration"}]}), encoding="utf-8")
+
+        server.merged_catalog_cache.invalidate()
+
+        self.assertEqual([("field", "poll_period")], self.search("q=poll&type=field"))
+
+
+class ProjectValidatorTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        web_root = root / "web"
+        files = {
+            "components_list/components_list.json": catalog_with_items([component_entry("DHT", "sensor/dht")]),
+            "schemas/components/base_component/base_sensor.json": {
+                "fields": [
+                    {"key": "name", "type": "text", "required": True},
+                    {"key": "accuracy_decimals", "type": "number", "required": False},
+                ]
+            },
+            "schemas/components/sensor/dht.json": {
+                "id": "sensor.dht",
+                "fields": [
+                    {"key": "pin", "type": "gpio", "required": True},
+                    {"key": "model", "type": "select", "required": False, "default": "AUTO_DETECT", "options": ["AUTO_DETECT", "DHT22"]},
+                    {"key": "update_interval", "type": "duration", "required": False},
+                    {"key": "id", "type": "id", "required": False},
+                    {"key": "temperature", "type": "object", "required": False, "extends": "base_sensor.json", "fields": []},
+                    {"key": "use_filters", "type": "boolean", "required": False},
+                    {
+                        "key": "filters",
+                        "type": "list",
+                        "required": False,
+                        "dependsOn": {"key": "use_filters", "value": True},
+                        "item": {"type": "object", "fields": [{"key": "multiply", "type": "number", "required": True}]},
+                    },
+                ],
+            },
+        }
+        for relpath, payload in files.items():
+            path = web_root / relpath
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(payload), encoding="utf-8")
+        self.originals = {
+            name: getattr(server, name)
+            for name in (
+                "WEB_ROOT",
+                "TARGET_DIR",
+                "PROJECT_DIR",
+                "COMPONENTS_BASE_LIST_PATH",
+                "merged_catalog_cache",
+                "schema_compiler",
+                "project_validator",
+            )
+        }
+        server.WEB_ROOT = str(web_root)
+        server.TARGET_DIR = str(root / "config")
+        server.PROJECT_DIR = str(root / "projects")
+        server.COMPONENTS_BASE_LIST_PATH = str(web_root / "components_list" / "components_list.json")
+        server.merged_catalog_cache = server.MergedCatalogCache()
+        server.schema_compiler = server.SchemaCompiler(str(root / "cache"))
+        server.project_validator = server.ProjectValidator(8)
+        self.client = server.app.test_client()
+        self.headers = {"X-Ingress-Path": "/test"}
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(server, name, value)
+        self.temp_dir.cleanup()
+
+    def test_validate_reports_field_errors_against_compiled_schema(self):
+        project = {
+            "components": [
+                {
+                    "id": "sensor/dht",
+                    "config": {
+                        "model": "DHT99",
+                        "update_interval": "soon",
+                        "id": "2nd sensor",
+                        "temperature": {"name": "Temperature", "accuracy_decimals": "two"},
+                        "filters": [{"multiply": "x"}],
+                    },
+                },
+                {"id": "sensor/unknown", "config": {}},
+            ]
+        }
+        response = self.client.post("/api/projects/validate", json={"name": "kitchen", "project": project}, headers=self.headers)
+
+        self.assertEqual(200, response.status_code, response.get_data(as_text=True))
+        self.assertFalse(response.json["valid"])
+        result = response.json["results"][0]
+        self.assertEqual("kitchen", result["name"])
+        self.assertEqual(
+            [
+                ("sensor/dht", "pin", "Required field is missing"),
+                ("sensor/dht", "model", "Must be one of: AUTO_DETECT, DHT22"),
+                ("sensor/dht", "update_interval", "Invalid duration"),
+                ("sensor/dht", "id", "Invalid ID"),
+                ("sensor/dht", "temperature/accuracy_decimals", "Must be a number"),
+                ("sensor/unknown", "", "Unknown component"),
+            ],
+            [(error["component"], error["path"], error["message"]) for error in result["errors"]],
+        )
+
+    def test_validate_batch_reuses_validators_and_reads_stored_projects(self):
+        valid = {
+            "components": [
+                {
+                    "id": "sensor/dht",
+                    "config": {
+                        "pin": "GPIO4",
+                        "update_interval": "${interval}",
+                        "use_filters": True,
+                        "filters": [{"multiply": 1.8}],
+                        "temperature": {"name": "!secret temp_name"},
+                    },
+                }
+            ]
+        }
+        project_dir = pathlib.Path(server.PROJECT_DIR)
+        project_dir.mkdir(parents=True)
+        (project_dir / "stored.json").write_text(json.dumps(valid), encoding="utf-8")
+        invalid = {"components": [{"id": "sensor/dht", "config": {"pin": "GPIO4", "use_filters": True, "filters": [{}]}}]}
+
+        response = self.client.post(
+            "/api/projects/validate",
+            json={"projects": [{"name": "inline", "data": valid}, invalid], "names": ["stored", "missing"]},
+            headers=self.headers,
+        )
+
+        self.assertEqual(200, response.status_code, response.get_data(as_text=True))
+        results = {item["name"]: item for item in response.json["results"]}
+        self.assertEqual(["inline", "1", "stored.json", "missing.json"], list(results))
+        self.assertTrue(results["inline"]["valid"])
+        self.assertTrue(results["stored.json"]["valid"])
+        self.assertEqual(["filters/0/multiply"], [error["path"] for error in results["1"]["errors"]])
+        self.assertEqual("Project not found or invalid JSON", results["missing.json"]["errors"][0]["message"])
+        metrics = server.project_validator.metrics()
+        self.assertEqual((1, 1), (metrics["compiled"], metrics["validators"]))
+        self.assertEqual(400, self.client.post("/api/projects/validate", json={}, headers=self.headers).status_code)
+        self.assertEqual(400, self.client.post("/api/projects/validate", json=[1, 2], headers=self.headers).status_code)
+
+    def test_field_visibility_follows_builder_rules(self):
+        fields = [
+            {"key": "mode", "type": "select", "default": "auto"},
+            {"key": "enabled", "type": "boolean", "templatable": True},
+        ]
+        visible = server.project_field_visible
+
+        self.assertFalse(visible({"key": "secret", "hidden": True}, {}, fields))
+        self.assertTrue(visible({"key": "speed", "dependsOn": {"key": "mode", "value": "auto"}}, {}, fields))
+        self.assertFalse(visible({"key": "speed", "dependsOn": {"key": "mode", "value": "auto"}}, {"mode": None}, fields))
+        self.assertTrue(visible({"key": "speed", "dependsOn": {"key": "mode", "value": None}}, {"mode": None}, fields))
+        templated = {"enabled": {"__templatable": True, "mode": "literal", "value": True}}
+        self.assertTrue(visible({"key": "delay", "dependsOn": {"key": "enabled", "value": True}}, templated, fields))
+        self.assertFalse(visible({"key": "delay", "dependsOn": {"key": "enabled", "value": True}}, {"enabled": 1}, fields))
+        self.assertTrue(visible({"key": "delay", "dependsOn": {"key": "enabled"}}, {"enabled": []}, fields))
+
+        registry = {}
+        bus_fields = [{"key": "bus", "type": "object", "fields": [{"key": "kind", "set_global": "bus_kind"}]}]
+        server.collect_project_globals({"bus": {"kind": "spi"}}, bus_fields, registry)
+        self.assertEqual({"bus_kind": "spi"}, registry)
+        spi_only = {"key": "cs_pin", "globalDependsOn": {"key": "bus_kind", "value": "spi"}}
+        self.assertTrue(visible(spi_only, {}, fields, registry))
+        self.assertFalse(visible(spi_only, {}, fields, {"bus_kind": "i2c"}))
+        self.assertTrue(visible(spi_only, {}, fields, {}))
+
+    def test_validate_accepts_string_component_entries(self):
+        response = self.client.post(
+            "/api/projects/validate", json={"project": {"components": ["sensor/dht"]}}, headers=self.headers
+        )
+
+        errors = response.json["results"][0]["errors"]
+        self.assertEqual(
+            [("sensor/dht", "pin", "Required field is missing")],
+            [(error["component"], error["path"], error["message"]) for error in errors],
+        )
+
+
+class StaticAssetCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.temp_dir.name)
+        self.web_root = root / "web"
+        (self.web_root / "gpio").mkdir(parents=True)
+        self.map_path = self.web_root / "gpio" / "gpio-map.json"
+        self.map_path.write_text(json.dumps({"pins": [f"GPIO{index}" for index in range(200)]}), encoding="utf-8")
+        (self.web_root / "tiny.json").write_text("{}", encoding="utf-8")
+        self.original_web_root = server.WEB_ROOT
+        self.original_assets = server.static_assets
+        server.WEB_ROOT = str(self.web_root)
+        server.static_assets = server.StaticAssetCache(str(root / "cache"))
+        self.client = server.app.test_client()
+
+    def tearDown(self):
+        server.WEB_ROOT = self.original_web_root
+        server.static_assets = self.original_assets
+        self.temp_dir.cleanup()
+
+    def test_precompressed_json_is_served_by_accept_encoding_and_hashed_url(self):
+        report = server.static_assets.build()
+        self.assertEqual(2, report["files"])
+        hashed = server.static_assets.manifest()["gpio/gpio-map.json"]
+        self.assertTrue(hashed.startswith("h/") and hashed.endswith("/gpio/gpio-map.json"))
+
+        compressed = self.client.get("/gpio/gpio-map.json", headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual("gzip", compressed.headers["Content-Encoding"])
+        self.assertEqual("no-cache", compressed.headers["Cache-Control"])
+        self.assertEqual(self.map_path.read_bytes(), gzip.decompress(compressed.data))
+        revalidated = self.client.get(
+            "/gpio/gpio-map.json",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]},
+        )
+        self.assertEqual(304, revalidated.status_code)
+
+        plain = self.client.get("/tiny.json", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+
+        immutable = self.client.get(f"/{hashed}")
+        self.assertEqual(server.STATIC_IMMUTABLE_CACHE_CONTROL, immutable.headers["Cache-Control"])
+        self.assertEqual(self.map_path.read_bytes(), immutable.data)
+        stale = self.client.get("/h/0000000000000000/gpio/gpio-map.json")
+        self.assertEqual("no-cache", stale.headers["Cache-Control"])
+
+        self.map_path.write_text(json.dumps({"pins": []}), encoding="utf-8")
+        changed = self.client.get("/gpio/gpio-map.json", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", changed.headers)
+        self.assertEqual({"pins": []}, changed.json)
+
+
 class RuntimeAccessTests(unittest.TestCase):
     def setUp(self):
         self.original_mode = getattr(server, "ECD_MODE", "addon")
@@ -0,0 +1,757 @@
+import importlib.util
+import json
+import os
+import pathlib
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from unittest.mock import patch
+
+
+SERVER_PATH = pathlib.Path(__file__).resolve().parents[1] / "server.py"
+sys.modules.setdefault("pty", types.SimpleNamespace(openpty=lambda: (_ for _ in ()).throw(NotImplementedError())))
+SPEC = importlib.util.spec_from_file_location("ecd_server_devices", SERVER_PATH)
+server = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(server)
+
+INGRESS = {"X-Ingress-Path": "/test"}
+
+
+class DeviceStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.original_devices_path = server.DEVICES_PATH
+        self.original_history_root = server.device_history.root
+        self.temp_dir = tempfile.TemporaryDirectory()
+        server.DEVICES_PATH = os.path.join(self.temp_dir.name, "devices.json")
+        server.device_history.root = os.path.join(self.temp_dir.name, "history")
+        self.client = server.app.test_client()
+
+    def tearDown(self):
+        server.DEVICES_PATH = self.original_devices_path
+        server.device_history.root = self.original_history_root
+        self.temp_dir.cleanup()
+
+    def write_devices(self, names, status="offline"):
+        devices = [
+            {"device_key": name, "name": name, "yaml": f"{name}.yaml", "host": f"{name}.local", "status": status}
+            for name in names
+        ]
+        server.save_devices(devices)
+        return devices
+
+
+class ConcurrentProbeTests(DeviceStatusTestCase):
+    def test_refresh_probes_devices_concurrently(self):
+        names = [f"node{index}" for index in range(20)]
+        self.write_devices(names)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_probe(host, deep=False, mdns_probe=None):
+            with lock:
+                active.append(host)
+                peak.append(len(active))
+            time.sleep(0.2)
+            with lock:
+                active.remove(host)
+            return host != "node3.local", True, False, False, "dns"
+
+        started = time.monotonic()
+        with patch.object(server, "evaluate_device_connectivity", side_effect=slow_probe):
+            response = self.client.get("/api/devices/list?refresh=1", headers=INGRESS)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 2.0)
+        self.assertGreater(max(peak), 1)
+        devices = {item["name"]: item for item in response.get_json()["devices"]}
+        self.assertEqual("offline", devices["node3"]["status"])
+        self.assertEqual("online", devices["node4"]["status"])
+        self.assertEqual("online", server.load_devices()[0]["status"])
+
+    def test_probe_deadline_keeps_previous_status(self):
+        self.write_devices(["fast", "stuck"], status="online")
+        release = threading.Event()
+
+        def probe(host, deep=False, mdns_probe=None):
+            if host == "stuck.local":
+                release.wait(2)
+            return False, False, False, False, "unknown"
+
+        try:
+            with patch.object(server, "evaluate_device_connectivity", side_effect=probe), patch.object(
+                server, "STATUS_PROBE_DEADLINE", 0.2
+            ):
+                response = self.client.get("/api/devices/list?refresh=1", headers=INGRESS)
+        finally:
+            release.set()
+
+        devices = {item["name"]: item for item in response.get_json()["devices"]}
+        self.assertEqual("offline", devices["fast"]["status"])
+        self.assertEqual("online", devices["stuck"]["status"])
+        self.assertTrue(devices["stuck"]["probe_timed_out"])
+
+    def test_abandoned_probe_keeps_mdns_probe_open_until_it_finishes(self):
+        release = threading.Event()
+        seen = []
+
+        def probe(host, deep=False, mdns_probe=None):
+            seen.append(mdns_probe)
+            if host == "stuck.local":
+                release.wait(2)
+            return not mdns_probe.closed, False, False, False, "mdns"
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=probe):
+            results = server.probe_hosts_connectivity(["fast.local", "stuck.local"], deadline=0.2)
+            self.assertEqual(["fast.local"], list(results))
+            self.assertFalse(seen[0].closed)
+            release.set()
+            deadline = time.monotonic() + 2
+            while not seen[0].closed and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertTrue(seen[0].closed)
+
+
+class FakeServiceInfo:
+    def __init__(self, address, txt):
+        self.address = address
+        self.port = 6053
+        self.properties = txt
+
+    def parsed_addresses(self):
+        return [self.address]
+
+
+class PresenceBrowserTests(DeviceStatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.browser = server.MDNSPresenceBrowser()
+        self.browser.zc = object()
+        self.browser.started_at = time.time() - 60
+        self.original_presence = server.mdns_presence
+        server.mdns_presence = self.browser
+
+    def tearDown(self):
+        server.mdns_presence = self.original_presence
+        super().tearDown()
+
+    def test_announcements_and_goodbyes_update_presence_table(self):
+        service_type = "_esphomelib._tcp.local."
+        self.browser.record(service_type, f"Kitchen.{service_type}", FakeServiceInfo("10.0.0.5", {b"version": b"2025.1.0"}))
+
+        entry = self.browser.get("kitchen")
+        self.assertEqual(["10.0.0.5"], entry["addresses"])
+        self.assertEqual({"version": "2025.1.0"}, entry["txt"])
+        self.assertTrue(self.browser.lookup("kitchen.local"))
+
+        self.browser.mark_removed("kitchen")
+        self.assertFalse(self.browser.lookup("kitchen.local"))
+        self.assertEqual(entry["first_seen"], self.browser.get("kitchen")["first_seen"])
+
+    def test_probe_answers_from_presence_table_without_network(self):
+        self.browser.record("_esphome._tcp.local.", "garage._esphome._tcp.local.", FakeServiceInfo("10.0.0.6", {}))
+        probe = server.MDNSProbe()
+
+        with patch.object(server, "Zeroconf", side_effect=AssertionError("no network query expected")):
+            self.assertTrue(probe.is_online("garage.local"))
+            self.assertFalse(probe.is_online("unknown.local"))
+        probe.close()
+
+    def test_unknown_node_during_warmup_is_not_answered(self):
+        self.browser.started_at = time.time()
+
+        self.assertIsNone(self.browser.lookup("late.local"))
+
+    def test_stale_presence_entry_falls_back_to_active_query(self):
+        service_type = "_esphome._tcp.local."
+        self.browser.record(service_type, f"shed.{service_type}", FakeServiceInfo("10.0.0.8", {}))
+        self.browser.table["shed"]["last_seen"] = time.time() - server.MDNS_PRESENCE_MAX_AGE - 1
+
+        self.assertIsNone(self.browser.lookup("shed.local"))
+
+        class SilentZeroconf:
+            def get_service_info(self, *args, **kwargs):
+                return None
+
+            def close(self):
+                pass
+
+        probe = server.MDNSProbe()
+        with patch.object(server, "Zeroconf", return_value=SilentZeroconf()):
+            self.assertFalse(probe.is_online("shed.local"))
+        probe.close()
+        self.assertFalse(self.browser.lookup("shed.local"))
+
+    def test_presence_endpoint_lists_table(self):
+        self.browser.record("_esphome._tcp.local.", "porch._esphome._tcp.local.", FakeServiceInfo("10.0.0.7", {}))
+
+        payload = self.client.get("/api/devices/presence", headers=INGRESS).get_json()
+
+        self.assertTrue(payload["running"])
+        self.assertEqual(["porch"], [item["node"] for item in payload["devices"]])
+        self.assertTrue(payload["devices"][0]["last_seen"].endswith("Z"))
+
+
+class StatusMonitorTests(DeviceStatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.monitor = server.DeviceStatusMonitor()
+        self.original_monitor = server.status_monitor
+        server.status_monitor = self.monitor
+
+    def tearDown(self):
+        server.status_monitor = self.original_monitor
+        super().tearDown()
+
+    def test_backoff_grows_for_offline_devices_and_is_fast_after_changes(self):
+        now = 10000.0
+        recent = {"status": "online", "changed_at": now - 5, "failures": 0}
+        online = {"status": "online", "changed_at": 0.0, "failures": 0}
+        offline = {"status": "offline", "changed_at": 0.0, "failures": 3}
+        long_offline = {"status": "offline", "changed_at": 0.0, "failures": 30}
+
+        self.assertEqual(server.STATUS_MONITOR_FAST_INTERVAL, self.monitor.next_interval(recent, now))
+        self.assertEqual(server.STATUS_MONITOR_INTERVAL, self.monitor.next_interval(online, now))
+        self.assertEqual(server.STATUS_MONITOR_INTERVAL * 4, self.monitor.next_interval(offline, now))
+        self.assertEqual(server.STATUS_MONITOR_MAX_INTERVAL, self.monitor.next_interval(long_offline, now))
+
+    def test_run_once_probes_due_devices_and_persists_changes(self):
+        self.write_devices(["alpha", "beta"])
+
+        with patch.object(
+            server,
+            "evaluate_device_connectivity",
+            side_effect=lambda host, deep=False, mdns_probe=None: (host == "alpha.local", host == "alpha.local", False, False, "dns"),
+        ) as probe:
+            self.assertEqual(2, self.monitor.run_once())
+            self.assertEqual(0, self.monitor.run_once())
+
+        self.assertEqual(2, probe.call_count)
+        self.assertEqual("online", self.monitor.get("alpha")["status"])
+        self.assertEqual(1, self.monitor.get("beta")["failures"])
+        saved = {device["name"]: device for device in server.load_devices()}
+        self.assertEqual("online", saved["alpha"]["status"])
+        self.assertEqual("offline", saved["beta"]["status"])
+
+    def test_list_answers_from_memory_and_refresh_does_not_block(self):
+        self.write_devices(["alpha"])
+        self.monitor.thread = threading.current_thread()
+        with patch.object(
+            server,
+            "evaluate_device_connectivity",
+            side_effect=lambda host, deep=False, mdns_probe=None: (True, True, False, False, "dns"),
+        ):
+            self.monitor.run_once()
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=AssertionError("blocking probe")):
+            payload = self.client.get("/api/devices/list?refresh=1", headers=INGRESS).get_json()
+            status = self.client.get("/api/devices/status?name=alpha", headers=INGRESS).get_json()
+
+        device = payload["devices"][0]
+        self.assertEqual("online", device["status"])
+        self.assertTrue(device["checks"]["dns"])
+        self.assertIsNotNone(device["status_age"])
+        self.assertTrue(device["revalidating"])
+        self.assertEqual(0.0, self.monitor.get("alpha")["next_check"])
+        self.assertEqual("online", status["device"]["status"])
+
+
+    def test_refresh_of_device_registered_after_last_sweep_is_not_dropped(self):
+        self.write_devices(["alpha"])
+        self.monitor.thread = threading.current_thread()
+        self.monitor.sync(server.load_devices())
+        server.device_registry.register("beta", "beta", "beta.yaml", "")
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=AssertionError("blocking probe")):
+            status = self.client.get("/api/devices/status?name=beta&refresh=1", headers=INGRESS).get_json()
+
+        self.assertTrue(status["device"]["revalidating"])
+        self.assertTrue(self.monitor.get("beta")["revalidating"])
+        self.assertLessEqual(self.monitor.get("beta")["next_check"], server.time.time())
+
+        offline = lambda host, deep=False, mdns_probe=None: (False, False, False, False, "unknown")
+        server.device_registry.register("gamma", "gamma", "gamma.yaml", "")
+        with patch.object(server, "evaluate_device_connectivity", side_effect=offline), patch.object(
+            server, "probe_ota_ports", return_value={"gamma.local": 3.0}
+        ):
+            self.client.get("/api/devices/status?name=gamma&refresh=1&deep=1", headers=INGRESS)
+
+        self.assertEqual("online", self.monitor.get("gamma")["status"])
+        self.assertFalse(self.monitor.get("gamma")["revalidating"])
+
+    def test_deep_refresh_probes_ota_ports_on_demand_and_updates_monitor(self):
+        self.write_devices(["alpha", "beta"])
+        self.monitor.thread = threading.current_thread()
+        offline = lambda host, deep=False, mdns_probe=None: (False, False, False, False, "unknown")
+        with patch.object(server, "evaluate_device_connectivity", side_effect=offline):
+            self.monitor.run_once()
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=offline), patch.object(
+            server, "probe_ota_ports", return_value={"alpha.local": 4.2, "beta.local": None}
+        ) as ota:
+            listed = self.client.get("/api/devices/list?refresh=1&deep=1", headers=INGRESS).get_json()
+            status = self.client.get("/api/devices/status?name=alpha&refresh=1&deep=1", headers=INGRESS).get_json()
+
+        self.assertEqual(2, ota.call_count)
+        devices = {item["name"]: item for item in listed["devices"]}
+        self.assertEqual("online", devices["alpha"]["status"])
+        self.assertEqual(4.2, devices["alpha"]["checks"]["ota_ms"])
+        self.assertEqual("offline", devices["beta"]["status"])
+        self.assertTrue(status["device"]["checks"]["ota"])
+        self.assertEqual("ota", self.monitor.get("alpha")["source"])
+        self.assertEqual(4.2, self.monitor.get("alpha")["checks"]["ota_ms"])
+
+    def test_monitor_deep_pass_uses_batched_ota_probe(self):
+        self.write_devices(["alpha"])
+        with patch.object(server, "ECD_STATUS_USE_PING", True), patch.object(
+            server,
+            "evaluate_device_connectivity",
+            side_effect=lambda host, deep=False, mdns_probe=None: (False, False, False, False, "unknown"),
+        ), patch.object(server, "probe_ota_ports", return_value={"alpha.local": 7.0}) as ota:
+            self.monitor.run_once()
+
+        ota.assert_called_once()
+        self.assertEqual("online", self.monitor.get("alpha")["status"])
+        self.assertEqual(7.0, self.monitor.get("alpha")["checks"]["ota_ms"])
+
+    def test_batch_refresh_probes_requested_devices_while_monitor_runs(self):
+        self.write_devices(["alpha", "beta"])
+        self.monitor.thread = threading.current_thread()
+        self.monitor.sync(server.load_devices())
+        probed = []
+
+        def probe(host, deep=False, mdns_probe=None):
+            probed.append(host)
+            return True, True, False, False, "dns"
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=probe):
+            response = self.client.post(
+                "/api/devices/status/batch",
+                json={"devices": ["alpha"], "refresh": True},
+                headers=INGRESS,
+            )
+
+        self.assertEqual(["alpha.local"], probed)
+        self.assertEqual("online", response.get_json()["results"][0]["device"]["status"])
+        self.assertEqual("online", self.monitor.get("alpha")["status"])
+        self.assertFalse(self.monitor.get("alpha")["revalidating"])
+        self.assertTrue(self.monitor.get("beta")["revalidating"])
+
+
+class OtaPortProbeTests(unittest.TestCase):
+    def test_batch_probe_reports_latency_for_open_ports_only(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(64)
+        open_port = listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(("127.0.0.1", 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        try:
+            with patch.object(server, "OTA_PROBE_MAX_SOCKETS", 2):
+                open_results = server.probe_ota_ports(["127.0.0.1", "localhost"], port=open_port, timeout=1.0)
+            closed_results = server.probe_ota_ports(["127.0.0.1"], port=closed_port, timeout=1.0)
+        finally:
+            listener.close()
+
+        self.assertIsInstance(open_results["127.0.0.1"], float)
+        self.assertIsInstance(open_results["localhost"], float)
+        self.assertIsNone(closed_results["127.0.0.1"])
+        self.assertIsNone(server.probe_ota_ports(["invalid.host.invalid"], timeout=0.2)["invalid.host.invalid"])
+
+    def test_batch_probe_shares_one_deadline_across_waves(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(64)
+        waves = []
+
+        class StallingSelector(selectors.DefaultSelector):
+            # Never reports a connect, as if every device in the wave were silent.
+            def __init__(self):
+                super().__init__()
+                waves.append(self)
+
+            def select(self, timeout=None):
+                time.sleep(timeout)
+                return []
+
+        hosts = ["a.local", "b.local", "c.local"]
+        addresses = {host: (socket.AF_INET, listener.getsockname()) for host in hosts}
+        try:
+            with patch.object(server, "resolve_stream_addresses", return_value=addresses), patch.object(
+                server, "OTA_PROBE_MAX_SOCKETS", 1
+            ), patch.object(server.selectors, "DefaultSelector", StallingSelector):
+                started = time.monotonic()
+                results = server.probe_ota_ports(hosts, timeout=0.3)
+                elapsed = time.monotonic() - started
+        finally:
+            listener.close()
+
+        self.assertEqual({host: None for host in hosts}, results)
+        self.assertEqual(1, len(waves))
+        self.assertLess(elapsed, 0.6)
+
+    def test_deep_probe_marks_ota_reachable_devices_online(self):
+        ota_latency = {}
+        with patch.object(
+            server,
+            "evaluate_device_connectivity",
+            side_effect=lambda host, deep=False, mdns_probe=None: (False, False, False, False, "unknown"),
+        ), patch.object(server, "probe_ota_ports", return_value={"a.local": 3.5, "b.local": None}):
+            results = server.probe_hosts_connectivity(["a.local", "b.local", ""], deep=True, ota_latency=ota_latency)
+
+        self.assertEqual((True, False, False, True, "ota"), results["a.local"])
+        self.assertEqual((False, False, False, False, "unknown"), results["b.local"])
+        self.assertEqual((False, False, False, False, "unknown"), results[""])
+        self.assertEqual(3.5, ota_latency["a.local"])
+
+
+class HostResolverTests(unittest.TestCase):
+    def make_resolver(self, timeout=1.0):
+        return server.HostResolver(ttl=60, negative_ttl=60, timeout=timeout, max_entries=2, workers=4)
+
+    def test_caches_successes_and_failures(self):
+        resolver = self.make_resolver()
+
+        def fake_getaddrinfo(host, port, type=0):
+            if host == "missing.local":
+                raise OSError("not found")
+            return [(socket.AF_INET, socket.SOCK_STREAM, 0, "", ("10.0.0.9", 0))]
+
+        with patch.object(server.socket, "getaddrinfo", side_effect=fake_getaddrinfo) as lookup:
+            self.assertEqual([(socket.AF_INET, ("10.0.0.9", 0))], resolver.resolve("Kitchen.local."))
+            self.assertTrue(resolver.resolve("kitchen.local"))
+            self.assertEqual([], resolver.resolve("missing.local"))
+            self.assertEqual([], resolver.resolve("missing.local"))
+
+        self.assertEqual(2, lookup.call_count)
+        metrics = resolver.metrics()
+        self.assertEqual(1, metrics["hits"])
+        self.assertEqual(1, metrics["negative_hits"])
+        self.assertEqual(2, metrics["misses"])
+
+    def test_hanging_lookup_times_out_and_is_shared(self):
+        resolver = self.make_resolver(timeout=0.1)
+        release = threading.Event()
+        calls = []
+
+        def hanging_getaddrinfo(host, port, type=0):
+            calls.append(host)
+            release.wait(2)
+            raise OSError("timeout")
+
+        try:
+            with patch.object(server.socket, "getaddrinfo", side_effect=hanging_getaddrinfo):
+                started = time.monotonic()
+                self.assertEqual([], resolver.resolve("slow.local"))
+                self.assertEqual([], resolver.resolve("slow.local"))
+                self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            release.set()
+
+        self.assertEqual(["slow.local"], calls)
+        self.assertEqual(1, resolver.metrics()["timeouts"])
+        self.assertEqual(1, resolver.metrics()["negative_hits"])
+
+    def test_cache_is_bounded(self):
+        resolver = self.make_resolver()
+        with patch.object(server.socket, "getaddrinfo", return_value=[]):
+            for host in ("a.local", "b.local", "c.local"):
+                resolver.resolve(host)
+
+        self.assertEqual(["b.local", "c.local"], list(resolver.cache))
+
+
+class DeviceRegistryTests(DeviceStatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.registry = server.DeviceRegistry(flush_delay=60)
+        self.original_registry = server.device_registry
+        server.device_registry = self.registry
+
+    def tearDown(self):
+        if self.registry.timer is not None:
+            self.registry.timer.cancel()
+        server.device_registry = self.original_registry
+        super().tearDown()
+
+    def read_file(self):
+        return json.loads(pathlib.Path(server.DEVICES_PATH).read_text(encoding="utf-8"))
+
+    def test_load_normalizes_records_and_indexes_by_yaml_and_key(self):
+        pathlib.Path(server.DEVICES_PATH).write_text(
+            json.dumps([{"name": "Legacy", "yaml": "Kitchen.yaml", "status": "weird"}]), encoding="utf-8"
+        )
+
+        device = self.registry.get(yaml_name="kitchen.yaml")
+
+        self.assertEqual("kitchen", device["device_key"])
+        self.assertEqual("kitchen.local", device["host"])
+        self.assertEqual("unknown", device["status"])
+        self.assertEqual(device, self.registry.get(device_key="kitchen"))
+        self.assertEqual("kitchen", self.read_file()[0]["name"])
+
+    def test_status_updates_are_coalesced_until_flush(self):
+        self.registry.register("alpha", "alpha", "alpha.yaml", "")
+        self.registry.register("beta", "beta", "beta.yaml", "")
+        writes = self.registry.writes
+        online = (True, True, False, False, "dns")
+
+        self.registry.apply_probe_results({"alpha": online}, "2026-01-01T00:00:00Z")
+        self.registry.apply_probe_results({"beta": online}, "2026-01-01T00:00:01Z")
+
+        self.assertEqual(writes, self.registry.writes)
+        self.assertEqual(["offline", "offline"], [item["status"] for item in self.read_file()])
+        self.assertEqual("online", self.registry.get(device_key="beta")["status"])
+        self.registry.flush()
+        self.assertEqual(writes + 1, self.registry.writes)
+        self.assertEqual(["online", "online"], [item["status"] for item in self.read_file()])
+
+    def test_concurrent_registrations_and_updates_are_not_lost(self):
+        def register(index):
+            self.registry.register(f"node{index}", f"node{index}", f"node{index}.yaml", "")
+            self.registry.apply_probe_results({f"node{index}": (True, True, False, False, "dns")}, "now")
+
+        threads = [threading.Thread(target=register, args=(index,)) for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.registry.flush()
+
+        saved = self.read_file()
+        self.assertEqual(20, len(saved))
+        self.assertTrue(all(item["status"] == "online" for item in saved))
+
+    def test_external_file_changes_are_reloaded(self):
+        self.registry.register("alpha", "alpha", "alpha.yaml", "")
+        time.sleep(0.01)
+        server.write_text_file_atomic(server.DEVICES_PATH, json.dumps([{"name": "gamma", "yaml": "gamma.yaml"}]))
+
+        self.assertIsNone(self.registry.get(device_key="alpha"))
+        self.assertEqual("gamma", self.registry.get(device_key="gamma")["name"])
+
+    def test_register_and_remove_update_indexes_without_reindexing(self):
+        self.registry.register("alpha", "alpha", "alpha.yaml", "")
+        self.registry.register("beta", "beta", "beta.yaml", "")
+
+        with patch.object(self.registry, "_reindex", side_effect=AssertionError("full reindex")):
+            renamed = self.registry.register("gamma", "beta", "gamma.yaml", "")
+            self.assertEqual(1, self.registry.remove(device_key="alpha"))
+
+        self.assertIsNone(self.registry.get(device_key="beta"))
+        self.assertIsNone(self.registry.get(yaml_name="beta.yaml"))
+        self.assertIsNone(self.registry.get(yaml_name="alpha.yaml"))
+        self.assertEqual(renamed["id"], self.registry.get(yaml_name="gamma.yaml")["id"])
+        self.assertEqual(["gamma"], [item["name"] for item in self.read_file()])
+        self.assertEqual({"gamma": [self.registry.records[0]]}, self.registry.by_name)
+
+    def test_unregister_removes_by_yaml(self):
+        self.registry.register("alpha", "alpha", "alpha.yaml", "")
+
+        self.assertEqual((True, 1), server.unregister_device_record(yaml_name="alpha.yaml"))
+        self.assertEqual([], self.read_file())
+
+
+class DeviceHistoryTests(DeviceStatusTestCase):
+    def test_ring_keeps_only_transitions_within_capacity(self):
+        ring = server.StatusRing(capacity=4, retention=0)
+        for timestamp, online in ((0, True), (10, True), (20, False), (30, True), (40, False), (50, True)):
+            ring.append(float(timestamp), online)
+
+        self.assertEqual([20.0, 30.0, 40.0, 50.0], list(ring.times))
+        self.assertEqual("b", ring.states.typecode)
+
+    def test_summary_reports_uptime_transitions_and_timeline(self):
+        ring = server.StatusRing(capacity=100, retention=0)
+        ring.append(0.0, True)
+        ring.append(60.0, False)
+        ring.append(90.0, True)
+
+        summary = ring.summarize(0.0, 120.0, 4)
+
+        self.assertEqual(75.0, summary["uptime"])
+        self.assertEqual(2, summary["transitions"])
+        self.assertEqual(1, summary["offline_events"])
+        self.assertEqual([1.0, 1.0, 0.0, 1.0], summary["timeline"])
+
+    def test_retention_keeps_state_at_window_start(self):
+        ring = server.StatusRing(capacity=100, retention=100)
+        ring.append(0.0, False)
+        ring.append(10.0, True)
+        ring.append(500.0, False)
+
+        self.assertEqual([10.0, 500.0], list(ring.times))
+        self.assertEqual(1, ring.state_at(450.0))
+
+    def test_probe_results_are_recorded_and_persisted(self):
+        self.write_devices(["garage"])
+        now = time.time()
+        with patch.object(server.time, "time", return_value=now - 60):
+            server.device_registry.apply_probe_results({"garage": (True, True, False, False, "dns")}, "t0")
+        with patch.object(server.time, "time", return_value=now - 30):
+            server.device_registry.apply_probe_results({"garage": (False, False, False, False, "unknown")}, "t1")
+
+        server.device_history.rings.clear()
+        payload = self.client.get("/api/devices/history?name=garage&hours=1&buckets=2", headers=INGRESS).get_json()
+
+        device = payload["device"]
+        self.assertEqual("offline", device["current"])
+        self.assertEqual(1, device["transitions"])
+        self.assertAlmostEqual(50.0, device["uptime"], delta=1.0)
+        listing = self.client.get("/api/devices/history", headers=INGRESS).get_json()
+        self.assertEqual(["garage"], [item["device_key"] for item in listing["devices"]])
+
+
+class FirmwareDriftTests(DeviceStatusTestCase):
+    def setUp(self):
+        super().setUp()
+        root = pathlib.Path(self.temp_dir.name)
+        self.original = (server.TARGET_DIR, server.artifact_store, server.ESPHOME_VERSION_CACHE.get(server.ESPHOME_BIN))
+        self.target_dir = root / "config"
+        self.target_dir.mkdir()
+        server.TARGET_DIR = str(self.target_dir)
+        server.artifact_store = server.ArtifactStore(str(root / "artifacts"), 3, 0)
+        server.ESPHOME_VERSION_CACHE[server.ESPHOME_BIN] = "2025.1.0"
+        self.image = root / "firmware.bin"
+
+    def tearDown(self):
+        server.TARGET_DIR, server.artifact_store, version = self.original
+        if version is None:
+            server.ESPHOME_VERSION_CACHE.pop(server.ESPHOME_BIN, None)
+        else:
+            server.ESPHOME_VERSION_CACHE[server.ESPHOME_BIN] = version
+        super().tearDown()
+
+    def build(self, name, yaml_text, firmware):
+        yaml_path = self.target_dir / f"{name}.yaml"
+        yaml_path.write_text(yaml_text, encoding="utf-8")
+        self.image.write_bytes(firmware)
+        return server.artifact_store.register(name, {"ota": str(self.image)}, str(yaml_path))
+
+    def test_drift_states_across_fleet(self):
+        self.write_devices(["fresh", "edited", "pending", "never"])
+        entry = self.build("fresh", "esp32: {}\n", b"fresh")
+        server.artifact_store.mark_deployed("fresh", entry["id"])
+        entry = self.build("edited", "esp32: {}\n", b"edited")
+        server.artifact_store.mark_deployed("edited", entry["id"])
+        (self.target_dir / "edited.yaml").write_text("esp32: {}\nwifi: {}\n", encoding="utf-8")
+        self.build("pending", "esp8266: {}\n", b"pending")
+        (self.target_dir / "never.yaml").write_text("esp32: {}\n", encoding="utf-8")
+
+        payload = self.client.get("/api/devices/drift", headers=INGRESS).get_json()
+
+        states = {item["device_key"]: (item["state"], item["reasons"]) for item in payload["devices"]}
+        self.assertEqual(("up_to_date", []), states["fresh"])
+        self.assertEqual(("needs_rebuild", ["yaml_changed"]), states["edited"])
+        self.assertEqual(("needs_ota", ["deployment_unknown"]), states["pending"])
+        self.assertEqual(("needs_rebuild", ["never_built"]), states["never"])
+        self.assertEqual({"up_to_date": 1, "needs_rebuild": 2, "needs_ota": 1, "unknown": 0}, payload["summary"])
+
+    def test_advertised_version_mismatch_needs_ota(self):
+        entry = self.build("porch", "esp32: {}\n", b"porch")
+        server.artifact_store.mark_deployed("porch", entry["id"])
+
+        drift = server.firmware_drift("porch", "porch.yaml", {"version": "2024.6.0"})
+
+        self.assertEqual("needs_ota", drift["state"])
+        self.assertEqual(["advertised_version_differs"], drift["reasons"])
+        self.assertEqual("2024.6.0", drift["advertised_version"])
+
+
+    def test_drift_finds_artifacts_for_case_preserved_yaml_names(self):
+        server.save_devices([{"device_key": "kitchen", "name": "kitchen", "yaml": "Kitchen.yaml", "host": ""}])
+        entry = self.build("Kitchen", "esp32: {}\n", b"kitchen")
+        server.artifact_store.mark_deployed("Kitchen", entry["id"])
+
+        payload = self.client.get("/api/devices/drift", headers=INGRESS).get_json()
+
+        self.assertEqual("up_to_date", payload["devices"][0]["state"])
+
+    def test_included_files_and_secrets_changes_need_rebuild(self):
+        (self.target_dir / "common").mkdir()
+        (self.target_dir / "common" / "wifi.yaml").write_text("ssid: !secret wifi_ssid\n", encoding="utf-8")
+        (self.target_dir / "secrets.yaml").write_text("wifi_ssid: home\n", encoding="utf-8")
+        entry = self.build("attic", "esp32: {}\nwifi: !include common/wifi.yaml\n", b"attic")
+        server.artifact_store.mark_deployed("attic", entry["id"])
+        self.assertEqual("up_to_date", server.firmware_drift("attic", "attic.yaml")["state"])
+
+        (self.target_dir / "secrets.yaml").write_text("wifi_ssid: office\n", encoding="utf-8")
+        self.assertEqual(["yaml_changed"], server.firmware_drift("attic", "attic.yaml")["reasons"])
+
+        self.build("attic", "esp32: {}\nwifi: !include common/wifi.yaml\n", b"attic2")
+        (self.target_dir / "common" / "wifi.yaml").write_text("ssid: !secret wifi_ssid\nfast_connect: true\n", encoding="utf-8")
+        self.assertEqual(["yaml_changed"], server.firmware_drift("attic", "attic.yaml")["reasons"])
+
+class BatchStatusTests(DeviceStatusTestCase):
+    def test_batch_probes_only_requested_devices(self):
+        self.write_devices([f"node{index}" for index in range(10)])
+        probed = []
+
+        def probe(host, deep=False, mdns_probe=None):
+            probed.append(host)
+            return True, True, False, False, "dns"
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=probe):
+            response = self.client.post(
+                "/api/devices/status/batch",
+                json={"devices": ["node1.yaml", "node2", "missing", "node2.yaml"], "refresh": True},
+                headers=INGRESS,
+            )
+
+        results = response.get_json()["results"]
+        self.assertEqual(["node1.yaml", "node2", "missing", "node2.yaml"], [item["selector"] for item in results])
+        self.assertEqual("online", results[0]["device"]["status"])
+        self.assertIsNone(results[2]["device"])
+        self.assertEqual(results[1]["device"], results[3]["device"])
+        self.assertEqual(["node1.local", "node2.local"], sorted(probed))
+
+    def test_batch_rejects_invalid_payload(self):
+        response = self.client.post("/api/devices/status/batch", json={"devices": "node1"}, headers=INGRESS)
+
+        self.assertEqual(400, response.status_code)
+
+    def test_identical_concurrent_batches_share_one_probe_round(self):
+        self.write_devices(["alpha", "beta"])
+        calls = []
+        gate = threading.Event()
+
+        def probe(host, deep=False, mdns_probe=None):
+            calls.append(host)
+            gate.wait(2)
+            return True, True, False, False, "dns"
+
+        payloads = []
+
+        def request_batch():
+            client = server.app.test_client()
+            response = client.post(
+                "/api/devices/status/batch",
+                json={"devices": ["beta", "alpha"], "refresh": True},
+                headers=INGRESS,
+            )
+            payloads.append(response.get_json())
+
+        with patch.object(server, "evaluate_device_connectivity", side_effect=probe):
+            threads = [threading.Thread(target=request_batch) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.3)
+            gate.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(2, len(calls))
+        self.assertEqual(4, len(payloads))
+        self.assertTrue(all(item["results"][0]["device"]["status"] == "online" for item in payloads))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import time
+import unittest
+
+from fleet_sim import FleetSimulation, load_server
+
+
+server = load_server("ecd_server_fleet_test")
+INGRESS = {"X-Ingress-Path": "/test"}
+
+
+class FleetSimulationTests(unittest.TestCase):
+    def test_refresh_reports_simulated_fleet_status(self):
+        client = server.app.test_client()
+        with FleetSimulation(server, 40, offline_ratio=0.25, latency=0.05) as fleet:
+            started = time.monotonic()
+            payload = client.get("/api/devices/list?refresh=1&deep=1", headers=INGRESS).get_json()
+            elapsed = time.monotonic() - started
+
+            online = {item["name"] for item in payload["devices"] if item["status"] == "online"}
+            self.assertEqual(fleet.online_names, online)
+            self.assertEqual(30, len(online))
+            self.assertTrue(all(item["checks"]["ota"] for item in payload["devices"] if item["name"] in online))
+            self.assertLess(elapsed, 2.0)
+
+            name = sorted(fleet.online_names)[0]
+            status = client.get(f"/api/devices/status?name={name}&refresh=1&deep=1", headers=INGRESS).get_json()
+            self.assertEqual("online", status["device"]["status"])
+            self.assertIsNotNone(status["device"]["checks"]["ota_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()